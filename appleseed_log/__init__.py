@@ -0,0 +1,28 @@
+# Parsing core of the appleseed log parser, standard library only so batch
+# workers and render nodes can import it without PySide.
+#
+# Heavier tools live in their own modules and are imported on demand:
+#   appleseed_log.compare     : multi-log comparison
+#   appleseed_log.watch       : directory watcher for logs being written
+#   appleseed_log.server      : local HTTP/JSON service
+#   appleseed_log.graph       : level of detail series for plotting
+#   appleseed_log.textures    : texture cache thrash report
+#   appleseed_log.advisor     : render configuration advice
+#   appleseed_log.database    : SQLite export for cross-log queries
+#   appleseed_log.timeline    : Chrome trace of render phases and threads
+#   appleseed_log.summary     : partial summaries merged across render nodes
+#   appleseed_log.sequence    : render time regressions along a frame sequence
+#   appleseed_log.conformance : parsing engines checked against the reference parser
+#   appleseed_log.stream      : render output parsed from a pipe while it runs
+#   appleseed_log.memory      : scene memory footprint of trees and intersection filters
+#   appleseed_log.merge       : time ordered merge of the logs of several render nodes
+#   appleseed_log.fingerprints: warning and error signatures indexed across logs
+
+from .log import ASLog, ASLogLine, ASLogStats, ASLogColumns, datetime_str_format
+from .query import ASLogQuery, QuerySyntaxError, compile_query
+from .index import ASLogIndex
+from .strings import StringTable, strings
+from .blocks import BlockStore
+from .templates import ASLogTemplate, ASLogTemplateMiner
+from .sketches import Moments, QuantileSketch, Distribution
+from .summary import ASLogSummary
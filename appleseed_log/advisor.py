@@ -0,0 +1,380 @@
+import argparse
+import copy
+import fnmatch
+import json
+import multiprocessing
+import os
+
+from .log import ASLog
+
+# Render configuration advisor.
+#
+# Each render (a session starting at "loading project file") of each log is
+# summarized: resolution, tile size and margins, border waste, thread count,
+# path tracing settings, render time and per thread utilization modeled from
+# the progress lines. Recommendations are then made per render (tile size)
+# and farm-wide (thread count).
+#
+#   python -m appleseed_log.advisor /renders/logs --pattern "*.log" --json advice.json
+
+# square tile sizes tried for recommendations
+tile_sizes = ( 16, 24, 32, 48, 64, 96, 128, 192, 256 )
+
+# at least this many tiles per thread, so threads don't wait for the last ones
+min_tiles_per_thread = 4
+
+################################################################################
+# Tile model
+################################################################################
+def tile_counts( resolution, tile_size ) :
+    """Return the ( x, y ) tile counts covering the given resolution."""
+    return ( -( -resolution[0] // tile_size[0] ) ,
+             -( -resolution[1] // tile_size[1] ) )
+
+def border_waste( resolution, tile_size, tile_margins ) :
+    """Return the rendering effort (percentage) wasted by tile borders.
+
+    Each tile is rendered with its margins, so a W x H image split in
+    nx x ny tiles renders (W + nx * margin_x) x (H + ny * margin_y) pixels.
+    """
+    nx, ny = tile_counts( resolution, tile_size )
+    padded = ( resolution[0] + nx * tile_margins[0] ) * ( resolution[1] + ny * tile_margins[1] )
+    return 100.0 * ( padded - resolution[0] * resolution[1] ) / ( resolution[0] * resolution[1] )
+
+def best_tile_size( resolution, tile_margins, threads ) :
+    """Return ( tile size, waste percentage ) of the square tile size wasting the least.
+
+    Only tile sizes giving at least `min_tiles_per_thread` tiles per thread
+    are considered, None if none does.
+    """
+    best = None
+    for size in tile_sizes :
+        nx, ny = tile_counts( resolution, ( size, size ) )
+        if nx * ny < min_tiles_per_thread * max( 1, threads ) :
+            continue
+        waste = border_waste( resolution, ( size, size ), tile_margins )
+        if best is None or waste < best[1] :
+            best = ( size, waste )
+    return best
+
+################################################################################
+# Renders
+################################################################################
+def new_render( log_path, project ) :
+    return { 'log'               : log_path ,
+             'project'           : project  ,
+             'resolution'        : None     ,
+             'tile_size'         : None     ,
+             'tile_margins'      : None     ,
+             'border_waste'      : None     ,
+             'threads'           : None     ,
+             'path_tracing'      : None     ,
+             'start'             : None     ,  # seconds since the first log line
+             'end'               : None     ,
+             'finished_seconds'  : None     ,  # as logged by "rendering finished in"
+             'thread_last'       : dict()   ,  # thread id -> latest progress time
+             'thread_tiles'      : dict()   }  # thread id -> progress line count
+
+# message types read by the advisor
+render_types = ( 'loading_project_file', 'tile_borders_wasted', 'rendering_threads',
+                 'rendering_progress', 'rendering_finished' )
+
+class ASLogRenders( object ) :
+    """Subscriber summarizing each render (session) of a log.
+
+    Each render gets the frame and path tracing settings of its own option
+    blocks, so renders of a same log with different settings are advised
+    on their own settings.
+
+    :Example:
+
+    >>> as_log  = ASLog( 'frame.1001.log', parse = False, keep_lines = False )
+    >>> renders = ASLogRenders( as_log )
+    >>> as_log.update()
+    >>> [ render[ 'resolution' ] for render in renders.finish() ]
+    [(1920, 1080), (960, 540)]
+    """
+
+    def __init__( self, as_log, subscribe = True ) :
+
+        self.path    = as_log.path
+        self.as_log  = as_log
+        self.renders = list()
+
+        if subscribe :
+            as_log.subscribe( self.add        , types = render_types        )
+            as_log.subscribe( self.add_options, types = ( 'render_options', ) )
+
+    def add( self, line_data ) :
+
+        line_type = line_data.msg_type
+
+        if line_type == 'loading_project_file' or not self.renders :
+            self.renders.append( new_render( self.path, line_data.content( 'project_file_path' ) ) )
+
+        render = self.renders[ -1 ]
+        time   = ( line_data.timestamp - self.as_log.ranges[ 'first_datetime' ] ).total_seconds()
+
+        if line_type == 'tile_borders_wasted' :
+            render[ 'border_waste' ] = line_data.content( 'percentage'   )
+            render[ 'tile_size'    ] = line_data.content( 'tile_size'    )
+            render[ 'tile_margins' ] = line_data.content( 'tile_margins' )
+
+        elif line_type == 'rendering_threads' :
+            render[ 'threads' ] = line_data.content( 'threads' )
+            render[ 'start'   ] = time
+
+        elif line_type == 'rendering_progress' :
+            if render[ 'start' ] is None :
+                render[ 'start' ] = time
+            render[ 'end' ] = time
+            thread_id = line_data.thread_id
+            render[ 'thread_last'  ][ thread_id ] = time
+            render[ 'thread_tiles' ][ thread_id ] = render[ 'thread_tiles' ].get( thread_id, 0 ) + 1
+
+        elif line_type == 'rendering_finished' :
+            render[ 'finished_seconds' ] = line_data.content( 'seconds' )
+
+    def add_options( self, line_data ) :
+        """Keep the render options of the render whose option block ends with the given line."""
+        if self.renders :
+            set_render_options( self.renders[ -1 ], self.as_log.render_options )
+
+    def finish( self ) :
+        """Return the summaries of the renders which made progress, ready to be pickled."""
+        return [ summarize_render( render ) for render in self.renders if render[ 'end' ] is not None ]
+
+def set_render_options( render, options ) :
+    """Set the resolution and path tracing settings of the given render summary from render options.
+
+    The frame tile size is only used when no "tile borders wasted" line
+    gave the tile size.
+    """
+    frame_settings = options.get( 'frame_settings', dict() )
+    render[ 'resolution'   ] = copy.deepcopy( frame_settings.get( 'resolution' ) )
+    render[ 'path_tracing' ] = copy.deepcopy( options.get( 'path_tracing_settings' ) )
+    if render[ 'tile_size' ] is None :
+        render[ 'tile_size' ] = copy.deepcopy( frame_settings.get( 'tile_size' ) )
+
+def log_renders( as_log ) :
+    """Return a picklable summary (dict) of each render of an already parsed log.
+
+    Its lines are replayed, every render gets the final render options of
+    the log: use `render_log_file()` for per render options.
+    """
+    renders = ASLogRenders( as_log, subscribe = False )
+    for line_data in as_log.lines :
+        if line_data.msg_type in render_types :
+            renders.add( line_data )
+    for render in renders.renders :
+        set_render_options( render, as_log.render_options )
+    return renders.finish()
+
+def summarize_render( render ) :
+    """Add render time, utilization and throughput to the given render summary."""
+
+    seconds = render[ 'end' ] - render[ 'start' ]
+    threads = render[ 'threads' ] or len( render[ 'thread_last' ] )
+
+    # A thread is considered busy from the render start to its latest
+    # progress line, threads which never logged progress were idle.
+    busy = sum( last - render[ 'start' ] for last in render[ 'thread_last' ].values() )
+    utilization = busy / ( seconds * threads ) if seconds > 0 and threads else None
+
+    throughput = None
+    if render[ 'resolution' ] and seconds > 0 :
+        throughput = render[ 'resolution' ][0] * render[ 'resolution' ][1] / seconds
+
+    render[ 'render_seconds'    ] = seconds
+    render[ 'utilization'       ] = utilization
+    render[ 'pixels_per_second' ] = throughput
+    render[ 'thread_last'       ] = dict( ( str( k ), v ) for k, v in render[ 'thread_last'  ].items() )
+    render[ 'thread_tiles'      ] = dict( ( str( k ), v ) for k, v in render[ 'thread_tiles' ].items() )
+    return render
+
+def render_log_file( path ) :
+    """Parse the given log file, without keeping its lines, and return its render summaries (for worker processes)."""
+    as_log  = ASLog( path, parse = False, engine = 'split', keep_lines = False, summary = False )
+    renders = ASLogRenders( as_log )
+    as_log.update()
+    return renders.finish()
+
+def load_renders( paths, processes = None ) :
+    """Return the render summaries of the given logs, parsed in parallel."""
+    if len( paths ) < 2 or processes == 1 :
+        results = [ render_log_file( path ) for path in paths ]
+    else :
+        pool = multiprocessing.Pool( processes )
+        try :
+            results = pool.map( render_log_file, paths )
+        finally :
+            pool.close()
+            pool.join()
+    return [ render for renders in results for render in renders ]
+
+################################################################################
+# Recommendations
+################################################################################
+def render_recommendations( render ) :
+    """Return recommendations (list of dicts) for the given render summary."""
+
+    recommendations = list()
+    resolution      = render[ 'resolution'   ]
+    tile_size       = render[ 'tile_size'    ]
+    tile_margins    = render[ 'tile_margins' ]
+    threads         = render[ 'threads' ] or 1
+    seconds         = render[ 'render_seconds' ]
+
+    if resolution and tile_size and tile_margins :
+        waste = render[ 'border_waste' ]
+        if waste is None :
+            waste = border_waste( resolution, tile_size, tile_margins )
+
+        best = best_tile_size( resolution, tile_margins, threads )
+        if best is not None and best[0] != tile_size[0] and waste - best[1] >= 2.0 :
+            size, best_waste = best
+            saved = seconds * ( 1.0 - ( 100.0 + best_waste ) / ( 100.0 + waste ) )
+            nx, ny = tile_counts( resolution, ( size, size ) )
+            recommendations.append( {
+                'kind'     : 'tile_size'                                  ,
+                'current'  : list( tile_size )                            ,
+                'proposed' : [ size, size ]                               ,
+                'saved_seconds' : saved                                   ,
+                'message'  : "tile size %s x %s would waste %.1f%% on tile borders instead of %.1f%% "
+                             "(%d tiles for %d threads), about %.0fs less rendering" % (
+                                 size, size, best_waste, waste, nx * ny, threads, saved ) } )
+
+    utilization = render[ 'utilization' ]
+    if utilization is not None and utilization < 0.85 and tile_size :
+        idle  = ( 1.0 - utilization ) * 100.0
+        nx, ny = tile_counts( resolution, tile_size ) if resolution else ( 0, 0 )
+        smaller = tile_size[0] // 2
+        recommendations.append( {
+            'kind'        : 'load_balance'  ,
+            'utilization' : utilization     ,
+            'proposed'    : [ smaller, smaller ] ,
+            'message'     : "threads were idle %.0f%% of the rendering time waiting for the last of %d tiles, "
+                            "smaller tiles (%s x %s) would balance better" % ( idle, nx * ny, smaller, smaller ) } )
+
+    return recommendations
+
+def thread_saturation( renders, min_gain = 0.1 ) :
+    """Return farm-wide throughput per thread count and the count where it saturated.
+
+    Throughput is the median of pixels per second of renders using a thread
+    count. Thread counts are only compared for a same resolution, the
+    saturation is the first thread count after which more threads improved
+    throughput by less than `min_gain` (10%) per doubling.
+    """
+
+    groups = dict() # ( resolution, threads ) -> [ pixels per second ]
+    for render in renders :
+        if render[ 'pixels_per_second' ] and render[ 'threads' ] and render[ 'resolution' ] :
+            key = ( tuple( render[ 'resolution' ] ), render[ 'threads' ] )
+            groups.setdefault( key, list() ).append( render[ 'pixels_per_second' ] )
+
+    results = list()
+    for resolution in sorted( set( key[0] for key in groups ) ) :
+
+        tiers = sorted( ( threads, median( values ), len( values ) )
+                        for ( res, threads ), values in groups.items() if res == resolution )
+
+        saturated = None
+        for ( threads, throughput, _ ), ( next_threads, next_throughput, _ ) in zip( tiers, tiers[1:] ) :
+            doublings = max( 1e-9, ( next_threads / float( threads ) ) - 1.0 )
+            gain      = ( next_throughput / throughput - 1.0 ) / doublings
+            if gain < min_gain :
+                saturated = { 'threads'      : threads      ,
+                              'next_threads' : next_threads ,
+                              'gain'         : next_throughput / throughput - 1.0 }
+                break
+
+        results.append( { 'resolution' : list( resolution ) ,
+                          'tiers'      : [ { 'threads'           : threads    ,
+                                             'pixels_per_second' : throughput ,
+                                             'renders'           : count      } for threads, throughput, count in tiers ] ,
+                          'saturated'  : saturated ,
+                          'message'    : None if saturated is None else
+                                         "at %s x %s, %d threads rendered only %+.0f%% faster than %d threads" % (
+                                             resolution[0], resolution[1], saturated[ 'next_threads' ],
+                                             saturated[ 'gain' ] * 100, saturated[ 'threads' ] ) } )
+    return results
+
+def median( values ) :
+    values = sorted( values )
+    middle = len( values ) // 2
+    if len( values ) % 2 :
+        return values[ middle ]
+    return ( values[ middle - 1 ] + values[ middle ] ) / 2.0
+
+class ASLogAdvisor( object ) :
+    """Render configuration advice for a set of logs.
+
+    :Example:
+
+    >>> advisor = ASLogAdvisor.from_directory( '/renders/logs' )
+    >>> for render in advisor.renders :
+    ...     for recommendation in advisor.recommendations( render ) :
+    ...         print recommendation[ 'message' ]
+    >>> advisor.dump( 'advice.json' )
+    """
+
+    def __init__( self, paths, processes = None ) :
+        self.paths   = list( paths )
+        self.renders = load_renders( self.paths, processes )
+
+    @classmethod
+    def from_directory( cls, directory, pattern = '*.log', processes = None ) :
+        """Return an advisor for the logs of the given directory matching `pattern`."""
+        paths = sorted( os.path.join( directory, name )
+                        for name in os.listdir( directory )
+                            if fnmatch.fnmatch( name, pattern ) )
+        return cls( paths, processes )
+
+    def recommendations( self, render ) :
+        return render_recommendations( render )
+
+    @property
+    def thread_saturation( self ) :
+        return thread_saturation( self.renders )
+
+    def to_dict( self ) :
+        """Return the farm-wide report as a json serializable dict."""
+        return { 'renders'           : [ dict( render, recommendations = self.recommendations( render ) )
+                                         for render in self.renders ] ,
+                 'thread_saturation' : self.thread_saturation         }
+
+    def dump( self, path ) :
+        """Write the report as json at the given path."""
+        with open( path, 'w' ) as json_file :
+            json.dump( self.to_dict(), json_file, indent = 4, sort_keys = True )
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Recommend appleseed render settings from logs.' )
+    parser.add_argument( 'directory'                                                                )
+    parser.add_argument( '--pattern'   , default = '*.log'                                          )
+    parser.add_argument( '--processes' , default = None, type = int                                 )
+    parser.add_argument( '--json'      , default = None, help = 'write the report to this json file' )
+    args = parser.parse_args()
+
+    advisor = ASLogAdvisor.from_directory( args.directory, args.pattern, args.processes )
+
+    for render in advisor.renders :
+        print "%s (%s)" % ( render[ 'log' ], render[ 'project' ] )
+        print "    %.1fs, %s threads, utilization %s, border waste %s%%" % (
+            render[ 'render_seconds' ], render[ 'threads' ],
+            '%.0f%%' % ( render[ 'utilization' ] * 100 ) if render[ 'utilization' ] is not None else 'n/a',
+            render[ 'border_waste' ] )
+        for recommendation in advisor.recommendations( render ) :
+            print "    - %s" % recommendation[ 'message' ]
+
+    for saturation in advisor.thread_saturation :
+        if saturation[ 'message' ] :
+            print "- %s" % saturation[ 'message' ]
+
+    if args.json :
+        advisor.dump( args.json )
+
+if __name__ == '__main__' :
+    main()
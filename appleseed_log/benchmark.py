@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Benchmarks of the parsing core, run with:
+#
+#   python -m appleseed_log.benchmark
+#   python -m appleseed_log.benchmark --lines 1000000 # also parse a generated log
+#
+# Every measure runs in a fresh interpreter so module caches don't hide
+# the real cost paid by short lived parse workers.
+
+import_script = '''
+import json, resource, sys, time
+rss   = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+start = time.time()
+import %s
+elapsed = time.time() - start
+print json.dumps( { 'seconds' : elapsed ,
+                    'rss_kb'  : resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss - rss ,
+                    'modules' : sorted( m for m in sys.modules if m.split( '.' )[0] in ( 'PySide', 'PyQt4' ) ) } )
+'''
+
+parse_script = '''
+import json, sys, time
+from appleseed_log import ASLog
+start  = time.time()
+as_log = ASLog( %r, engine = %r )
+parsed = time.time() - start
+start  = time.time()
+as_log.columns
+print json.dumps( { 'seconds' : parsed, 'columns_seconds' : time.time() - start, 'lines' : len( as_log ) } )
+'''
+
+# ( message, thread ) templates of generated logs, close to the mix of a real render
+generated_messages = (
+    'loading project file ./scenes/shot_{i:04d}.appleseed...'                                              ,
+    'loaded mesh file ./_geometry/set_{i}_geo.obj (1 object, {n:,} vertices, {t:,} triangles) in {ms:,} ms.' ,
+    'opening texture file ./_textures/tex_{k}.exr for reading...'                                          ,
+    'rendering, {p:.1f}% done'                                                                             ,
+    'while loading mesh object "obj_{k}": no such file'                                                    ,
+    'scene diameter: {d:.3f}.'                                                                             ,
+    'using 8 threads for rendering.'                                                                       ,
+    'wrote image file ./frames/shot.{i:04d}.exr in {ms:,} ms.'                                             ,
+    'created intersection filter for object "obj_{k}.0" with 1 material (masks: 41 bytes, uvs: {p:.1f} KB).' ,
+    'some message not matching any parser {i}'                                                             )
+
+generated_cats = ( 'info', 'info', 'info', 'info', 'warning', 'debug', 'info', 'info', 'debug', 'debug' )
+
+def generated_lines( count ) :
+    """Yield the given number of log lines mixing every parsed message type."""
+    for i in xrange( count ) :
+        kind = i % len( generated_messages )
+        msg  = generated_messages[ kind ].format( i = i, n = i * 37 % 1000000, t = i * 71 % 2000000,
+                                                  ms = i % 50000, k = i % 997, p = i % 1000 / 10.0,
+                                                  d = i / 7.0 )
+        yield '2014-02-22T%02d:%02d:%02d.%06dZ <%03d> %5d MB %-7s | %s\n' % (
+            i // 3600000 % 24, i // 60000 % 60, i // 1000 % 60, i % 1000 * 1000,
+            i % 8 + 1, 10 + i % 3000, generated_cats[ kind ], msg )
+
+def generate_log( path, lines ) :
+    """Write a log of the given number of lines mixing every parsed message type."""
+    with open( path, 'wb' ) as log_file :
+        log_file.writelines( generated_lines( lines ) )
+
+def parse_cost( path, engine = 'regex', runs = 3, python = sys.executable ) :
+    """Return the median parse time (seconds) of the log at `path` with the given engine.
+
+    Also return the time to then build the column arrays from the parsed
+    lines, both engines parse message contents with the line.
+    """
+
+    results = list()
+    for _ in xrange( runs ) :
+        output = subprocess.check_output( [ python, '-c', parse_script % ( path, engine ) ] )
+        results.append( json.loads( output.splitlines()[ -1 ] ) )
+
+    return { 'engine'          : engine                                                ,
+             'lines'           : results[ 0 ][ 'lines' ]                               ,
+             'seconds'         : median( [ r[ 'seconds'         ] for r in results ] ) ,
+             'columns_seconds' : median( [ r[ 'columns_seconds' ] for r in results ] ) }
+
+def median( values ) :
+    values = sorted( values )
+    return values[ len( values ) // 2 ]
+
+def import_cost( module = 'appleseed_log', runs = 10, python = sys.executable ) :
+    """Return the median import time (seconds) and RSS growth (kB) of `module`.
+
+    Also return the Qt modules the import pulled in, which must stay empty
+    for the parsing core.
+    """
+
+    seconds = list()
+    rss_kb  = list()
+    modules = list()
+
+    for _ in xrange( runs ) :
+        output = subprocess.check_output( [ python, '-c', import_script % module ] )
+        result = json.loads( output.splitlines()[ -1 ] )
+        seconds.append( result[ 'seconds' ] )
+        rss_kb.append(  result[ 'rss_kb'  ] )
+        modules = result[ 'modules' ]
+
+    return { 'module'     : module            ,
+             'seconds'    : median( seconds ) ,
+             'rss_kb'     : median( rss_kb  ) ,
+             'qt_modules' : modules           }
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Benchmark the appleseed log parsing core.' )
+    parser.add_argument( 'modules' , nargs = '*', default = [ 'appleseed_log' ]                   )
+    parser.add_argument( '--lines' , default = 0, type = int, help = 'also parse a generated log' )
+    parser.add_argument( '--runs'  , default = 3, type = int                                      )
+    args = parser.parse_args()
+
+    for module in args.modules :
+        result = import_cost( module )
+        print "import {module:<24} {seconds:8.4f} s {rss_kb:8d} kB  Qt modules : {qt}".format(
+            qt = ', '.join( result[ 'qt_modules' ] ) or 'none', **result )
+
+    if args.lines :
+        handle, path = tempfile.mkstemp( suffix = '.log' )
+        os.close( handle )
+        try :
+            generate_log( path, args.lines )
+            for engine in ( 'regex', 'split' ) :
+                result = parse_cost( path, engine, args.runs )
+                print "parse  {engine:<24} {seconds:8.4f} s, columns {columns_seconds:8.4f} s ({lines} lines)".format(
+                    **result )
+        finally :
+            os.remove( path )
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,236 @@
+import array
+import bisect
+import collections
+import tempfile
+import threading
+import zlib
+
+# Compressed store of raw log lines.
+#
+# Lines are packed in blocks of about `block_size` bytes, each block is
+# compressed (zlib, or lzma when available) and a line number is resolved
+# through the first line number of each block. A few decompressed blocks
+# are kept in a LRU cache for browsing, and once the compressed blocks held
+# in memory exceed `memory_budget` the oldest ones are spilled to a
+# temporary file, so the text of a huge log fits a small workstation.
+#
+#   >>> store = BlockStore( 'zlib', memory_budget = 64 << 20 )
+#   >>> as_log = ASLog( 'frame.1001.log', store = store )
+#   >>> as_log.line_text( as_log[ 0 ] )
+#   '2014-02-22T15:44:52.991536Z <000>    10 MB info    | loading project file ...'
+
+block_codecs = ( 'zlib', 'lzma' )
+
+def block_codec( name, level = None ) :
+    """Return the ( compress, decompress ) functions of the given codec name."""
+
+    if name == 'zlib' :
+        level = 1 if level is None else level # fastest, blocks are compressed while parsing
+        return ( lambda data : zlib.compress( data, level ) ), zlib.decompress
+
+    if name == 'lzma' :
+        try :
+            import lzma
+        except ImportError :
+            try :
+                from backports import lzma
+            except ImportError :
+                raise ValueError( "The lzma block codec needs Python 3 or the backports.lzma package" )
+        level = 6 if level is None else level
+        return ( lambda data : lzma.compress( data, preset = level ) ), lzma.decompress
+
+    raise ValueError( "Unknown block codec %r, use one of %s" % ( name, ', '.join( block_codecs ) ) )
+
+
+class BlockStore( object ) :
+    """Append only list of raw lines, compressed in blocks.
+
+    Lines are expected to end with an end of line, a line without one (the
+    last line of a file) closes its block.
+
+    :Example:
+
+    >>> store = BlockStore( 'zlib', block_size = 1 << 16, cache_blocks = 16 )
+    >>> for line in open( 'frame.1001.log' ) :
+    ...     store.append( line )
+    >>> store[ 1203 ]
+    '2014-02-22T15:45:01.152378Z <003>  1021 MB info    | rendering, 42.5% done\\n'
+    >>> store.compressed_size * 1.0 / store.raw_size
+    0.087...
+    """
+
+    def __init__( self, codec = 'zlib', level = None, block_size = 1 << 16, cache_blocks = 16 ,
+                  memory_budget = 256 << 20, spill_dir = None ) :
+
+        self.codec         = codec
+        self.block_size    = block_size     # raw bytes per block
+        self.cache_blocks  = cache_blocks   # decompressed blocks kept
+        self.memory_budget = memory_budget  # compressed bytes kept in memory, the rest is spilled
+        self.spill_dir     = spill_dir      # directory of the spill file, the system one by default
+
+        self._compress, self._decompress = block_codec( codec, level )
+
+        self._firsts       = array.array( 'L' )  # first line number of each block
+        self._blocks       = list()              # compressed block, None once spilled
+        self._offsets      = array.array( 'd' )  # offset of each spilled block in the spill file (over 4 GB)
+        self._spill_file   = None
+        self._spill_size   = 0
+        self._memory       = 0                   # compressed bytes held in memory
+
+        self._pending      = list()              # lines of the block being filled
+        self._pending_size = 0
+        self._count        = 0
+
+        self._cache        = collections.OrderedDict()  # block index -> lines, least recent first
+        self._lock         = threading.Lock()
+
+        self.raw_size        = 0
+        self.compressed_size = 0
+
+    def __len__( self ) :
+        return self._count
+
+    def append( self, line ) :
+        """Append the given raw line, return its line number in the store."""
+        with self._lock :
+            self._pending.append( line )
+            self._pending_size += len( line )
+            self._count        += 1
+            if self._pending_size >= self.block_size or not line.endswith( '\n' ) :
+                self._close_block()
+            return self._count - 1
+
+    def extend( self, lines ) :
+        for line in lines :
+            self.append( line )
+
+    def _close_block( self ) :
+
+        if not self._pending :
+            return
+
+        data = self._compress( ''.join( self._pending ) )
+
+        self._firsts.append( self._count - len( self._pending ) )
+        self._blocks.append( data )
+        self.raw_size        += self._pending_size
+        self.compressed_size += len( data )
+        self._memory         += len( data )
+
+        self._pending      = list()
+        self._pending_size = 0
+
+        if self._memory > self.memory_budget :
+            self._spill()
+
+    def _spill( self ) :
+        """Move the oldest blocks held in memory to the spill file, down to half the budget."""
+
+        if self._spill_file is None :
+            self._spill_file = tempfile.TemporaryFile( prefix = 'appleseed_log_', suffix = '.blocks' ,
+                                                       dir = self.spill_dir                          )
+
+        self._spill_file.seek( self._spill_size )
+        for i in xrange( len( self._offsets ), len( self._blocks ) ) :
+            if self._memory <= self.memory_budget // 2 :
+                break
+            data = self._blocks[ i ]
+            self._spill_file.write( data )
+            self._offsets.append( self._spill_size )
+            self._spill_size   += len( data )
+            self._memory       -= len( data )
+            self._blocks[ i ]   = None
+        self._spill_file.flush()
+
+    def _block_data( self, i ) :
+        data = self._blocks[ i ]
+        if data is None :
+            start = int( self._offsets[ i ] )
+            end   = int( self._offsets[ i + 1 ] ) if i + 1 < len( self._offsets ) else self._spill_size
+            self._spill_file.seek( start )
+            data = self._spill_file.read( end - start )
+        return data
+
+    def _block_lines( self, i ) :
+        """Return the lines of the given block, through the cache."""
+
+        lines = self._cache.pop( i, None )
+        if lines is None :
+            parts = self._decompress( self._block_data( i ) ).split( '\n' )
+            last  = parts.pop()
+            lines = [ part + '\n' for part in parts ]
+            end   = self._firsts[ i + 1 ] if i + 1 < len( self._firsts ) else self._count - len( self._pending )
+            if len( lines ) < end - self._firsts[ i ] :
+                lines.append( last )  # line without end of line, maybe empty
+            while len( self._cache ) >= self.cache_blocks :
+                self._cache.popitem( last = False )
+
+        self._cache[ i ] = lines
+        return lines
+
+    def __getitem__( self, number ) :
+        """Return the raw line of the given line number."""
+
+        if number < 0 :
+            number += self._count
+        if not 0 <= number < self._count :
+            raise IndexError( "Line %d out of the store range (%d lines)" % ( number, self._count ) )
+
+        with self._lock :
+            first = self._count - len( self._pending )
+            if number >= first :
+                return self._pending[ number - first ]
+            i = bisect.bisect_right( self._firsts, number ) - 1
+            return self._block_lines( i )[ number - self._firsts[ i ] ]
+
+    def lines( self, first = 0, last = None ) :
+        """Yield the raw lines from `first` to `last` (included), a block at a time."""
+
+        last = self._count - 1 if last is None else min( last, self._count - 1 )
+        while first <= last :
+            with self._lock :
+                pending_first = self._count - len( self._pending )
+                if first >= pending_first :
+                    lines = self._pending[ first - pending_first : last - pending_first + 1 ]
+                else :
+                    i     = bisect.bisect_right( self._firsts, first ) - 1
+                    lines = self._block_lines( i )[ first - self._firsts[ i ] : last - self._firsts[ i ] + 1 ]
+            if not lines :
+                break # closed meanwhile
+            for line in lines :
+                yield line
+            first += len( lines )
+
+    def __iter__( self ) :
+        return self.lines()
+
+    @property
+    def block_count( self ) :
+        return len( self._blocks ) + ( 1 if self._pending else 0 )
+
+    @property
+    def spilled_blocks( self ) :
+        return len( self._offsets )
+
+    @property
+    def memory_size( self ) :
+        """Return the approximate bytes of text held in memory (compressed, pending and cached blocks)."""
+        with self._lock :
+            cached = sum( len( line ) for lines in self._cache.itervalues() for line in lines )
+            return self._memory + self._pending_size + cached
+
+    def close( self ) :
+        """Drop the blocks and delete the spill file."""
+        with self._lock :
+            if self._spill_file is not None :
+                self._spill_file.close()
+                self._spill_file = None
+            self._firsts       = array.array( 'L' )
+            self._blocks       = list()
+            self._offsets      = array.array( 'd' )
+            self._spill_size   = 0
+            self._memory       = 0
+            self._pending      = list()
+            self._pending_size = 0
+            self._count        = 0
+            self._cache.clear()
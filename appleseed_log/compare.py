@@ -0,0 +1,347 @@
+import array
+import bisect
+import copy
+import json
+import multiprocessing
+
+from .log import ASLog
+
+################################################################################
+# Profiles
+################################################################################
+def new_profile( path, session, line_data ) :
+    """Return the empty profile (dict) of a render session starting with the given line."""
+    return { 'path'                : path                                                ,
+             'session'             : session                                             ,
+             'project'             : line_data.content( 'project_file_path' )            ,
+             'options'             : dict()                                              ,
+             'start'               : line_data.timestamp                                 ,
+             'duration'            : 0.0                                                 ,
+             'vm_peak'             : line_data.vm                                        ,
+             'progress_times'      : array.array( 'd' )                                  ,
+             'progress_values'     : array.array( 'd' )                                  ,
+             'scene_load'          : { 'mesh_files'    : 0   ,
+                                       'mesh_ms'       : 0   ,
+                                       'objects'       : 0   ,
+                                       'vertices'      : 0   ,
+                                       'triangles'     : 0   ,
+                                       'texture_opens' : 0   ,
+                                       'load_seconds'  : 0.0 }                           ,
+             'wrote_image_file_ms' : list()                                              }
+
+
+class ASLogProfiler( object ) :
+    """Subscriber building a compact, picklable profile (dict) per render session of a log.
+
+    Sessions start at each "loading project file" line, so the scene load,
+    progress curve and render options of two renders written in the same
+    log don't mix. The profiles are everything the comparison needs so we
+    never have to send whole parsed logs between processes.
+
+    :Example:
+
+    >>> as_log   = ASLog( 'frame.1001.log', parse = False, keep_lines = False )
+    >>> profiler = ASLogProfiler( as_log )
+    >>> as_log.update()
+    >>> [ profile[ 'duration' ] for profile in profiler.profiles ]
+    [1401.5, 277.2]
+    """
+
+    def __init__( self, as_log, subscribe = True ) :
+
+        self.path     = as_log.path
+        self.as_log   = as_log
+        self.profiles = list()
+
+        self._progress        = 0.0
+        self._first_mesh_time = None
+
+        if subscribe :
+            as_log.subscribe( self.add )
+            as_log.subscribe( self.add_options, types = ( 'render_options', ) )
+
+    def add( self, line_data ) :
+
+        line_type = line_data.msg_type
+
+        if line_type == 'loading_project_file' or not self.profiles :
+            self.profiles.append( new_profile( self.path, len( self.profiles ), line_data ) )
+            self._progress        = 0.0
+            self._first_mesh_time = None
+
+        profile = self.profiles[ -1 ]
+        elapsed = ( line_data.timestamp - profile[ 'start' ] ).total_seconds()
+        profile[ 'duration' ] = elapsed
+        profile[ 'vm_peak'  ] = max( profile[ 'vm_peak' ], line_data.vm )
+
+        if line_type == 'rendering_progress' :
+            # several threads report progress, keep the curve monotonic
+            self._progress = max( self._progress, line_data.content( 'percentage' ) )
+            profile[ 'progress_times'  ].append( elapsed )
+            profile[ 'progress_values' ].append( self._progress )
+
+        elif line_type == 'loaded_mesh_file' :
+            scene_load = profile[ 'scene_load' ]
+            scene_load[ 'mesh_files' ] += 1
+            scene_load[ 'mesh_ms'    ] += line_data.content( 'milliseconds' )
+            scene_load[ 'objects'    ] += line_data.content( 'objects'      )
+            scene_load[ 'vertices'   ] += line_data.content( 'vertices'     )
+            scene_load[ 'triangles'  ] += line_data.content( 'triangles'    )
+
+            if self._first_mesh_time is None :
+                self._first_mesh_time = line_data.timestamp
+            scene_load[ 'load_seconds' ] = ( line_data.timestamp - self._first_mesh_time ).total_seconds()
+
+        elif line_type == 'opening_texture_file' :
+            profile[ 'scene_load' ][ 'texture_opens' ] += 1
+
+        elif line_type == 'wrote_image_file' :
+            profile[ 'wrote_image_file_ms' ].append( line_data.content( 'milliseconds' ) )
+
+    def add_options( self, line_data ) :
+        """Keep the render options of the session whose option block ends with the given line."""
+        if self.profiles :
+            self.profiles[ -1 ][ 'options' ] = copy.deepcopy( self.as_log.render_options )
+
+    def finish( self ) :
+        """Return the session profiles, ready to be pickled."""
+        for profile in self.profiles :
+            profile.pop( 'start', None )
+        return self.profiles
+
+def log_profiles( as_log ) :
+    """Return the session profiles of an already parsed log.
+
+    Its lines are replayed, every session gets the final render options of
+    the log: use `profile_log_file()` for per session options.
+    """
+    profiler = ASLogProfiler( as_log, subscribe = False )
+    for line_data in as_log.lines :
+        profiler.add( line_data )
+    for profile in profiler.profiles :
+        profile[ 'options' ] = as_log.render_options
+    return profiler.finish()
+
+def profile_log_file( path ) :
+    """Parse the given log file, without keeping its lines, and return its session profiles."""
+    as_log   = ASLog( path, parse = False, engine = 'split', keep_lines = False, summary = False )
+    profiler = ASLogProfiler( as_log )
+    as_log.update()
+    return profiler.finish()
+
+def load_profiles( paths, processes = None ) :
+    """Parse the given log files concurrently and return their session profiles (list per log).
+
+    Order of returned profiles follow the order of the given paths. Use
+    `processes = 1` to parse in the current process.
+    """
+
+    paths = list( paths )
+
+    if processes == 1 or len( paths ) < 2 :
+        return [ profile_log_file( path ) for path in paths ]
+
+    processes = min( processes or multiprocessing.cpu_count(), len( paths ) )
+    pool      = multiprocessing.Pool( processes )
+    try :
+        return pool.map( profile_log_file, paths )
+    finally :
+        pool.close()
+        pool.join()
+
+def name_profiles( log_profiles ) :
+    """Give each session profile of the given logs a unique 'name'.
+
+    The name is the log path, followed by '#<session>' for logs of several
+    sessions and by ' [<position>]' for logs given more than once.
+    """
+
+    counts = dict()
+    for profiles in log_profiles :
+        if profiles :
+            counts[ profiles[ 0 ][ 'path' ] ] = counts.get( profiles[ 0 ][ 'path' ], 0 ) + 1
+
+    for position, profiles in enumerate( log_profiles ) :
+        for profile in profiles :
+            name = profile[ 'path' ]
+            if len( profiles ) > 1 :
+                name += '#%d' % profile[ 'session' ]
+            if counts[ profile[ 'path' ] ] > 1 :
+                name += ' [%d]' % position
+            profile[ 'name' ] = name
+
+################################################################################
+# Alignment
+################################################################################
+def normalized_grid( samples ) :
+    """Return `samples` regularly spaced values from 0.0 to 1.0."""
+    if samples < 2 :
+        return array.array( 'd', [ 0.0 ] )
+    step = 1.0 / ( samples - 1 )
+    return array.array( 'd', [ i * step for i in xrange( samples ) ] )
+
+def resample_step( times, values, grid, scale = 1.0 ) :
+    """Resample a step curve (sorted `times`, `values`) on the given sorted grid.
+
+    Each grid point takes the latest value at or before `grid[i] * scale`.
+    Both sequences are walked once, so cost is O(len(times) + len(grid)).
+    """
+
+    result = array.array( 'd', [ 0.0 ] ) * len( grid )
+    count  = len( times )
+    j      = 0
+    value  = 0.0
+
+    for i, t in enumerate( grid ) :
+        t *= scale
+        while j < count and times[ j ] <= t :
+            value = values[ j ]
+            j    += 1
+        result[ i ] = value
+
+    return result
+
+def time_to_progress( times, values, percentage ) :
+    """Return the time the monotonic progress curve reached `percentage`, None if never."""
+    i = bisect.bisect_left( values, percentage )
+    if i == len( values ) :
+        return None
+    return times[ i ]
+
+################################################################################
+# Diff
+################################################################################
+def diff_dicts( reference, other ) :
+    """Return { key : ( reference value, other value ) } for differing keys.
+
+    Nested dicts (option blocks) are diffed recursively.
+    """
+
+    diff = dict()
+
+    for key in set( reference ) | set( other ) :
+        ref_value   = reference.get( key )
+        other_value = other.get(     key )
+
+        if isinstance( ref_value, dict ) and isinstance( other_value, dict ) :
+            sub_diff = diff_dicts( ref_value, other_value )
+            if sub_diff :
+                diff[ key ] = sub_diff
+        elif ref_value != other_value :
+            diff[ key ] = ( ref_value, other_value )
+
+    return diff
+
+def delta( reference, other ) :
+    """Return ( reference, other, absolute delta, relative delta ) of two numbers."""
+    absolute = other - reference
+    relative = float( absolute ) / reference if reference else None
+    return ( reference, other, absolute, relative )
+
+
+class ASLogComparison( object ) :
+    """Compare N appleseed logs against the first one, render session per render session.
+
+    Session i of a log is compared with session i of the first log, or its
+    last session when it has fewer. Diffs are keyed by profile name (see
+    `name_profiles()`), the log path for logs of a single session.
+
+    :Example:
+
+    >>> comparison = ASLogComparison( [ 'before.log', 'after.log' ] )
+    >>> comparison.diff[ 'after.log' ][ 'options' ]
+    {'path_tracing_settings': {'max_path_length': (4, 8)}}
+    >>> comparison.diff[ 'after.log' ][ 'wrote_image_file_ms' ]
+    (120441, 151203, 30762, 0.2554...)
+    >>> comparison.dump( 'before_vs_after.json' )
+    """
+
+    def __init__( self, paths, processes = None, samples = 101 ) :
+
+        self._log_profiles = load_profiles( paths, processes )
+        name_profiles( self._log_profiles )
+        self._profiles = [ profile for profiles in self._log_profiles for profile in profiles ]
+        self._grid     = normalized_grid( samples )
+        self._curves   = list()
+        self._diff     = dict()
+
+        self._align()
+        self._compare()
+
+    def _align( self ) :
+        """Resample every progress curve on the shared normalized time grid."""
+        for profile in self._profiles :
+            curve = resample_step( profile[ 'progress_times'  ] ,
+                                   profile[ 'progress_values' ] ,
+                                   self._grid                   ,
+                                   profile[ 'duration'        ] )
+            self._curves.append( curve )
+
+    def _compare( self ) :
+        """Fill the diff of every profile against the reference (first) one."""
+
+        if not self._profiles or not self._log_profiles[0] :
+            return
+
+        references = self._log_profiles[0]
+        curves     = dict( ( profile[ 'name' ], curve ) for profile, curve in zip( self._profiles, self._curves ) )
+
+        for profile in self._profiles[ len( references ): ] :
+
+            reference       = references[ min( profile[ 'session' ], len( references ) - 1 ) ]
+            reference_curve = curves[ reference[ 'name' ] ]
+            curve           = curves[ profile[ 'name' ] ]
+
+            deltas = [ abs( a - b ) for a, b in zip( reference_curve, curve ) ]
+
+            progress = { 'max_delta'  : max( deltas )                    ,
+                         'mean_delta' : sum( deltas ) / len( deltas )    ,
+                         'time_to_50' : ( time_to_progress( reference[ 'progress_times' ], reference[ 'progress_values' ], 50.0 ) ,
+                                          time_to_progress( profile[   'progress_times' ], profile[   'progress_values' ], 50.0 ) ) }
+
+            scene_load = dict()
+            for key, ref_value in reference[ 'scene_load' ].items() :
+                scene_load[ key ] = delta( ref_value, profile[ 'scene_load' ][ key ] )
+
+            self._diff[ profile[ 'name' ] ] = {
+                'reference'           : reference[ 'name' ]                                        ,
+                'options'             : diff_dicts( reference[ 'options' ], profile[ 'options' ] ) ,
+                'duration'            : delta( reference[ 'duration' ], profile[ 'duration' ] )    ,
+                'vm_peak'             : delta( reference[ 'vm_peak'  ], profile[ 'vm_peak'  ] )    ,
+                'wrote_image_file_ms' : delta( sum( reference[ 'wrote_image_file_ms' ] ) ,
+                                               sum( profile[   'wrote_image_file_ms' ] ) )         ,
+                'scene_load'          : scene_load                                                 ,
+                'progress'            : progress                                                   }
+
+    @property
+    def profiles( self ) :
+        """Return the profile (dict) of every render session of the compared logs."""
+        return self._profiles
+
+    @property
+    def grid( self ) :
+        """Return the normalized time grid progress curves are aligned on."""
+        return self._grid
+
+    @property
+    def progress_curves( self ) :
+        """Return the aligned progress curves, in the order of `profiles`."""
+        return self._curves
+
+    @property
+    def diff( self ) :
+        """Return the structured diff (dict) of every log against the first one."""
+        return self._diff
+
+    def to_dict( self ) :
+        """Return the comparison as a json serializable dict."""
+        return { 'reference' : self._profiles[0][ 'path' ] if self._profiles else None ,
+                 'sessions'  : [ p[ 'name' ] for p in self._profiles ]                  ,
+                 'grid'      : list( self._grid )                                       ,
+                 'curves'    : [ list( c ) for c in self._curves ]                      ,
+                 'diff'      : self._diff                                               }
+
+    def dump( self, path ) :
+        """Write the comparison as json at the given path."""
+        with open( path, 'w' ) as json_file :
+            json.dump( self.to_dict(), json_file, indent = 4, sort_keys = True )
@@ -0,0 +1,264 @@
+import argparse
+import os
+import random
+import sys
+from timeit import default_timer as timer
+
+from .benchmark import generated_lines
+from .log import ASLog, line_engines
+from .reference import ReferenceLine
+from .summary import ASLogSummary
+
+# Differential conformance harness of the line parsing engines.
+#
+# Every engine is run with the frozen reference parser (`appleseed_log.reference`)
+# over log files, generated lines and fuzzed mutations of both, and the
+# first divergence of each field is reported with both values, next to the
+# time each parser took. Whole logs are also compared on their render
+# options and ranges, and their summaries must survive a json round trip.
+#
+#   python -m appleseed_log.conformance appleseed2.log --generated 20000 --fuzz 50000
+
+# compared attributes of parsed lines
+line_fields = ( 'thread_id'                    ,
+                'vm'                           ,
+                'msg_cat'                      ,
+                'msg_rest'                     ,
+                'msg_content'                  ,
+                'timestamp'                    ,
+                'is_empty'                     ,
+                'frame_setting_trigger'        ,
+                'path_tracing_setting_trigger' )
+
+def line_values( line_class, line, number ) :
+    """Return the parse result (dict) of the given line with the given line class.
+
+    'parsed' is True or the name of the exception raised for unparsable
+    lines, a field raising an exception holds ( 'raised', exception name ).
+    """
+    try :
+        line_data = line_class( line, number )
+    except Exception as e :
+        return { 'parsed' : type( e ).__name__ }
+
+    values = { 'parsed' : True }
+    for field in line_fields :
+        try :
+            values[ field ] = getattr( line_data, field )
+        except Exception as e :
+            values[ field ] = ( 'raised', type( e ).__name__ )
+    return values
+
+################################################################################
+# Line sources
+################################################################################
+def file_lines( path ) :
+    """Return the raw lines of the given log, as `ASLog` reads them."""
+    return list( ASLog( path, parse = False )._lines )
+
+odd_thread_ids = ( '<1>', '<01>', '<0001>', '<abc>', '< 12>', '<-12>', '<12 >', '<999>', '<>', '001' )
+
+def group_digits( text ) :
+    """Return the given digit string grouped by thousands with commas."""
+    return '{0:,}'.format( int( text ) )
+
+def mutate( line, rng ) :
+    """Return a random mutation of the given raw line."""
+
+    kind = rng.randrange( 12 )
+
+    if kind == 0 and line :                                      # truncated
+        return line[ : rng.randrange( len( line ) ) ]
+    if kind == 1 :                                               # no end of line
+        return line.rstrip( '\n' )
+    if kind == 2 :                                               # odd thread ID
+        start = line.find( '<' )
+        if start >= 0 :
+            return line[ :start ] + rng.choice( odd_thread_ids ) + line[ start + 5: ]
+    if kind == 3 :                                               # comma grouped numbers
+        digits = [ i for i, c in enumerate( line ) if c.isdigit() and not line[ i - 1 : i ].isdigit() ]
+        if digits :
+            start = rng.choice( digits )
+            end   = start
+            while end < len( line ) and line[ end ].isdigit() :
+                end += 1
+            return line[ :start ] + group_digits( line[ start : end ] ) + line[ end: ]
+    if kind == 4 :                                               # other whitespaces
+        spaces = [ i for i, c in enumerate( line ) if c == ' ' ]
+        if spaces :
+            i = rng.choice( spaces )
+            return line[ :i ] + rng.choice( ( '\t', '  ', '', '\x0b', '\r' ) ) + line[ i + 1: ]
+    if kind == 5 and line :                                      # random character
+        i = rng.randrange( len( line ) )
+        return line[ :i ] + chr( rng.randrange( 32, 127 ) ) + line[ i + 1: ]
+    if kind == 6 and line :                                      # extra pipe
+        i = rng.randrange( len( line ) )
+        return line[ :i ] + '|' + line[ i: ]
+    if kind == 7 :                                               # windows end of line
+        return line.rstrip( '\n' ) + '\r\n'
+    if kind == 8 :                                               # leading space
+        return ' ' + line
+    if kind == 9 :                                               # impossible date
+        return line.replace( '-02-', '-13-', 1 )
+    if kind == 10 :                                              # empty or blank line
+        return rng.choice( ( '', '\n', ' \n', '|\n' ) )
+    if kind == 11 :                                              # message indented or not
+        return line.replace( '| ', rng.choice( ( '|', '|    ', '|\t' ) ), 1 )
+    return line
+
+def fuzzed_lines( seeds, count, seed = 0 ) :
+    """Return `count` mutations (up to 3 each) of lines picked from `seeds`."""
+    rng   = random.Random( seed )
+    lines = list()
+    for _ in xrange( count ) :
+        line = rng.choice( seeds )
+        for _ in xrange( rng.randint( 1, 3 ) ) :
+            line = mutate( line, rng )
+        lines.append( line )
+    return lines
+
+################################################################################
+# Comparison
+################################################################################
+def time_parse( line_class, lines ) :
+    """Return the seconds to parse the given lines and to then read their fields."""
+    start  = timer()
+    parsed = list()
+    for number, line in enumerate( lines ) :
+        try :
+            parsed.append( line_class( line, number ) )
+        except Exception :
+            pass
+    parse = timer() - start
+
+    start = timer()
+    for line_data in parsed :
+        for field in line_fields :
+            try :
+                getattr( line_data, field )
+            except Exception :
+                pass
+    return parse, timer() - start
+
+
+class ASLogConformance( object ) :
+    """Differences between an engine and the reference parser on given lines.
+
+    :Example:
+
+    >>> conformance = ASLogConformance( 'split', file_lines( 'appleseed2.log' ) )
+    >>> conformance.divergent_lines
+    0
+    >>> conformance.first_divergences
+    {}
+    """
+
+    def __init__( self, engine, lines, reference = ReferenceLine ) :
+
+        self.engine             = engine
+        self.lines              = len( lines )
+        self.divergent_lines    = 0
+        self.counts             = dict()  # field -> divergent line count
+        self.first_divergences  = dict()  # field -> ( line index, line, reference value, engine value )
+
+        line_class = line_engines[ engine ] if isinstance( engine, basestring ) else engine
+
+        for number, line in enumerate( lines ) :
+            expected = line_values( reference , line, number )
+            actual   = line_values( line_class, line, number )
+            if expected == actual :
+                continue
+            self.divergent_lines += 1
+            for field in sorted( set( expected ) | set( actual ) ) :
+                if expected.get( field ) != actual.get( field ) :
+                    self.counts[ field ] = self.counts.get( field, 0 ) + 1
+                    if field not in self.first_divergences :
+                        self.first_divergences[ field ] = ( number, line, expected.get( field ), actual.get( field ) )
+
+        self.reference_seconds = time_parse( reference , lines )
+        self.engine_seconds    = time_parse( line_class, lines )
+
+    def report( self, title ) :
+        """Return the readable report of the comparison as a string."""
+        lines = [ "%s : %d lines, %d divergent" % ( title, self.lines, self.divergent_lines ) ,
+                  "    reference  parse %8.4f s  fields %8.4f s" % self.reference_seconds           ,
+                  "    %-10s parse %8.4f s  fields %8.4f s" % ( ( self.engine, ) + self.engine_seconds ) ]
+        for field, ( number, line, expected, actual ) in sorted( self.first_divergences.items() ) :
+            lines.append( "    %s differs on %d lines, first at %d : %r" % ( field, self.counts[ field ], number, line ) )
+            lines.append( "        reference : %r" % ( expected, ) )
+            lines.append( "        %-9s : %r" % ( self.engine, actual ) )
+        return '\n'.join( lines )
+
+def compare_logs( path, engine ) :
+    """Return the differences (dict of name -> ( reference, engine )) of a whole parsed log."""
+
+    expected = ASLog( path, engine = ReferenceLine )
+    actual   = ASLog( path, engine = engine        )
+
+    differences = dict()
+    for name, value in ( ( 'render_options'  , lambda as_log : as_log.render_options   ) ,
+                         ( 'ranges'          , lambda as_log : as_log.ranges           ) ,
+                         ( 'lines'           , lambda as_log : len( as_log )           ) ,
+                         ( 'unparsable_count', lambda as_log : as_log.unparsable_count ) ,
+                         ( 'numbers'         , lambda as_log : [ l.number for l in as_log.lines ] ) ) :
+        if value( expected ) != value( actual ) :
+            differences[ name ] = ( value( expected ), value( actual ) )
+    return differences
+
+def summary_round_trip( path, engine ) :
+    """Return the differences (dict of name -> ( summary, loaded summary )) of a log summary dumped and loaded back."""
+    import tempfile
+
+    summary = ASLogSummary().add_log( ASLog( path, engine = engine, keep_lines = False, summary = True ) )
+
+    handle, json_path = tempfile.mkstemp( suffix = '.summary.json' )
+    os.close( handle )
+    try :
+        summary.dump( json_path )
+        try :
+            loaded = ASLogSummary.load( json_path )
+        except Exception as e :
+            return { 'load' : ( None, type( e ).__name__ ) }
+    finally :
+        os.remove( json_path )
+
+    if loaded != summary :
+        return { 'summary' : ( summary.to_dict(), loaded.to_dict() ) }
+    return dict()
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Compare parsing engines with the reference parser.' )
+    parser.add_argument( 'logs'        , nargs = '*'                                                        )
+    parser.add_argument( '--engine'    , action = 'append', choices = sorted( line_engines ),
+                         help = 'engine to check, every engine by default'                                  )
+    parser.add_argument( '--generated' , default = 20000, type = int, help = 'generated lines'              )
+    parser.add_argument( '--fuzz'      , default = 20000, type = int, help = 'fuzzed lines'                 )
+    parser.add_argument( '--seed'      , default = 0    , type = int                                        )
+    args = parser.parse_args()
+
+    sources = [ ( path, file_lines( path ) ) for path in args.logs ]
+    sources.append( ( 'generated', list( generated_lines( args.generated ) ) ) )
+    seeds = [ line for _, lines in sources for line in lines ]
+    sources.append( ( 'fuzzed', fuzzed_lines( seeds, args.fuzz, args.seed ) ) )
+
+    conform = True
+    for engine in args.engine or sorted( line_engines ) :
+
+        for title, lines in sources :
+            conformance = ASLogConformance( engine, lines )
+            conform     = conform and not conformance.divergent_lines
+            print conformance.report( "%s, %s" % ( engine, title ) )
+
+        for path in args.logs :
+            differences = compare_logs( path, engine )
+            differences.update( summary_round_trip( path, engine ) )
+            for name, ( expected, actual ) in sorted( differences.items() ) :
+                conform = False
+                print "%s, %s : %s differs\n    reference : %r\n    %-9s : %r" % ( engine, path, name,
+                                                                                  expected, engine, actual )
+
+    sys.exit( 0 if conform else 1 )
+
+if __name__ == '__main__' :
+    main()
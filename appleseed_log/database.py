@@ -0,0 +1,370 @@
+import argparse
+import bisect
+import calendar
+import copy
+import fnmatch
+import json
+import multiprocessing
+import os
+import sqlite3
+
+from .log import ASLog, problem_msg_cats
+
+# SQLite export of parsed logs for queries spanning many renders.
+#
+# Logs, render sessions (starting at "loading project file"), lines, typed
+# events and render options go in normalized tables indexed on time,
+# category, type and path. Logs are parsed in worker processes and inserted
+# in large transactions, a log whose size and mtime didn't change since its
+# previous export is skipped.
+#
+#   python -m appleseed_log.database renders.db /renders/logs --pattern "*.log"
+#   python -m appleseed_log.database renders.db --sql "select path, count(*) from texture_opens group by path"
+
+schema = '''
+create table if not exists logs (
+    id          integer primary key ,
+    path        text unique         ,
+    size        integer             ,
+    mtime       real                ,
+    first_time  real                ,  -- unix seconds (logs are UTC)
+    last_time   real                ,
+    line_count  integer             ,
+    unparsable  integer             );
+
+create table if not exists sessions (
+    log_id      integer             ,
+    session     integer             ,  -- 0 based, per log
+    project     text                ,
+    first_line  integer             ,
+    last_line   integer             ,
+    start_time  real                ,
+    end_time    real                ,
+    primary key ( log_id, session ) );
+
+create table if not exists lines (
+    log_id      integer ,
+    session     integer ,
+    number      integer ,
+    time        real    ,
+    thread_id   integer ,
+    vm          integer ,  -- MB
+    msg_cat     text    ,
+    type        text    ,
+    path        text    ,
+    msg_rest    text    );
+
+create table if not exists mesh_loads (
+    log_id       integer ,
+    session      integer ,
+    number       integer ,
+    time         real    ,
+    path         text    ,
+    objects      integer ,
+    vertices     integer ,
+    triangles    integer ,
+    milliseconds integer );
+
+create table if not exists texture_opens (
+    log_id      integer ,
+    session     integer ,
+    number      integer ,
+    time        real    ,
+    path        text    );
+
+create table if not exists progress (
+    log_id      integer ,
+    session     integer ,
+    number      integer ,
+    time        real    ,
+    thread_id   integer ,
+    percentage  real    );
+
+create table if not exists problems (
+    log_id      integer ,
+    session     integer ,
+    number      integer ,
+    time        real    ,
+    msg_cat     text    ,  -- warning/error/fatal
+    object      text    ,  -- mesh object name of "while loading mesh object" lines
+    message     text    );
+
+create table if not exists options (
+    log_id      integer ,
+    session     integer ,
+    section     text    ,  -- frame_settings/path_tracing_settings
+    name        text    ,
+    value       text    );  -- json
+
+create index if not exists lines_time          on lines ( time );
+create index if not exists lines_msg_cat       on lines ( msg_cat );
+create index if not exists lines_type          on lines ( type );
+create index if not exists lines_path          on lines ( path );
+create index if not exists lines_log           on lines ( log_id, number );
+create index if not exists mesh_loads_path     on mesh_loads ( path );
+create index if not exists mesh_loads_time     on mesh_loads ( time );
+create index if not exists texture_opens_path  on texture_opens ( path );
+create index if not exists texture_opens_time  on texture_opens ( time );
+create index if not exists progress_log        on progress ( log_id, session, time );
+create index if not exists problems_msg_cat    on problems ( msg_cat );
+create index if not exists problems_time       on problems ( time );
+create index if not exists options_log         on options ( log_id, session );
+'''
+
+# tables holding rows of a log, in insert order, and their column count
+log_tables = ( ( 'sessions'     , 7  ) ,
+               ( 'lines'        , 10 ) ,
+               ( 'mesh_loads'   , 9  ) ,
+               ( 'texture_opens', 5  ) ,
+               ( 'progress'     , 6  ) ,
+               ( 'problems'     , 7  ) ,
+               ( 'options'      , 5  ) )
+
+def unix_time( timestamp ) :
+    """Return the unix seconds of the given UTC `datetime`."""
+    return calendar.timegm( timestamp.utctimetuple() ) + timestamp.microsecond / 1e6
+
+def log_rows( as_log, options = None ) :
+    """Return the rows (dict of table name -> list of tuples) of the given parsed log.
+
+    Rows don't hold the log ID, it's only known once the log row is inserted.
+    `options` is the list of ( line number, render options ) taken at the
+    end of each option block, see `log_file_rows()`. Without it every
+    session gets the final render options of the log.
+    """
+
+    rows     = dict( ( table, list() ) for table, _ in log_tables )
+    sessions = rows[ 'sessions' ]
+    session  = None
+
+    for line_data in as_log.lines :
+
+        line_type = line_data.msg_type
+        number    = line_data.number
+        time      = unix_time( line_data.timestamp )
+
+        if line_type == 'loading_project_file' or session is None :
+            session = [ len( sessions ), line_data.content( 'project_file_path' ), number, number, time, time ]
+            sessions.append( session )
+        session[ 3 ] = number
+        session[ 5 ] = time
+        session_id   = session[ 0 ]
+
+        path = line_data.path
+
+        rows[ 'lines' ].append( ( session_id, number, time, line_data.thread_id, line_data.vm,
+                                  line_data.msg_cat, line_type, path, line_data.msg_rest ) )
+
+        if line_type == 'loaded_mesh_file' :
+            rows[ 'mesh_loads' ].append( ( session_id, number, time, path, line_data.content( 'objects' ),
+                                           line_data.content( 'vertices' ), line_data.content( 'triangles' ),
+                                           line_data.content( 'milliseconds' ) ) )
+        elif line_type == 'opening_texture_file' :
+            rows[ 'texture_opens' ].append( ( session_id, number, time, path ) )
+        elif line_type == 'rendering_progress' :
+            rows[ 'progress' ].append( ( session_id, number, time, line_data.thread_id, line_data.content( 'percentage' ) ) )
+
+        if line_data.msg_cat in problem_msg_cats :
+            rows[ 'problems' ].append( ( session_id, number, time, line_data.msg_cat,
+                                         line_data.content( 'object' ), line_data.msg_rest.strip() ) )
+
+    rows[ 'sessions' ] = [ tuple( session ) for session in sessions ]
+
+    # options of a session are the latest ones taken in its lines
+    session_options = dict()
+    if options is None :
+        session_options = dict( ( session[ 0 ], as_log.render_options ) for session in sessions )
+    else :
+        first_lines = [ session[ 2 ] for session in sessions ]
+        for number, render_options in options :
+            session_options[ max( 0, bisect.bisect_right( first_lines, number ) - 1 ) ] = render_options
+
+    for session_id, render_options in sorted( session_options.items() ) :
+        for section, settings in sorted( render_options.items() ) :
+            for name, value in sorted( settings.items() ) :
+                # json has no infinity, keep the log spelling
+                if value == float( 'inf' ) :
+                    value = 'infinite'
+                rows[ 'options' ].append( ( session_id, section, name, json.dumps( value ) ) )
+
+    return rows
+
+def log_row( as_log ) :
+    """Return the logs table values of the given parsed log, but its path, size and mtime."""
+    ranges = as_log.ranges
+    return ( unix_time( ranges[ 'first_datetime' ] ) if ranges[ 'first_datetime' ] else None ,
+             unix_time( ranges[ 'last_datetime'  ] ) if ranges[ 'last_datetime'  ] else None ,
+             len( as_log ), as_log.unparsable_count )
+
+def log_file_rows( path ) :
+    """Return ( path, ( size, mtime ), log row, rows ) of the log at the given path (for worker processes).
+
+    The log is stat before it's read, a log growing meanwhile is then seen
+    as changed by the next export. Render options are taken at the end of
+    each option block, so each session gets its own.
+    """
+    stat    = os.stat( path )
+    as_log  = ASLog( path, parse = False, engine = 'split' )
+    options = list()
+    as_log.subscribe( lambda line_data : options.append( ( line_data.number, copy.deepcopy( as_log.render_options ) ) ),
+                      types = ( 'render_options', ) )
+    as_log.update()
+    return path, ( stat.st_size, stat.st_mtime ), log_row( as_log ), log_rows( as_log, options )
+
+
+class ASLogDatabase( object ) :
+    """A SQLite database of parsed logs.
+
+    :Example:
+
+    >>> database = ASLogDatabase( 'renders.db' )
+    >>> database.add_logs( [ 'frame.1001.log', 'frame.1002.log' ] )
+    (2, 0)
+    >>> database.query( 'select path, count(*) from texture_opens group by path order by 2 desc limit 5' )
+    [(u'./_textures/wood.exr', 6), ...]
+    """
+
+    def __init__( self, path ) :
+
+        self.path       = path
+        self.connection = sqlite3.connect( path )
+        self.connection.execute( 'pragma journal_mode = wal'  )
+        self.connection.execute( 'pragma synchronous = normal' )
+        self.connection.executescript( schema )
+        self._migrate()
+
+    def close( self ) :
+        self.connection.close()
+
+    def _migrate( self ) :
+        """Upgrade tables of a database written by a previous version."""
+
+        # options weren't per session, recreate them and export logs again
+        columns = [ row[ 1 ] for row in self.connection.execute( 'pragma table_info( options )' ) ]
+        if 'session' not in columns :
+            with self.connection :
+                self.connection.execute( 'drop table options' )
+                self.connection.execute( 'update logs set mtime = null' )
+            self.connection.executescript( schema )
+
+    def query( self, sql, parameters = () ) :
+        """Return the rows (list of tuples) of the given SQL query."""
+        return self.connection.execute( sql, parameters ).fetchall()
+
+    def is_current( self, path ) :
+        """Return if the log at the given path is exported and unchanged since."""
+        stat = os.stat( path )
+        row  = self.connection.execute( 'select size, mtime from logs where path = ?', ( path, ) ).fetchone()
+        return row is not None and row[ 0 ] == stat.st_size and row[ 1 ] == stat.st_mtime
+
+    def _remove( self, path ) :
+        row = self.connection.execute( 'select id from logs where path = ?', ( path, ) ).fetchone()
+        if row is None :
+            return
+        for table, _ in log_tables :
+            self.connection.execute( 'delete from %s where log_id = ?' % table, row )
+        self.connection.execute( 'delete from logs where id = ?', row )
+
+    def _insert( self, path, stat, log, rows ) :
+        """Insert (or replace) a log and its rows, return the inserted row count.
+
+        `stat` is the ( size, mtime ) of the log file taken before it was read.
+        """
+
+        self._remove( path )
+        log_id = self.connection.execute(
+            'insert into logs ( path, size, mtime, first_time, last_time, line_count, unparsable ) '
+            'values ( ?, ?, ?, ?, ?, ?, ? )', ( path, ) + tuple( stat ) + tuple( log ) ).lastrowid
+
+        count = 0
+        for table, columns in log_tables :
+            self.connection.executemany( 'insert into %s values ( %s )' % ( table, ', '.join( '?' * columns ) ),
+                                         ( ( log_id, ) + row for row in rows[ table ] ) )
+            count += len( rows[ table ] )
+        return count
+
+    def add_log( self, as_log ) :
+        """Insert (or replace) the given parsed `ASLog`.
+
+        The log is recorded with the size it was parsed up to, so a log which
+        grew since is exported again.
+        """
+        path = os.path.abspath( as_log.path )
+        with self.connection :
+            self._insert( path, ( as_log._offset, os.stat( path ).st_mtime ), log_row( as_log ), log_rows( as_log ) )
+
+    def add_logs( self, paths, processes = None, batch_size = 200000, force = False ) :
+        """Parse and insert the given logs, return the ( added, skipped ) log counts.
+
+        Logs are parsed in worker processes, rows are committed once
+        `batch_size` of them are inserted. Unless `force` is True, logs
+        exported with the same size and mtime are skipped.
+        """
+
+        paths   = [ os.path.abspath( path ) for path in paths ]
+        todo    = paths if force else [ path for path in paths if not self.is_current( path ) ]
+        skipped = len( paths ) - len( todo )
+
+        if len( todo ) < 2 or processes == 1 :
+            pool    = None
+            results = ( log_file_rows( path ) for path in todo )
+        else :
+            pool    = multiprocessing.Pool( processes )
+            results = pool.imap( log_file_rows, todo )
+
+        pending = 0
+        try :
+            for path, stat, log, rows in results :
+                pending += self._insert( path, stat, log, rows )
+                if pending >= batch_size :
+                    self.connection.commit()
+                    pending = 0
+            self.connection.commit()
+        except :
+            self.connection.rollback()
+            raise
+        finally :
+            if pool is not None :
+                pool.close()
+                pool.join()
+
+        return len( todo ), skipped
+
+def log_paths( paths, pattern = '*.log' ) :
+    """Return the given log paths, directories replaced by their logs matching `pattern`."""
+    result = list()
+    for path in paths :
+        if os.path.isdir( path ) :
+            result.extend( sorted( os.path.join( path, name )
+                                   for name in os.listdir( path )
+                                       if fnmatch.fnmatch( name, pattern ) ) )
+        else :
+            result.append( path )
+    return result
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Export appleseed logs to a SQLite database.' )
+    parser.add_argument( 'database'                                                                )
+    parser.add_argument( 'logs'        , nargs = '*', help = 'log files or directories'            )
+    parser.add_argument( '--pattern'   , default = '*.log'                                          )
+    parser.add_argument( '--processes' , default = None, type = int                                 )
+    parser.add_argument( '--force'     , action = 'store_true', help = 'export unchanged logs again' )
+    parser.add_argument( '--sql'       , default = None, help = 'run this query and print its rows' )
+    args = parser.parse_args()
+
+    database = ASLogDatabase( args.database )
+
+    if args.logs :
+        added, skipped = database.add_logs( log_paths( args.logs, args.pattern ), args.processes,
+                                            force = args.force )
+        print "%d logs exported, %d unchanged" % ( added, skipped )
+
+    if args.sql :
+        for row in database.query( args.sql ) :
+            print '\t'.join( unicode( value ) for value in row )
+
+    database.close()
+
+if __name__ == '__main__' :
+    main()
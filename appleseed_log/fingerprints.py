@@ -0,0 +1,428 @@
+import argparse
+import calendar
+import datetime
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+
+from .database import log_paths, unix_time
+from .log import ASLog, problem_msg_cats
+from .sequence import session_frame
+from .templates import wildcard
+
+# Fingerprints of warnings and errors across a log archive.
+#
+# Problem messages are normalized to stable signatures: quoted names become
+# the entity of the occurrence, numbers and file paths become wildcards (the
+# punctuation around numbers is kept) and
+# counted nouns lose their plural. Occurrences (log, line, time, frame,
+# entity) go in a SQLite index next to per signature counts and first and
+# last times, so "which frames hit this" and "what's new since" are index
+# lookups. A log whose size and mtime didn't change since it was indexed is
+# skipped, a changed one is indexed again.
+#
+#   python -m appleseed_log.fingerprints problems.db /renders/logs --top 20
+#   python -m appleseed_log.fingerprints problems.db --since 1d
+#   python -m appleseed_log.fingerprints problems.db --frames 12
+
+# version of the signature normalization, an index of another version is emptied
+signature_version = 2
+
+schema = '''
+create table if not exists logs (
+    id          integer primary key ,
+    path        text unique         ,
+    size        integer             ,
+    mtime       real                ,
+    indexed     real                );  -- unix seconds
+
+create table if not exists signatures (
+    id          integer primary key ,
+    msg_cat     text                ,  -- warning/error/fatal
+    signature   text                ,
+    example     text                ,  -- first message seen
+    first_time  real                ,  -- unix seconds of the first and last occurrence (logs are UTC)
+    last_time   real                ,
+    occurrences integer             ,
+    unique ( msg_cat, signature )   );
+
+create table if not exists occurrences (
+    signature_id integer ,
+    log_id       integer ,
+    number       integer ,
+    time         real    ,
+    frame        integer ,
+    project      text    ,
+    entity       text    );
+
+create index if not exists signatures_first_time   on signatures ( first_time );
+create index if not exists occurrences_signature   on occurrences ( signature_id, time );
+create index if not exists occurrences_log         on occurrences ( log_id );
+create index if not exists occurrences_entity      on occurrences ( entity );
+'''
+
+re_quoted = re.compile( r'"([^"]*)"' )
+re_number = re.compile( r'[\d.,]*\d' )  # digits with their decimal and grouping marks
+
+# leading characters of file path tokens
+path_starts = ( '/', './', '../', '\\\\', '~/' )
+
+def fingerprint( message ) :
+    """Return the ( signature, entity ) of the given problem message.
+
+    The entity is the first quoted name, None if there is none.
+
+    :Example:
+
+    >>> fingerprint( ' while loading mesh object "roof.0": 1 normal vector (out of 1,580) were null.' )
+    ('while loading mesh object "<*>": <*> normal vector (out of <*>) were null.', 'roof.0')
+    >>> fingerprint( ' while loading mesh object "wall.0": 64 normal vectors (out of 224) were null.' )[ 0 ]
+    'while loading mesh object "<*>": <*> normal vector (out of <*>) were null.'
+    """
+
+    match_grp = re_quoted.search( message )
+    entity    = match_grp.group( 1 ) if match_grp else None
+    message   = re_quoted.sub( '"%s"' % wildcard, message )
+
+    tokens = list()
+    after  = 3 # tokens since the last wildcard
+    for token in message.split() :
+        if token.startswith( path_starts ) or token[ 1:3 ] == ':\\' :
+            token = wildcard
+            after = 0
+        elif re_number.search( token ) :
+            token = re_number.sub( wildcard, token )
+            after = 0
+        else :
+            after += 1
+            # "1 polygonal face" and "12 polygonal faces" share a signature
+            if after <= 2 and len( token ) > 3 and token.endswith( 's' ) and token.isalpha() :
+                token = token[ :-1 ]
+        tokens.append( token )
+
+    return ' '.join( tokens ), entity
+
+
+class ASLogOccurrences( object ) :
+    """Subscriber collecting the problem occurrences of a log, see `log_occurrences()`.
+
+    Problems are logged before the image is written, so the frame of the
+    occurrences of a session is only set once the session ends, with the
+    rule of `appleseed_log.sequence` (first written image, else project).
+    """
+
+    def __init__( self ) :
+        self.project     = None
+        self.image       = None
+        self.occurrences = list()  # ( msg_cat, signature, message, number, time, frame, project, entity )
+        self._pending    = list()  # occurrences of the current session, without frame
+
+    def add( self, line_data ) :
+
+        line_type = line_data.msg_type
+
+        if line_type == 'loading_project_file' :
+            self.end_session()
+            self.project = line_data.content( 'project_file_path' )
+            return
+
+        if line_type == 'wrote_image_file' :
+            # the first image is the beauty, the others are AOVs of the same frame
+            self.image = self.image or line_data.content( 'image_path' )
+            return
+
+        message           = line_data.msg_rest.strip()
+        signature, entity = fingerprint( message )
+        self._pending.append( ( line_data.msg_cat, signature, message, line_data.number ,
+                                unix_time( line_data.timestamp ), entity ) )
+
+    def end_session( self ) :
+        """Set the frame of the occurrences of the current session."""
+        frame = session_frame( self.image, self.project )
+        for msg_cat, signature, message, number, line_time, entity in self._pending :
+            self.occurrences.append( ( msg_cat, signature, message, number, line_time, frame, self.project, entity ) )
+        self._pending = list()
+        self.image    = None
+
+    def finish( self ) :
+        """Return the occurrences of every session."""
+        self.end_session()
+        return self.occurrences
+
+def log_occurrences( path ) :
+    """Return ( path, ( size, mtime ), occurrences ) of the log at the given path (for worker processes).
+
+    The log is stat before it's read, a log growing meanwhile is then seen
+    as changed by the next update.
+    """
+    stat        = os.stat( path )
+    occurrences = ASLogOccurrences()
+    as_log      = ASLog( path, parse = False, engine = 'split', keep_lines = False, summary = False )
+    as_log.subscribe( occurrences.add, types = ( 'loading_project_file', 'wrote_image_file' ), msg_cats = problem_msg_cats )
+    as_log.update()
+    return path, ( stat.st_size, stat.st_mtime ), occurrences.finish()
+
+def since_time( text, now = None ) :
+    """Return the unix seconds of a '<n>d', '<n>h' (before now), 'YYYY-MM-DD' or 'YYYY-MM-DDTHH:MM:SS' (UTC) string."""
+
+    now = time.time() if now is None else now
+    if text[ -1: ] in ( 'd', 'h' ) and text[ :-1 ].replace( '.', '', 1 ).isdigit() :
+        return now - float( text[ :-1 ] ) * ( 86400 if text[ -1 ] == 'd' else 3600 )
+
+    for date_format in ( '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d' ) :
+        try :
+            return calendar.timegm( datetime.datetime.strptime( text, date_format ).utctimetuple() )
+        except ValueError :
+            pass
+    raise ValueError( "Can't read the time %r, use <n>d, <n>h, YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS" % text )
+
+
+class ASLogFingerprints( object ) :
+    """A SQLite index of warning and error signatures and their occurrences.
+
+    :Example:
+
+    >>> fingerprints = ASLogFingerprints( 'problems.db' )
+    >>> fingerprints.add_logs( log_paths( [ '/renders/logs' ] ) )
+    (1250, 0)
+    >>> signature = fingerprints.signatures( limit = 1 )[ 0 ]
+    >>> signature[ 'signature' ], signature[ 'occurrences' ]
+    (u'while loading mesh object "<*>": <*> normal vector (out of <*>) were null.', 5012)
+    >>> [ frame[ 'frame' ] for frame in fingerprints.frames( signature[ 'id' ] ) ][ :3 ]
+    [250, 251, 252]
+    >>> fingerprints.new_since( since_time( '1d' ) )
+    []
+    """
+
+    def __init__( self, path ) :
+
+        self.path       = path
+        self.connection = sqlite3.connect( path )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute( 'pragma journal_mode = wal'  )
+        self.connection.execute( 'pragma synchronous = normal' )
+        self.connection.executescript( schema )
+
+        if self.connection.execute( 'pragma user_version' ).fetchone()[ 0 ] != signature_version :
+            with self.connection :
+                for table in ( 'occurrences', 'signatures', 'logs' ) :
+                    self.connection.execute( 'delete from %s' % table )
+                self.connection.execute( 'pragma user_version = %d' % signature_version )
+
+        self._signature_ids = None  # ( msg_cat, signature ) -> ID, loaded on first insert
+
+    def close( self ) :
+        self.connection.close()
+
+    def query( self, sql, parameters = () ) :
+        """Return the rows (list of dicts) of the given SQL query."""
+        return [ dict( row ) for row in self.connection.execute( sql, parameters ) ]
+
+    def is_current( self, path ) :
+        """Return if the log at the given path is indexed and unchanged since."""
+        stat = os.stat( path )
+        row  = self.connection.execute( 'select size, mtime from logs where path = ?', ( path, ) ).fetchone()
+        return row is not None and row[ 0 ] == stat.st_size and row[ 1 ] == stat.st_mtime
+
+    def _remove( self, path ) :
+        """Remove the occurrences of a log and update the signatures they had."""
+
+        row = self.connection.execute( 'select id from logs where path = ?', ( path, ) ).fetchone()
+        if row is None :
+            return
+        log_id = row[ 0 ]
+
+        counts = self.connection.execute( 'select signature_id, count(*) from occurrences where log_id = ? '
+                                          'group by signature_id', ( log_id, ) ).fetchall()
+        self.connection.execute( 'delete from occurrences where log_id = ?', ( log_id, ) )
+        self.connection.execute( 'delete from logs where id = ?', ( log_id, ) )
+
+        for signature_id, count in counts :
+            self.connection.execute(
+                'update signatures set occurrences = occurrences - ?, '
+                'first_time = ( select min( time ) from occurrences where signature_id = ? ), '
+                'last_time  = ( select max( time ) from occurrences where signature_id = ? ) '
+                'where id = ?', ( count, signature_id, signature_id, signature_id ) )
+
+        self.connection.execute( 'delete from signatures where occurrences <= 0' )
+        self._signature_ids = None
+
+    def _signature_id( self, msg_cat, signature, message, time ) :
+
+        if self._signature_ids is None :
+            self._signature_ids = dict( ( ( row[ 0 ], row[ 1 ] ), row[ 2 ] ) for row in
+                                        self.connection.execute( 'select msg_cat, signature, id from signatures' ) )
+
+        key          = ( msg_cat, signature )
+        signature_id = self._signature_ids.get( key )
+        if signature_id is None :
+            signature_id = self.connection.execute(
+                'insert into signatures ( msg_cat, signature, example, first_time, last_time, occurrences ) '
+                'values ( ?, ?, ?, ?, ?, 0 )', ( msg_cat, signature, message, time, time ) ).lastrowid
+            self._signature_ids[ key ] = signature_id
+        return signature_id
+
+    def _insert( self, path, stat, occurrences ) :
+        """Insert (or replace) the occurrences of a log, return their count.
+
+        `stat` is the ( size, mtime ) of the log file taken before it was read.
+        """
+
+        self._remove( path )
+        log_id = self.connection.execute( 'insert into logs ( path, size, mtime, indexed ) values ( ?, ?, ?, ? )',
+                                          ( path, ) + tuple( stat ) + ( time.time(), ) ).lastrowid
+
+        rows       = list()
+        signatures = dict()  # ID -> [ first time, last time, count ]
+        for msg_cat, signature, message, number, line_time, frame, project, entity in occurrences :
+            signature_id = self._signature_id( msg_cat, signature, message, line_time )
+            rows.append( ( signature_id, log_id, number, line_time, frame, project, entity ) )
+            stats = signatures.get( signature_id )
+            if stats is None :
+                signatures[ signature_id ] = [ line_time, line_time, 1 ]
+            else :
+                stats[ 0 ] = min( stats[ 0 ], line_time )
+                stats[ 1 ] = max( stats[ 1 ], line_time )
+                stats[ 2 ] += 1
+
+        self.connection.executemany( 'insert into occurrences values ( ?, ?, ?, ?, ?, ?, ? )', rows )
+        self.connection.executemany(
+            'update signatures set first_time = min( first_time, ? ), last_time = max( last_time, ? ), '
+            'occurrences = occurrences + ? where id = ?',
+            ( ( first, last, count, signature_id ) for signature_id, ( first, last, count ) in signatures.iteritems() ) )
+        return len( rows )
+
+    def add_log( self, path, force = False ) :
+        """Index (or index again) the log at the given path, return False if it was unchanged."""
+        path = os.path.abspath( path )
+        if not force and self.is_current( path ) :
+            return False
+        with self.connection :
+            self._insert( *log_occurrences( path ) )
+        return True
+
+    def add_logs( self, paths, processes = None, batch_size = 100000, force = False ) :
+        """Parse and index the given logs, return the ( added, skipped ) log counts.
+
+        Logs are parsed in worker processes, occurrences are committed once
+        `batch_size` of them are inserted. Unless `force` is True, logs
+        indexed with the same size and mtime are skipped.
+        """
+
+        paths   = [ os.path.abspath( path ) for path in paths ]
+        todo    = paths if force else [ path for path in paths if not self.is_current( path ) ]
+        skipped = len( paths ) - len( todo )
+
+        if len( todo ) < 2 or processes == 1 :
+            pool    = None
+            results = ( log_occurrences( path ) for path in todo )
+        else :
+            pool    = multiprocessing.Pool( processes )
+            results = pool.imap( log_occurrences, todo )
+
+        pending = 0
+        try :
+            for path, stat, occurrences in results :
+                pending += self._insert( path, stat, occurrences )
+                if pending >= batch_size :
+                    self.connection.commit()
+                    pending = 0
+            self.connection.commit()
+        except :
+            self.connection.rollback()
+            self._signature_ids = None
+            raise
+        finally :
+            if pool is not None :
+                pool.close()
+                pool.join()
+
+        return len( todo ), skipped
+
+    ############################################################################
+    # Queries
+    ############################################################################
+    def signatures( self, msg_cat = None, limit = None ) :
+        """Return signatures (list of dicts) by decreasing occurrence count."""
+        sql = 'select * from signatures'
+        parameters = list()
+        if msg_cat is not None :
+            sql += ' where msg_cat = ?'
+            parameters.append( msg_cat )
+        sql += ' order by occurrences desc'
+        if limit is not None :
+            sql += ' limit ?'
+            parameters.append( limit )
+        return self.query( sql, parameters )
+
+    def signature( self, message, msg_cat = None ) :
+        """Return the signatures (list of dicts) of the given message, any category by default."""
+        signature = fingerprint( message )[ 0 ]
+        if msg_cat is None :
+            return self.query( 'select * from signatures where signature = ?', ( signature, ) )
+        return self.query( 'select * from signatures where msg_cat = ? and signature = ?', ( msg_cat, signature ) )
+
+    def frames( self, signature_id ) :
+        """Return the frames hitting the given signature, in time order.
+
+        Each entry is { 'path' (log), 'frame', 'project', 'occurrences',
+        'first_time', 'entities' (distinct count) }.
+        """
+        return self.query(
+            'select logs.path as path, frame, project, count(*) as occurrences, min( time ) as first_time, '
+            'count( distinct entity ) as entities from occurrences join logs on logs.id = occurrences.log_id '
+            'where signature_id = ? group by log_id, project, frame order by first_time', ( signature_id, ) )
+
+    def entities( self, signature_id ) :
+        """Return the entities hitting the given signature (list of dicts), by decreasing occurrence count."""
+        return self.query( 'select entity, count(*) as occurrences, count( distinct log_id ) as logs '
+                           'from occurrences where signature_id = ? group by entity order by 2 desc',
+                           ( signature_id, ) )
+
+    def new_since( self, since ) :
+        """Return the signatures (list of dicts) first seen at or after the given unix seconds (log time)."""
+        return self.query( 'select * from signatures where first_time >= ? order by first_time', ( since, ) )
+
+def format_time( seconds ) :
+    return datetime.datetime.utcfromtimestamp( seconds ).strftime( '%Y-%m-%d %H:%M:%S' ) if seconds else '-'
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Index appleseed warning and error signatures in SQLite.' )
+    parser.add_argument( 'database'                                                                           )
+    parser.add_argument( 'logs'        , nargs = '*', help = 'log files or directories'                       )
+    parser.add_argument( '--pattern'   , default = '*.log'                                                     )
+    parser.add_argument( '--processes' , default = None, type = int                                            )
+    parser.add_argument( '--force'     , action = 'store_true', help = 'index unchanged logs again'             )
+    parser.add_argument( '--top'       , default = None, type = int, help = 'print the most common signatures' )
+    parser.add_argument( '--since'     , default = None, help = 'print signatures new since, <n>d, <n>h or a date' )
+    parser.add_argument( '--frames'    , default = None, type = int, help = 'print the frames of a signature ID' )
+    args = parser.parse_args()
+
+    fingerprints = ASLogFingerprints( args.database )
+
+    if args.logs :
+        added, skipped = fingerprints.add_logs( log_paths( args.logs, args.pattern ), args.processes,
+                                                force = args.force )
+        print "%d logs indexed, %d unchanged" % ( added, skipped )
+
+    signatures = list()
+    if args.top :
+        signatures = fingerprints.signatures( limit = args.top )
+    elif args.since :
+        signatures = fingerprints.new_since( since_time( args.since ) )
+    for s in signatures :
+        print "%5d %-7s %7d  %s  %s" % ( s[ 'id' ], s[ 'msg_cat' ], s[ 'occurrences' ],
+                                        format_time( s[ 'first_time' ] ), s[ 'signature' ] )
+
+    if args.frames is not None :
+        for frame in fingerprints.frames( args.frames ) :
+            print "%s  %-6s %5d  %s" % ( format_time( frame[ 'first_time' ] ), frame[ 'frame' ] ,
+                                        frame[ 'occurrences' ], frame[ 'project' ] or frame[ 'path' ] )
+
+    fingerprints.close()
+
+if __name__ == '__main__' :
+    main()
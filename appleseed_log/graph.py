@@ -0,0 +1,198 @@
+import array
+import bisect
+import operator
+from itertools import compress, imap, repeat
+
+# Graph series of parsed logs with min/max level of detail pyramids.
+#
+# A pyramid level reduces `factor` values of the level below to their min and
+# max, so any time window can be drawn with about one bucket per pixel whatever
+# the number of points, without missing a single peak.
+
+def reduce_buckets( values, func, factor ) :
+    """Return `func` (min or max) of each run of `factor` values, the last run may be partial."""
+    full    = len( values ) // factor * factor
+    reduced = array.array( 'd', imap( func, *[ values[ i : full : factor ] for i in xrange( factor ) ] ) )
+    if full < len( values ) :
+        reduced.append( func( values[ full: ] ) )
+    return reduced
+
+
+class ASLogPyramid( object ) :
+    """A ( x, y ) series sorted by x and its min/max pyramid.
+
+    Each point also keeps the index of the log line it comes from.
+
+    :Example:
+
+    >>> pyramid = ASLogPyramid()
+    >>> pyramid.extend( times, vms, line_indices )
+    >>> pyramid.envelope( 10.0, 60.0, 800 ) # about 800 ( x, y min, y max ) buckets
+    """
+
+    def __init__( self, factor = 8 ) :
+
+        assert factor >= 2, factor
+
+        self.factor  = factor
+        self.xs      = array.array( 'd' )
+        self.ys      = array.array( 'd' )
+        self.indices = array.array( 'l' )  # line index of each point
+        self.levels  = list()              # [ ( mins, maxs ), ... ], level k buckets factor**(k+1) points
+
+    def __len__( self ) :
+        return len( self.xs )
+
+    @property
+    def y_range( self ) :
+        """Return the ( min, max ) of y, None if empty."""
+        if not self.ys :
+            return None
+        if self.levels :
+            mins, maxs = self.levels[ -1 ]
+        else :
+            mins, maxs = self.ys, self.ys
+        return min( mins ), max( maxs )
+
+    def extend( self, xs, ys, indices ) :
+        """Append points, x must not go below the latest one."""
+
+        self.xs.extend( xs )
+        self.ys.extend( ys )
+        self.indices.extend( indices )
+
+        factor       = self.factor
+        lower_mins   = self.ys
+        lower_maxs   = self.ys
+        level        = 0
+
+        while len( lower_mins ) > factor :
+
+            if level == len( self.levels ) :
+                self.levels.append( ( array.array( 'd' ), array.array( 'd' ) ) )
+            mins, maxs = self.levels[ level ]
+
+            # the latest bucket may have been partial, compute it again
+            start = max( 0, len( mins ) - 1 )
+            del mins[ start: ]
+            del maxs[ start: ]
+            mins.extend( reduce_buckets( lower_mins[ start * factor: ], min, factor ) )
+            maxs.extend( reduce_buckets( lower_maxs[ start * factor: ], max, factor ) )
+
+            lower_mins, lower_maxs = mins, maxs
+            level += 1
+
+    def envelope( self, x_min, x_max, width ) :
+        """Return ( x, y min, y max ) buckets covering [x_min, x_max] with about `width` buckets.
+
+        One more point is kept on each side so lines reach the window borders.
+        """
+
+        first = max( 0            , bisect.bisect_left(  self.xs, x_min ) - 1 )
+        last  = min( len( self.xs ), bisect.bisect_right( self.xs, x_max ) + 1 )
+        if last <= first :
+            return list()
+
+        xs    = self.xs
+        size  = 1
+        level = -1
+        while ( last - first ) // size > width and level + 1 < len( self.levels ) :
+            level += 1
+            size  *= self.factor
+
+        if level < 0 :
+            ys = self.ys
+            return [ ( xs[ i ], ys[ i ], ys[ i ] ) for i in xrange( first, last ) ]
+
+        mins, maxs = self.levels[ level ]
+        return [ ( xs[ b * size ], mins[ b ], maxs[ b ] )
+                 for b in xrange( first // size, ( last - 1 ) // size + 1 ) ]
+
+    def nearest( self, x ) :
+        """Return the line index of the point nearest to x, None if empty."""
+        xs = self.xs
+        if not xs :
+            return None
+        i = bisect.bisect_left( xs, x )
+        if i == len( xs ) or ( i > 0 and x - xs[ i - 1 ] < xs[ i ] - x ) :
+            i -= 1
+        return self.indices[ i ]
+
+
+class ASLogGraphData( object ) :
+    """VM, progress and per thread activity pyramids of an `ASLog`.
+
+    `update()` only adds lines parsed since the previous call, so a log
+    followed with `ASLog.update()` keeps its graph up to date cheaply.
+    """
+
+    def __init__( self, as_log, factor = 8 ) :
+
+        self.as_log   = as_log
+        self.factor   = factor
+        self.vm       = ASLogPyramid( factor )
+        self.progress = ASLogPyramid( factor )
+        self.threads  = dict()  # thread id -> ASLogPyramid, y is the thread id
+
+        self._count   = 0       # lines already added
+        self._time    = 0.0     # latest x, time going backward is clamped to it
+
+        self.update()
+
+    @property
+    def time_range( self ) :
+        """Return the ( first, last ) time in seconds."""
+        if not self.vm :
+            return 0.0, 0.0
+        return self.vm.xs[ 0 ], self.vm.xs[ -1 ]
+
+    def update( self ) :
+        """Add lines parsed since the latest update, return their count."""
+
+        columns = self.as_log.columns
+        start   = self._count
+        end     = len( columns )
+        if end == start :
+            return 0
+
+        indices = xrange( start, end )
+
+        # pyramids need sorted x, a line logged late is drawn at the latest time
+        if columns.time_sorted :
+            times = columns.time[ start : end ]
+        else :
+            times = array.array( 'd' )
+            time  = self._time
+            for t in columns.time[ start : end ] :
+                time = max( time, t )
+                times.append( time )
+        self._time = times[ -1 ]
+
+        self.vm.extend( times, array.array( 'd', columns.vm[ start : end ] ), indices )
+
+        progress_code = columns.code( 'type', 'rendering_progress' )
+        if progress_code is not None :
+            is_progress = imap( operator.eq, columns.type[ start : end ], repeat( progress_code ) )
+            positions   = list( compress( xrange( end - start ), is_progress ) )
+            lines       = self.as_log.lines
+            self.progress.extend( [ times[ i ] for i in positions ]                                ,
+                                  [ lines[ start + i ].content( 'percentage' ) for i in positions ] ,
+                                  [ start + i for i in positions ]                                )
+
+        thread_ids = columns.thread_id[ start : end ]
+        for thread_id in set( thread_ids ) :
+            is_thread = imap( operator.eq, thread_ids, repeat( thread_id ) )
+            positions = list( compress( xrange( end - start ), is_thread ) )
+            pyramid   = self.threads.get( thread_id )
+            if pyramid is None :
+                pyramid = self.threads[ thread_id ] = ASLogPyramid( self.factor )
+            pyramid.extend( [ times[ i ] for i in positions ] ,
+                            repeat( float( thread_id ), len( positions ) ) ,
+                            [ start + i for i in positions ] )
+
+        self._count = end
+        return end - start
+
+    def nearest_line( self, time ) :
+        """Return the index of the line logged nearest to the given time, None if empty."""
+        return self.vm.nearest( time )
@@ -0,0 +1,207 @@
+import bisect
+import json
+import os
+import zlib
+
+# Sparse seek index of a log file, stored next to it (frame.1001.log.asidx).
+#
+# Every `step` lines, and at each session (project loading) or option block
+# start, we record the byte offset, the line number and the raw timestamp of
+# the line. Raw timestamps are fixed width ISO strings so they can be
+# compared and bisected without decoding them. A checksum of the head of the
+# log tells a rewritten log from a grown one.
+
+index_version   = 2
+index_extension = '.asidx'
+head_size       = 1 << 16 # bytes of the log head checksummed
+
+boundary_markers = ( '| loading project file', )
+
+def is_boundary( line ) :
+    """Return if the given raw line (\n or \r\n ended) starts a session or an option block."""
+    return line.rstrip( '\r\n' ).endswith( 'settings:' ) or any( m in line for m in boundary_markers )
+
+def raw_timestamp( line ) :
+    """Return the raw timestamp of the given log line, None if there is none."""
+    if not line[:1].isdigit() :
+        return None
+    end = line.find( ' ' )
+    return line[:end] if end > 0 else None
+
+
+class ASLogIndex( object ) :
+    """Sparse index giving random access to a log file without parsing it.
+
+    :Example:
+
+    >>> index = ASLogIndex.load_or_build( 'frame.1001.log' )
+    >>> index.seek_line( 4000000 )
+    (251234567, 3999744)
+    >>> index.seek_time( '2014-02-22T16:10:00.000000Z' )
+    (98765, 912)
+    """
+
+    def __init__( self, path, step = 4096 ) :
+
+        self.path       = path
+        self.step       = step
+        self.size       = 0     # log file size covered by the index
+        self.mtime      = None
+        self.line_count = 0
+        self.head_size  = 0     # checksummed bytes of the log head
+        self.head_crc   = 0
+        self.offsets    = list()
+        self.numbers    = list()
+        self.timestamps = list() # running max of raw timestamps, for bisect
+
+    @property
+    def sidecar_path( self ) :
+        return self.path + index_extension
+
+    def head_checksum( self, size ) :
+        """Return the checksum of the first `size` bytes of the log file."""
+        with open( self.path, 'rb' ) as log_file :
+            return zlib.crc32( log_file.read( size ) ) & 0xffffffff
+
+    def build( self ) :
+        """Scan the log file (from where the index stops) and fill the index."""
+
+        st = os.stat( self.path )
+
+        # the log has been rewritten, start over
+        if st.st_size < self.size or self.head_checksum( self.head_size ) != self.head_crc :
+            self.__init__( self.path, self.step )
+
+        offset       = self.size
+        number       = self.line_count
+        step         = self.step
+        last_indexed = self.numbers[ -1 ] if self.numbers else -step
+        max_raw      = self.timestamps[ -1 ] if self.timestamps else ''
+
+        with open( self.path, 'rb' ) as log_file :
+            log_file.seek( offset )
+
+            for line in log_file :
+
+                # don't index a line still being written
+                if not line.endswith( '\n' ) :
+                    break
+
+                if number - last_indexed >= step or is_boundary( line ) :
+                    raw = raw_timestamp( line )
+                    if raw is not None :
+                        max_raw = max( max_raw, raw )
+                        self.offsets.append(    offset  )
+                        self.numbers.append(    number  )
+                        self.timestamps.append( max_raw )
+                        last_indexed = number
+
+                offset += len( line )
+                number += 1
+
+        self.size       = offset
+        self.mtime      = st.st_mtime
+        self.line_count = number
+
+        if self.head_size < min( self.size, head_size ) :
+            self.head_size = min( self.size, head_size )
+            self.head_crc  = self.head_checksum( self.head_size )
+
+    def save( self ) :
+        """Write the index next to the log file."""
+        data = { 'version'    : index_version   ,
+                 'step'       : self.step       ,
+                 'size'       : self.size       ,
+                 'mtime'      : self.mtime      ,
+                 'line_count' : self.line_count ,
+                 'head_size'  : self.head_size  ,
+                 'head_crc'   : self.head_crc   ,
+                 'offsets'    : self.offsets    ,
+                 'numbers'    : self.numbers    ,
+                 'timestamps' : self.timestamps }
+        tmp_path = self.sidecar_path + '.tmp'
+        with open( tmp_path, 'w' ) as index_file :
+            json.dump( data, index_file, separators = ( ',', ':' ) )
+        os.rename( tmp_path, self.sidecar_path )
+
+    def load( self ) :
+        """Read the index from its sidecar file, return False if it's missing or not usable.
+
+        A malformed or partially written sidecar is not usable, like one of
+        another version, the index is then built again.
+        """
+
+        try :
+            with open( self.sidecar_path, 'r' ) as index_file :
+                data = json.load( index_file )
+        except ( IOError, ValueError ) :
+            return False
+
+        try :
+            if data.get( 'version' ) != index_version or data[ 'step' ] != self.step :
+                return False
+
+            values = ( data[ 'size'       ] ,
+                       data[ 'mtime'      ] ,
+                       data[ 'line_count' ] ,
+                       data[ 'head_size'  ] ,
+                       data[ 'head_crc'   ] ,
+                       list( data[ 'offsets' ] ) ,
+                       list( data[ 'numbers' ] ) ,
+                       [ str( t ) for t in data[ 'timestamps' ] ] )
+        except ( AttributeError, KeyError, TypeError, UnicodeError ) :
+            return False
+
+        if not len( values[ 5 ] ) == len( values[ 6 ] ) == len( values[ 7 ] ) :
+            return False
+
+        ( self.size, self.mtime, self.line_count, self.head_size, self.head_crc,
+          self.offsets, self.numbers, self.timestamps ) = values
+        return True
+
+    @classmethod
+    def load_or_build( cls, path, step = 4096, save = True ) :
+        """Return the up to date index of the given log, (re)building the sidecar if needed.
+
+        A log which only grew since the index was saved is scanned from the
+        indexed size only. A sidecar which can't be written (read only
+        directory) is skipped, the index is then only kept in memory.
+        """
+
+        index = cls( path, step )
+        index.load()
+
+        st = os.stat( path )
+        if ( st.st_size, st.st_mtime ) != ( index.size, index.mtime ) :
+            index.build()
+            if save :
+                try :
+                    index.save()
+                except ( IOError, OSError ) :
+                    pass
+
+        return index
+
+    def seek_line( self, number ) :
+        """Return ( offset, line number ) of the nearest indexed line at or before `number`."""
+        i = bisect.bisect_right( self.numbers, number ) - 1
+        if i < 0 :
+            return 0, 0
+        return self.offsets[ i ], self.numbers[ i ]
+
+    def seek_time( self, raw ) :
+        """Return ( offset, line number ) of an indexed line before any line at or after raw timestamp `raw`."""
+        i = bisect.bisect_left( self.timestamps, raw ) - 1
+        if i < 0 :
+            return 0, 0
+        return self.offsets[ i ], self.numbers[ i ]
+
+    def read( self, offset, number ) :
+        """Yield ( line number, raw line ) from the given position to the end of the file."""
+        with open( self.path, 'rb' ) as log_file :
+            log_file.seek( offset )
+            for line in log_file :
+                if line.endswith( '\r\n' ) :
+                    line = line[:-2] + '\n'
+                yield number, line
+                number += 1
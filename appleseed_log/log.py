@@ -0,0 +1,1579 @@
+import array
+import bisect
+import collections
+import datetime
+import csv
+import json
+import operator
+import re
+import os.path
+from itertools import compress, imap, repeat
+from timeit import default_timer as timer
+
+from .blocks import BlockStore
+from .index import ASLogIndex, raw_timestamp
+from .query import BetweenQuery, compile_query
+from .strings import strings
+from .summary import ASLogSummary
+from .templates import ASLogTemplateMiner, template_runs
+
+# repeated strings are shared through the process wide string table, paths
+# and object names of messages are only kept as IDs of the table
+canonical = strings.canonical
+string_id = strings.intern
+
+#http://thomas-cokelaer.info/tutorials/sphinx/docstring_python.html
+
+################################################################################
+# Prepare regex
+################################################################################
+re_main = re.compile( '(?P<timestamp>[0-9TZ:.-]+)\s+'
+                      '\<(?P<thread_id>\d{3})\>\s+'
+                      '(?P<vm>\d+)\s+MB\s+'
+                      '(?P<msg_cat>\w+)\s+'
+                      '\|(?P<msg_rest>.*)\n?' )
+
+re_opening_texture_file = re.compile( '\s*opening texture file (?P<texture_path>[\w./\\\\-]+) for reading\.\.\.' )
+re_rendering_progress   = re.compile( '\s*rendering\, (?P<percentage>[\d.]+)\% done' )
+re_wrote_image_file     = re.compile( '\s*wrote image file (?P<image_path>[\w./\\\\-]+) in (?P<milliseconds>[\d,]+) ms\.' )
+
+re_project_file_path    = re.compile( '\s*loading project file (?P<project_file_path>[\w./\\\\-]+)\.\.\.' )
+re_loaded_mesh_file     = re.compile( '\s*loaded mesh file (?P<mesh_path>[\w./\\\\-]+) '
+                                      '\((?P<objects>[\d,]+) object, '
+                                      '(?P<vertices>[\d,]+) vertices, '
+                                      '(?P<triangles>[\d,]+) triangles\) '
+                                      'in (?P<milliseconds>[\d,]+) ms\.' )
+
+re_scene_bounding_box   = re.compile(
+            '\s*scene bounding box\: '
+            '\((?P<pt1_x>[0-9.-]+)\, (?P<pt1_y>[0-9.-]+)\, (?P<pt1_z>[0-9.-]+)\)\-'
+            '\((?P<pt2_x>[0-9.-]+)\, (?P<pt2_y>[0-9.-]+)\, (?P<pt2_z>[0-9.-]+)\)\.' )
+
+re_scene_diameter       = re.compile( '\s*scene diameter\: (?P<diameter>[0-9.-]+)\.' )
+
+re_while_loading_mesh_object = re.compile( '\s*while loading mesh object \"(?P<object>[\w.]+)\"\:(?P<problem>.+)' )
+
+re_tile_borders_wasted  = re.compile( '\s*rendering effort wasted by tile borders\: (?P<percentage>[\d.]+)\% '
+                                      '\(tile dimensions\: (?P<tile_x>[\d,]+) x (?P<tile_y>[\d,]+), '
+                                      'tile margins\: (?P<margin_x>[\d,]+) x (?P<margin_y>[\d,]+)\)' )
+re_rendering_threads    = re.compile( '\s*using (?P<threads>[\d,]+) threads? for rendering\.' )
+re_rendering_finished   = re.compile( '\s*rendering finished in '
+                                      '(?:(?P<hours>\d+) hours? )?(?:(?P<minutes>\d+) minutes? )?'
+                                      '(?P<seconds>[\d.]+) seconds?\.' )
+re_intersection_filter  = re.compile( '\s*created intersection filter for object "(?P<object>[^"]+)" '
+                                      'with (?P<materials>[\d,]+) materials? '
+                                      '\(masks: (?P<masks>[\d.,]+ (?:bytes?|[KMGT]B)), '
+                                      'uvs: (?P<uvs>[\d.,]+ (?:bytes?|[KMGT]B))\)\.' )
+
+# option regex
+re_opt_frame_settings_trigger          = re.compile( '\s*frame settings\:' )
+re_opt_frame_settings_resolution       = re.compile( '\s*resolution\s+(?P<x_resolution>[\d,]+) x (?P<y_resolution>[\d,]+)' )
+re_opt_frame_settings_tile_size        = re.compile( '\s*tile size\s+(?P<x_resolution>[\d,]+) x (?P<y_resolution>[\d,]+)' )
+re_opt_frame_settings_pixel_format     = re.compile( '\s*pixel format\s+(?P<pixel_format>[\w]+)' )
+re_opt_frame_settings_filter           = re.compile( '\s*filter\s+(?P<filter>[\w]+)' )
+re_opt_frame_settings_filter_size      = re.compile( '\s*filter size\s+(?P<filter_size>[\d.]+)' )
+re_opt_frame_settings_color_space      = re.compile( '\s*color space\s+(?P<color_space>[\w]+)' )
+re_opt_frame_settings_premult_alpha    = re.compile( '\s*premult\. alpha\s+(?P<premult_alpha>(on|off))' )
+re_opt_frame_settings_clamping         = re.compile( '\s*clamping\s+(?P<clamping>(on|off))' )
+re_opt_frame_settings_gamma_correction = re.compile( '\s*gamma correction\s+(?P<gamma_correction>[\w]+)' )
+re_opt_frame_settings_crop_window      = re.compile( '\s*crop window\s+\((?P<x_top_left>[\d,]+), (?P<y_top_left>[\d,]+)\)-\((?P<x_bottom_right>[\d,]+), (?P<y_bottom_right>[\d,]+)\)' )
+
+re_opt_path_tracing_settings_trigger          = re.compile( '\s*path tracing settings\:' )
+re_opt_path_tracing_settings_direct_lighting  = re.compile( '\s*direct lighting\s+(?P<direct_lighting>(on|off))' )
+re_opt_path_tracing_settings_ibl              = re.compile( '\s*ibl\s+(?P<ibl>(on|off))' )
+re_opt_path_tracing_settings_caustics         = re.compile( '\s*caustics\s+(?P<caustics>(on|off))' )
+re_opt_path_tracing_settings_max_path_length  = re.compile( '\s*max path length\s+(?P<max_path_length>([\d,]+|infinite))' )
+re_opt_path_tracing_settings_rr_min_path_len  = re.compile( '\s*rr min path len\.\s+(?P<rr_min_path_length>([\d,]+|infinite))' )
+re_opt_path_tracing_settings_next_event_est   = re.compile( '\s*next event est\.\s+(?P<next_event_estimation>(on|off))' )
+re_opt_path_tracing_settings_dl_light_samples = re.compile( '\s*dl light samples\s+(?P<dl_light_samples>[\d.]+)' )
+re_opt_path_tracing_settings_ibl_env_samples  = re.compile( '\s*ibl env samples\s+(?P<ibl_env_samples>[\d.]+)' )
+re_opt_path_tracing_settings_max_ray_intens   = re.compile( '\s*max ray intens\.\s+(?P<max_ray_intensity>([\d.]+|infinite))' )
+
+# an option line is indented under its block title
+re_opt_line = re.compile( '\s{3}\S' )
+
+datetime_str_format = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+read_size = 1 << 20 # bytes read at once from log files
+
+################################################################################
+# Message parsers
+################################################################################
+def to_int( raw ) :
+    """Convert a comma grouped number string ('1,024') to int."""
+    if ',' in raw :
+        # str.translate deletes in one pass without building a replacement
+        raw = raw.translate( None, ',' ) if isinstance( raw, str ) else raw.replace( u',', u'' )
+    return int( raw )
+
+# human size unit -> bytes, appleseed sizes are in powers of 1024
+size_units = { 'byte'  : 1       ,
+               'bytes' : 1       ,
+               'KB'    : 1 << 10 ,
+               'MB'    : 1 << 20 ,
+               'GB'    : 1 << 30 ,
+               'TB'    : 1 << 40 }
+
+def to_bytes( raw ) :
+    """Convert a human size string ('41 bytes', '2.3 KB', '6.0 MB') to bytes (int)."""
+    value, unit = raw.split()
+    return int( round( float( value.replace( ',', '' ) ) * size_units[ unit ] ) )
+
+def to_int_or_inf( raw ) :
+    """Convert a comma grouped number string or 'infinite' to int (or float inf)."""
+    return float( 'inf' ) if raw == 'infinite' else to_int( raw )
+
+def to_float_or_inf( raw ) :
+    """Convert a number string or 'infinite' to float."""
+    return float( 'inf' ) if raw == 'infinite' else float( raw )
+
+def parse_loading_project_file( match_grp ) :
+    return ( string_id( match_grp.group( 'project_file_path' ) ), )
+
+def parse_opening_texture_file( match_grp ) :
+    return ( string_id( match_grp.group( 'texture_path' ) ), )
+
+def parse_rendering_progress( match_grp ) :
+    return ( float( match_grp.group( 'percentage' ) ), )
+
+def parse_wrote_image_file( match_grp ) :
+    return ( string_id( match_grp.group( 'image_path'   ) ) ,
+             to_int(    match_grp.group( 'milliseconds' ) ) )
+
+def parse_loaded_mesh_file( match_grp ) :
+    return ( string_id( match_grp.group( 'mesh_path'    ) ) ,
+             to_int(    match_grp.group( 'objects'      ) ) ,
+             to_int(    match_grp.group( 'vertices'     ) ) ,
+             to_int(    match_grp.group( 'triangles'    ) ) ,
+             to_int(    match_grp.group( 'milliseconds' ) ) )
+
+def parse_scene_bounding_box( match_grp ) :
+    return ( ( ( float( match_grp.group( 'pt1_x' ) ) ,
+                 float( match_grp.group( 'pt1_y' ) ) ,
+                 float( match_grp.group( 'pt1_z' ) ) ) ,
+               ( float( match_grp.group( 'pt2_x' ) ) ,
+                 float( match_grp.group( 'pt2_y' ) ) ,
+                 float( match_grp.group( 'pt2_z' ) ) ) ), )
+
+def parse_scene_diameter( match_grp ) :
+    return ( match_grp.group( 'diameter' ), )
+
+def parse_while_loading_mesh_object( match_grp ) :
+    return ( string_id( match_grp.group( 'object'  ) ) ,
+                        match_grp.group( 'problem' )   )
+
+def parse_tile_borders_wasted( match_grp ) :
+    return ( float( match_grp.group( 'percentage' ) )     ,
+             ( to_int( match_grp.group( 'tile_x'   ) ) ,
+               to_int( match_grp.group( 'tile_y'   ) ) )  ,
+             ( to_int( match_grp.group( 'margin_x' ) ) ,
+               to_int( match_grp.group( 'margin_y' ) ) )  )
+
+def parse_rendering_threads( match_grp ) :
+    return ( to_int( match_grp.group( 'threads' ) ), )
+
+def parse_rendering_finished( match_grp ) :
+    return ( int( match_grp.group( 'hours'   ) or 0 ) * 3600 + \
+             int( match_grp.group( 'minutes' ) or 0 ) * 60   + \
+             float( match_grp.group( 'seconds' ) ), )
+
+def parse_intersection_filter( match_grp ) :
+    return ( string_id( match_grp.group( 'object'    ) ) ,
+             to_int(    match_grp.group( 'materials' ) ) ,
+             to_bytes(  match_grp.group( 'masks'     ) ) ,
+             to_bytes(  match_grp.group( 'uvs'       ) ) )
+
+# ( message type, regex, function returning the values of the match in `msg_keys` order )
+msg_parsers = ( ( 'loading_project_file'     , re_project_file_path        , parse_loading_project_file      ) ,
+                ( 'opening_texture_file'     , re_opening_texture_file     , parse_opening_texture_file      ) ,
+                ( 'rendering_progress'       , re_rendering_progress       , parse_rendering_progress        ) ,
+                ( 'wrote_image_file'         , re_wrote_image_file         , parse_wrote_image_file          ) ,
+                ( 'loaded_mesh_file'         , re_loaded_mesh_file         , parse_loaded_mesh_file          ) ,
+                ( 'scene_bounding_box'       , re_scene_bounding_box       , parse_scene_bounding_box        ) ,
+                ( 'scene_diameter'           , re_scene_diameter           , parse_scene_diameter            ) ,
+                ( 'while_loading_mesh_object', re_while_loading_mesh_object, parse_while_loading_mesh_object ) ,
+                ( 'tile_borders_wasted'      , re_tile_borders_wasted      , parse_tile_borders_wasted       ) ,
+                ( 'rendering_threads'        , re_rendering_threads        , parse_rendering_threads         ) ,
+                ( 'rendering_finished'       , re_rendering_finished       , parse_rendering_finished        ) ,
+                ( 'intersection_filter'      , re_intersection_filter      , parse_intersection_filter       ) )
+
+# message type -> msg_content keys of the values its parse function returns
+msg_keys = { 'loading_project_file'      : ( 'project_file_path', )                                       ,
+             'opening_texture_file'      : ( 'texture_path', )                                            ,
+             'rendering_progress'        : ( 'percentage', )                                              ,
+             'wrote_image_file'          : ( 'image_path', 'milliseconds' )                               ,
+             'loaded_mesh_file'          : ( 'mesh_path', 'objects', 'vertices', 'triangles', 'milliseconds' ) ,
+             'scene_bounding_box'        : ( 'bounding_box', )                                            ,
+             'scene_diameter'            : ( 'diameter', )                                                ,
+             'while_loading_mesh_object' : ( 'object', 'problem' )                                        ,
+             'tile_borders_wasted'       : ( 'percentage', 'tile_size', 'tile_margins' )                  ,
+             'rendering_threads'         : ( 'threads', )                                                 ,
+             'rendering_finished'        : ( 'seconds', )                                                 ,
+             'intersection_filter'       : ( 'object', 'materials', 'masks', 'uvs' )                      }
+
+# message type -> { msg_content key : index of its value }
+msg_key_indices = dict( ( msg_type, dict( ( key, i ) for i, key in enumerate( keys ) ) )
+                        for msg_type, keys in msg_keys.iteritems() )
+
+# msg_content keys kept as string table IDs, decoded on access
+id_keys = frozenset( [ 'project_file_path', 'texture_path', 'image_path', 'mesh_path', 'object' ] )
+
+# message type -> literal start of its message (after leading spaces), the
+# split engine only runs the regexes whose literal start matches
+msg_prefixes = { 'loading_project_file'      : 'loading project file '                   ,
+                 'opening_texture_file'      : 'opening texture file '                   ,
+                 'rendering_progress'        : 'rendering, '                             ,
+                 'wrote_image_file'          : 'wrote image file '                       ,
+                 'loaded_mesh_file'          : 'loaded mesh file '                       ,
+                 'scene_bounding_box'        : 'scene bounding box: '                    ,
+                 'scene_diameter'            : 'scene diameter: '                        ,
+                 'while_loading_mesh_object' : 'while loading mesh object "'             ,
+                 'tile_borders_wasted'       : 'rendering effort wasted by tile borders: ' ,
+                 'rendering_threads'         : 'using '                                  ,
+                 'rendering_finished'        : 'rendering finished in '                  ,
+                 'intersection_filter'       : 'created intersection filter for object "' }
+
+# first message character -> [ ( literal start, message type, regex, function ), ... ] in msg_parsers order
+msg_parsers_by_char = dict()
+for msg_type, regex, parse_fn in msg_parsers :
+    prefix = msg_prefixes[ msg_type ]
+    msg_parsers_by_char.setdefault( prefix[ 0 ], list() ).append( ( prefix, msg_type, regex, parse_fn ) )
+del msg_type, regex, parse_fn, prefix
+
+# message type -> msg_content key of its path (always its first value), stored in the `path` column
+path_keys = { 'loading_project_file' : 'project_file_path' ,
+              'opening_texture_file' : 'texture_path'      ,
+              'wrote_image_file'     : 'image_path'        ,
+              'loaded_mesh_file'     : 'mesh_path'         }
+
+# problem message categories, collected by the database and fingerprint exports
+problem_msg_cats = ( 'warning', 'error', 'fatal' )
+
+class ASLogLine( object ) :
+    """Class representing a parsed line of an appleseed log file
+
+    Give `types` to only parse the message content of those types, but for
+    lines of the `msg_cats` categories, other messages are left untyped.
+
+    The message content is kept as a tuple of values, paths and object names
+    as IDs of the process wide string table (`appleseed_log.strings`). Read
+    them with `msg_type`, `content()`, `path_id` and `path`, `msg_content`
+    builds the whole decoded dict on each access.
+    """
+
+    __slots__ = ( 'line'                  ,  # the whole line string
+                  'number'                ,  # the line number
+                  '_raw_timestamp'        ,  # timestamp string
+                  '_timestamp'            ,  # cached datetime
+                  'thread_id'             ,
+                  'vm'                    ,
+                  'msg_cat'               ,  # debug/info/warning/error
+                  'msg_rest'              ,  # Everything after the pipe
+                  'msg_type'              ,  # parsed message type, None if untyped
+                  '_values'               ,  # parsed message values in `msg_keys` order
+                  'frame_setting_trigger' ,
+                  'path_tracing_setting_trigger' )
+
+    def __init__( self, line, number = -1, stats = None, types = None, msg_cats = () ) :
+        """Init the class instance
+
+        Raise a ValueError is the given line is not parsable
+        """
+        assert isinstance( line  , basestring ), type( line   )
+        assert isinstance( number, int        ), type( number )
+
+        self.line           = line
+        self.number         = number
+        self._raw_timestamp = None
+        self._timestamp     = None
+        self.thread_id      = None
+        self.vm             = None
+        self.msg_cat        = None
+        self.msg_rest       = None
+        self.msg_type       = None
+        self._values        = ()
+
+        # option triggers
+        self.frame_setting_trigger        = False
+        self.path_tracing_setting_trigger = False
+
+        self.__parse( stats, types, msg_cats )
+
+    def __parse( self, stats = None, types = None, msg_cats = () ) :
+        """Parse line content and fill the ASLogLine instance
+
+        If `stats` (an `ASLogStats` instance) is given, the time spent in each
+        regex is recorded in it.
+        """
+
+        # first part of the line (always the same pattern)
+        if stats is None :
+            match_grp = re_main.match( self.line )
+        else :
+            start     = timer()
+            match_grp = re_main.match( self.line )
+            stats.add_time( 'header', timer() - start )
+
+        if not match_grp :
+            raise ValueError( "Can't parse line {0.number} : {0.line}".format( self ) )
+
+        self._raw_timestamp =      match_grp.group( 'timestamp'  )
+        self.thread_id      = int( match_grp.group( 'thread_id'  ) )
+        self.vm             = int( match_grp.group( 'vm'         ) )
+        self.msg_cat        = canonical( match_grp.group( 'msg_cat' ) )
+        self.msg_rest       =      match_grp.group( 'msg_rest'   )
+
+        # Second part of the line, message types are exclusive so we stop at
+        # the first matching regex.
+        msg_rest = self.msg_rest
+        parsers  = msg_parsers
+        if types is not None and self.msg_cat not in msg_cats :
+            parsers = [ parser for parser in msg_parsers if parser[ 0 ] in types ]
+
+        if stats is None :
+            for msg_type, regex, parse_fn in parsers :
+                match_grp = regex.match( msg_rest )
+                if match_grp :
+                    self.msg_type = msg_type
+                    self._values  = parse_fn( match_grp )
+                    break
+        else :
+            for msg_type, regex, parse_fn in parsers :
+                start     = timer()
+                match_grp = regex.match( msg_rest )
+                stats.add_time( msg_type, timer() - start )
+                if match_grp :
+                    self.msg_type = msg_type
+                    self._values  = parse_fn( match_grp )
+                    break
+
+        #######################################################################
+        # Triggers
+        #######################################################################
+        match_grp = re_opt_frame_settings_trigger.match( msg_rest )
+        if match_grp :
+            self.frame_setting_trigger = True
+
+        match_grp = re_opt_path_tracing_settings_trigger.match( msg_rest )
+        if match_grp :
+            self.path_tracing_setting_trigger = True
+
+    @property
+    def msg_content( self ) :
+        """Return the details (dict) of msg_rest, built and decoded on each access."""
+        msg_content = { 'type' : self.msg_type }
+        for key, value in zip( msg_keys.get( self.msg_type, () ), self._values ) :
+            msg_content[ key ] = strings[ value ] if key in id_keys else value
+        return msg_content
+
+    def content( self, key, default = None ) :
+        """Return the given msg_content value (paths and objects decoded), `default` if the message has none."""
+        indices = msg_key_indices.get( self.msg_type )
+        i       = indices.get( key ) if indices else None
+        if i is None :
+            return self.msg_type if key == 'type' else default
+        return strings[ self._values[ i ] ] if key in id_keys else self._values[ i ]
+
+    def content_id( self, key ) :
+        """Return the string table ID of the given path or object key, 0 if the message has none."""
+        indices = msg_key_indices.get( self.msg_type )
+        i       = indices.get( key ) if indices else None
+        return 0 if i is None or key not in id_keys else self._values[ i ]
+
+    @property
+    def path_id( self ) :
+        """Return the string table ID of the path of the message (see `path_keys`), 0 if it has none."""
+        return self._values[ 0 ] if self.msg_type in path_keys else 0
+
+    @property
+    def path( self ) :
+        """Return the path of the message (see `path_keys`), None if it has none."""
+        return strings[ self.path_id ]
+
+    @property
+    def is_empty( self ) :
+        """Return if the line is empty"""
+        return len( self.line ) == 0 or self.line == '\n'
+
+    @property
+    def timestamp( self ) :
+        """Return a `datetime` object corresponding the given line"""
+        if self._timestamp is None and self._raw_timestamp is not None :
+            self._timestamp = datetime.datetime.strptime( self._raw_timestamp ,
+                                                          datetime_str_format )
+        return self._timestamp
+
+
+# characters of a raw timestamp, anything else left by translate() is invalid
+timestamp_chars = '0123456789TZ:.-'
+
+def parse_timestamp( raw ) :
+    """Convert a raw log timestamp ('2014-02-22T15:44:52.991536Z') to `datetime`.
+
+    Fields are converted from fixed slices, much faster than `strptime`
+    which is only used for timestamps of an unexpected layout. Both str and
+    unicode (read back from json) timestamps are accepted.
+    """
+    if len( raw ) == 27 and raw[ 4 ] == raw[ 7 ] == '-' and raw[ 13 ] == raw[ 16 ] == ':' and \
+       raw[ 10 ] == 'T' and raw[ 19 ] == '.' and raw[ 26 ] == 'Z'                          and \
+       ( raw[ 0:4 ] + raw[ 5:7 ] + raw[ 8:10 ] + raw[ 11:13 ] + raw[ 14:16 ] + raw[ 17:19 ] + raw[ 20:26 ] ).isdigit() :
+        return datetime.datetime( int( raw[ 0:4 ] ), int( raw[ 5:7 ] ), int( raw[ 8:10 ] )   ,
+                                  int( raw[ 11:13 ] ), int( raw[ 14:16 ] ), int( raw[ 17:19 ] ) ,
+                                  int( raw[ 20:26 ] ) )
+    return datetime.datetime.strptime( raw, datetime_str_format )
+
+def parse_msg_values( msg_rest, stats = None, types = None ) :
+    """Return ( message type, values ) of the given message using `msg_prefixes`.
+
+    Only the regexes whose literal start matches the message run, so most
+    messages are typed with a couple of `startswith()` calls. Give `types`
+    to only parse those message types, other messages are left untyped.
+    """
+
+    stripped = msg_rest.lstrip()
+
+    for prefix, msg_type, regex, parse_fn in msg_parsers_by_char.get( stripped[ :1 ], () ) :
+        if not stripped.startswith( prefix ) or types is not None and msg_type not in types :
+            continue
+        if stats is None :
+            match_grp = regex.match( msg_rest )
+        else :
+            start     = timer()
+            match_grp = regex.match( msg_rest )
+            stats.add_time( msg_type, timer() - start )
+        if match_grp :
+            return msg_type, parse_fn( match_grp )
+
+    return None, ()
+
+
+class ASLogSplitLine( ASLogLine ) :
+    """`ASLogLine` parsed with string splits instead of regexes.
+
+    The header is split on the pipe and on whitespace, the message type is
+    found through `msg_prefixes` and the timestamp is decoded from fixed
+    slices on first access. Both engines give the same values (checked by
+    `appleseed_log.conformance`), select one with `ASLog( path, engine = 'split' )`.
+    """
+
+    __slots__ = ()
+
+    def __init__( self, line, number = -1, stats = None, types = None, msg_cats = () ) :
+        """Init the class instance
+
+        Raise a ValueError is the given line is not parsable
+        """
+        assert isinstance( line  , basestring ), type( line   )
+        assert isinstance( number, int        ), type( number )
+
+        self.line       = line
+        self.number     = number
+        self._timestamp = None
+
+        if stats is None :
+            self.__parse()
+        else :
+            start = timer()
+            self.__parse()
+            stats.add_time( 'header', timer() - start )
+
+        # parsed here, not on access, as a malformed message makes the line unparsable
+        if self.msg_cat in msg_cats :
+            types = None
+        self.msg_type, self._values = parse_msg_values( self.msg_rest, stats, types )
+
+    def __parse( self ) :
+
+        header, pipe, msg_rest = self.line.partition( '|' )
+        fields                 = header.split()
+
+        # same checks as the re_main regex
+        if not pipe or len( fields ) != 5 or not header[ -1: ].isspace() or header[ :1 ].isspace() :
+            raise ValueError( "Can't parse line {0.number} : {0.line}".format( self ) )
+
+        raw_timestamp, thread_id, vm, mb, msg_cat = fields
+
+        if raw_timestamp.translate( None, timestamp_chars )                          or \
+           len( thread_id ) != 5 or thread_id[ 0 ] != '<' or thread_id[ 4 ] != '>'  or \
+           not thread_id[ 1:4 ].isdigit() or not vm.isdigit() or mb != 'MB'         or \
+           not msg_cat.replace( '_', 'a' ).isalnum()                                   :
+            raise ValueError( "Can't parse line {0.number} : {0.line}".format( self ) )
+
+        self._raw_timestamp = raw_timestamp
+        self.thread_id      = int( thread_id[ 1:4 ] )
+        self.vm             = int( vm )
+        self.msg_cat        = canonical( msg_cat )
+        self.msg_rest       = msg_rest.partition( '\n' )[ 0 ]
+
+        stripped = self.msg_rest.lstrip()
+        self.frame_setting_trigger        = stripped.startswith( 'frame settings:'        )
+        self.path_tracing_setting_trigger = stripped.startswith( 'path tracing settings:' )
+
+    @property
+    def timestamp( self ) :
+        """Return a `datetime` object corresponding the given line"""
+        if self._timestamp is None :
+            self._timestamp = parse_timestamp( self._raw_timestamp )
+        return self._timestamp
+
+# engine name -> line class, see `ASLog( path, engine = ... )`
+line_engines = { 'regex' : ASLogLine      ,
+                 'split' : ASLogSplitLine }
+
+def stream_chunks( stream, size = read_size ) :
+    """Yield the byte chunks of a file object, or the strings of an iterable.
+
+    File objects with a descriptor (pipes, stdin) are read with `os.read()`
+    which returns the bytes already written instead of waiting for a whole
+    chunk, so lines of a running render come as soon as they are logged.
+    """
+    if not hasattr( stream, 'read' ) :
+        for chunk in stream :
+            yield chunk
+        return
+
+    try :
+        fd = stream.fileno()
+    except ( AttributeError, IOError, ValueError ) :
+        fd = None
+
+    while True :
+        chunk = os.read( fd, size ) if fd is not None else stream.read( size )
+        if not chunk :
+            break
+        yield chunk
+
+def chunk_lines( chunks ) :
+    """Yield the complete lines (list) of each of the given byte chunks.
+
+    Lines end with '\\n' (the windows '\\r' is removed), but the last line of
+    the stream which is yielded alone at the end.
+    """
+    pending = ''
+    for chunk in chunks :
+        lines   = ( pending + chunk ).split( '\n' )
+        pending = lines.pop()
+        yield [ ( line[ :-1 ] if line.endswith( '\r' ) else line ) + '\n' for line in lines ]
+    if pending :
+        yield [ pending ]
+
+def read_lines( path, engine = 'split' ) :
+    """Yield the parsed lines of the log at the given path without keeping them.
+
+    Unparsable and empty lines are skipped.
+    """
+    line_class = line_engines[ engine ]
+    for number, line in enumerate( ASLog( path, parse = False )._lines ) :
+        try :
+            line_data = line_class( line, number )
+        except ValueError :
+            continue
+        if not line_data.is_empty :
+            yield line_data
+
+
+class ASLogStats( object ) :
+    """Parse instrumentation of an ASLog instance.
+
+    Store the time spent per parse stage (file read, header regex, each message
+    type regex, timestamp decode and option blocks), line counts per message
+    type and per category, and unparsable line counts per reason with a bounded
+    number of samples.
+
+    :Example:
+
+    >>> as_log = ASLog( 'frame.1001.log', stats = True )
+    >>> as_log.stats.timings[ 'header' ]
+    0.0124...
+    >>> as_log.stats.dump( 'frame.1001.stats.json' )
+    """
+
+    def __init__( self, max_samples = 10 ) :
+
+        self.max_samples = max_samples  # max bad line samples kept per reason
+
+        self.timings     = dict()  # stage -> total seconds
+        self.calls       = dict()  # stage -> call count
+        self.line_types  = dict()  # message type -> line count
+        self.msg_cats    = dict()  # message category -> line count
+        self.unparsable  = dict()  # reason -> line count
+        self.samples     = dict()  # reason -> [ ( line number, line ), ... ]
+
+    def add_time( self, stage, seconds ) :
+        """Add the given elapsed seconds to the given stage."""
+        self.timings[ stage ] = self.timings.get( stage, 0.0 ) + seconds
+        self.calls[   stage ] = self.calls.get(   stage, 0   ) + 1
+
+    def add_line( self, line_data ) :
+        """Count the given parsed line."""
+        line_type = line_data.msg_type
+        self.line_types[ line_type          ] = self.line_types.get( line_type, 0 ) + 1
+        self.msg_cats[   line_data.msg_cat  ] = self.msg_cats.get( line_data.msg_cat, 0 ) + 1
+
+    def add_unparsable( self, reason, number, line ) :
+        """Count an unparsable line and keep it if we don't have enough samples."""
+        self.unparsable[ reason ] = self.unparsable.get( reason, 0 ) + 1
+
+        samples = self.samples.setdefault( reason, list() )
+        if len( samples ) < self.max_samples :
+            samples.append( ( number, line ) )
+
+    @property
+    def total_time( self ) :
+        """Return the sum of every stage time in seconds."""
+        return sum( self.timings.values() )
+
+    def to_dict( self ) :
+        """Return the stats as a json serializable dict."""
+        return { 'timings'    : self.timings    ,
+                 'calls'      : self.calls      ,
+                 'total_time' : self.total_time ,
+                 'line_types' : dict( ( str( k ), v ) for k, v in self.line_types.items() ) ,
+                 'msg_cats'   : self.msg_cats   ,
+                 'unparsable' : self.unparsable ,
+                 'samples'    : self.samples    }
+
+    def to_json( self, indent = 4 ) :
+        """Return the stats as a json string."""
+        return json.dumps( self.to_dict(), indent = indent, sort_keys = True )
+
+    def dump( self, path ) :
+        """Write the stats as json at the given path."""
+        with open( path, 'w' ) as json_file :
+            json_file.write( self.to_json() )
+
+
+def unparsable_reason( line ) :
+    """Return a short reason explaining why the given line can't be parsed."""
+    if not line.strip() :
+        return 'empty'
+    if not line.endswith( '\n' ) :
+        return 'truncated'
+    if not re_main.match( line ) :
+        return 'header_mismatch'
+    return 'unknown'
+
+
+class ASLogColumns( object ) :
+    """Column arrays of parsed lines, used to run vectorized queries.
+
+    `msg_cat`, `type` and `path` are stored as IDs of the process wide string
+    table (`appleseed_log.strings`), see `code()` and `value()` to convert
+    from/to their string values. Lines without path have the path ID 0.
+    """
+
+    fields = ( 'time', 'vm', 'thread_id', 'msg_cat', 'type', 'path', 'number' )
+
+    def __init__( self ) :
+
+        self.time      = array.array( 'd' )  # seconds since first line
+        self.vm        = array.array( 'l' )
+        self.thread_id = array.array( 'l' )
+        self.msg_cat   = array.array( 'I' )
+        self.type      = array.array( 'I' )
+        self.path      = array.array( 'I' )
+        self.number    = array.array( 'l' )  # line number in the file
+        self.msg_rest  = list()              # shared with the lines
+
+        # True as long as time never goes backward, allow bisect on time
+        self.time_sorted = True
+
+    def __len__( self ) :
+        return len( self.number )
+
+    def code( self, field, value, create = False ) :
+        """Return the code of the given `msg_cat`/`type`/`path` value, None if unknown."""
+        if create :
+            return strings.intern( value )
+        return strings.id( value )
+
+    def value( self, field, code ) :
+        """Return the `msg_cat`/`type`/`path` value of the given code."""
+        return strings[ code ]
+
+    def extend( self, lines_data, first_datetime ) :
+        """Append the given lines to the columns."""
+
+        intern = strings.intern
+
+        for line_data in lines_data :
+            time = ( line_data.timestamp - first_datetime ).total_seconds()
+            if self.time and time < self.time[ -1 ] :
+                self.time_sorted = False
+
+            self.time.append(      time                          )
+            self.vm.append(        line_data.vm                  )
+            self.thread_id.append( line_data.thread_id           )
+            self.msg_cat.append(   intern( line_data.msg_cat )   )
+            self.type.append(      intern( line_data.msg_type )  )
+            self.path.append(      line_data.path_id             )
+            self.number.append(    line_data.number              )
+            self.msg_rest.append(  line_data.msg_rest            )
+
+
+class ASLog( object ) :
+    """The main appleseed log class
+
+    :Example:
+
+    >>> from appleseed_log import ASLog
+    >>> as_log = ASLog('frame.1001.log')
+    >>> list(as_log.opened_texture_files)
+    ['./_textures/coke_can_diff.exr', './_textures/coke_can_diff.exr', ...]
+    >>> as_log.ranges['vm']
+    (10, 108)
+    >>> for line in as_log:
+    ...     print line.msg_content
+    ...
+    {'vertices': 16, 'mesh_path': './_geometry/...
+
+    Give `stats = True` to record parse instrumentation in `ASLog.stats`.
+
+    Give `follow = True` for a log still being written: a trailing line
+    without end of line is then left for the next `update()` call, or
+    parsed by `update( complete = True )`.
+
+    Give `parse = False` to only use `lines_range()` and `between()`, they
+    then seek in the file using its sparse index instead of parsing it all.
+
+    Give `engine = 'split'` to parse lines with `ASLogSplitLine`, which
+    splits headers and types messages from their literal prefixes instead
+    of regexes, message contents are still parsed with the line. Any
+    `ASLogLine` like class can also be given.
+
+    Give `summary = True` to fill `ASLog.summary` while parsing, and
+    `keep_lines = False` to only keep this constant memory summary, the
+    ranges and the render options of a huge log, not its lines.
+
+    Handlers given to `subscribe()` are called with the lines they asked for
+    while parsing, so analyses share a single pass. Without kept lines nor
+    summary only subscribed messages are typed:
+
+    >>> as_log = ASLog( 'frame.1001.log', parse = False, keep_lines = False, summary = False )
+    >>> as_log.subscribe( progress.append, types = [ 'rendering_progress' ] )
+    >>> as_log.subscribe( errors.append, msg_cats = [ 'error', 'fatal' ] )
+    >>> as_log.update()
+
+    `path` can also be a file object (like `sys.stdin`) or an iterable of
+    byte chunks, parsed up to its end, see `appleseed_log.stream` to consume
+    a render output while it runs.
+
+    Give `store = 'zlib'` (or 'lzma', or a `BlockStore`) to keep the raw
+    text of every line compressed instead of in `ASLogLine.line`, which is
+    then None, read it with `line_text()`.
+    """
+
+    def __init__( self, path, stats = False, follow = False, parse = True, engine = 'regex' ,
+                  summary = None, keep_lines = True, store = None ) :
+
+        self._path       = path
+        self._lines_data = list()
+        self._line_class = line_engines[ engine ] if isinstance( engine, basestring ) else engine
+        self._keep_lines = keep_lines
+        self._summary    = ASLogSummary() if summary or summary is None and not keep_lines else None
+        self._store      = BlockStore( store ) if isinstance( store, basestring ) else store
+
+        # incremental parse
+        self._follow     = follow
+        self._offset     = 0 # bytes of the file already parsed
+        self._line_count = 0 # lines of the file already parsed
+
+        # options
+        self._options    = dict()
+        self._triggereds = set()
+
+        # ranges
+        self._ranges                     = dict()
+        self._ranges[ 'first_datetime' ] = None
+        self._ranges[ 'last_datetime'  ] = None
+        self._ranges[ 'vm'             ] = ( 9999999, -9999999 )
+
+        # lazily built column arrays and seek index
+        self._columns      = None
+        self._index        = None
+        self._templates    = None
+        self._template_ids = array.array( 'I' )  # template ID of each parsed line
+        self._parsed     = False
+
+        # instrumentation
+        self._stats            = ASLogStats() if stats else None
+        self._unparsable_count = 0
+
+        # subscriptions
+        self._subscriptions = list()  # [ ( handler, types, msg_cats ), ... ]
+        self._type_handlers = dict()  # message type -> handlers
+        self._cat_handlers  = dict()  # message category -> handlers
+        self._all_handlers  = list()  # handlers of every line
+        self._content_types = None    # ( types, msg_cats ) given to lines, None to type every line
+
+        if parse :
+            self._parse()
+
+    def __len__( self ) :
+        return len( self._lines_data )
+
+    def __getitem__( self, index ) :
+        return self._lines_data[ index ]
+
+    @property
+    def _lines( self ) :
+        """Read lines from the log file, starting after the latest parsed one."""
+
+        if not isinstance( self._path, basestring ) :
+            # a stream is read up to its end, a last line without end of line included
+            for lines in chunk_lines( stream_chunks( self._path ) ) :
+                for line in lines :
+                    self._offset += len( line )
+                    yield line
+            return
+
+        with open( self._path, 'rb' ) as log_file :
+
+            log_file.seek( self._offset )
+            pending = ''
+
+            while True :
+                chunk = log_file.read( read_size )
+                if not chunk :
+                    break
+
+                lines   = ( pending + chunk ).split( '\n' )
+                pending = lines.pop()
+
+                for line in lines :
+                    self._offset += len( line ) + 1
+                    if line.endswith( '\r' ) :
+                        line = line[:-1]
+                    yield line + '\n'
+
+            # last line without end of line, maybe still being written
+            if pending and not self._follow :
+                self._offset += len( pending )
+                yield pending
+
+    def update( self, complete = False ) :
+        """Parse lines appended to the log file since the latest parse.
+
+        Give `complete = True` once a followed log stopped changing, its last
+        line without end of line is then parsed too. Return the number of new
+        parsed lines.
+        """
+        count        = len( self._lines_data )
+        follow       = self._follow
+        self._follow = follow and not complete
+        try :
+            self._parse()
+        finally :
+            self._follow = follow
+        return len( self._lines_data ) - count
+
+    def _parse( self ) :
+
+        stats            = self._stats
+        unparsable_count = self._unparsable_count
+        self._parsed     = True
+
+        if stats is None :
+            for i, line in enumerate( self._lines, self._line_count ) :
+                self._parse_line( line, i )
+        else :
+            lines = self._lines
+            i     = self._line_count
+            while True :
+                start = timer()
+                try :
+                    line = next( lines )
+                except StopIteration :
+                    break
+                stats.add_time( 'read', timer() - start )
+
+                self._parse_line( line, i )
+                i += 1
+
+        # Only one message, printing each line would flood the output.
+        if self._unparsable_count > unparsable_count :
+            print "Warning, can't parse {0} lines of {1}".format( self._unparsable_count - unparsable_count ,
+                                                                  getattr( self._path, 'name', self._path )  )
+
+    def add_lines( self, lines ) :
+        """Parse the given raw lines, coming after the latest parsed one.
+
+        Used to feed a log read elsewhere, see `appleseed_log.stream`.
+        Return the parsed lines, even if they are not kept.
+        """
+        self._parsed = True
+        parsed       = list()
+        for line in lines :
+            line_data = self._parse_line( line, self._line_count )
+            if line_data is not None :
+                parsed.append( line_data )
+        return parsed
+
+    def _parse_line( self, line, number ) :
+        """Parse the given raw line and update the log with it.
+
+        Return the parsed line, None if it's empty or unparsable.
+        """
+
+        stats             = self._stats
+        self._line_count += 1
+
+        if self._store is not None :
+            self._store.append( line )
+
+        try :
+            if self._content_types is None :
+                line_data = self._line_class( line, number, stats )
+            else :
+                line_data = self._line_class( line, number, stats, *self._content_types )
+        except Exception :
+            self._unparsable_count += 1
+            if stats is not None :
+                stats.add_unparsable( unparsable_reason( line ), number, line )
+            return None
+
+        if line_data.is_empty :
+            return None
+
+        if self._store is not None :
+            line_data.line = None # read it back with `line_text()`
+        if self._keep_lines :
+            self._lines_data.append( line_data )
+        if self._summary is not None :
+            self._summary.add( line_data )
+
+        blocks = set( self._triggereds ) if 'render_options' in self._type_handlers else None
+
+        if stats is None :
+            self._parse_options( line_data )
+            self._update_ranges( line_data )
+        else :
+            stats.add_line( line_data )
+
+            start = timer()
+            self._parse_options( line_data )
+            stats.add_time( 'options', timer() - start )
+
+            start = timer()
+            line_data.timestamp
+            stats.add_time( 'timestamp', timer() - start )
+
+            self._update_ranges( line_data )
+
+        if self._subscriptions :
+            self._dispatch( line_data, blocks )
+
+        return line_data
+
+    def subscribe( self, handler, types = None, msg_cats = None ) :
+        """Call `handler( line_data )` with each parsed line of the given message types or categories.
+
+        The 'render_options' type gets the line ending an option block, read
+        `render_options` then. Without types nor categories the handler gets
+        every line. Return the handler, see `unsubscribe()`.
+        """
+        self._subscriptions.append( ( handler ,
+                                      None if types    is None else frozenset( types    ) ,
+                                      None if msg_cats is None else frozenset( msg_cats ) ) )
+        self._update_subscriptions()
+        return handler
+
+    def unsubscribe( self, handler ) :
+        """Stop calling the given handler."""
+        self._subscriptions = [ s for s in self._subscriptions if s[ 0 ] != handler ]
+        self._update_subscriptions()
+
+    def _update_subscriptions( self ) :
+
+        self._type_handlers = dict()
+        self._cat_handlers  = dict()
+        self._all_handlers  = list()
+        for handler, types, msg_cats in self._subscriptions :
+            if types is None and msg_cats is None :
+                self._all_handlers.append( handler )
+            for msg_type in types or () :
+                self._type_handlers.setdefault( msg_type, list() ).append( handler )
+            for msg_cat in msg_cats or () :
+                self._cat_handlers.setdefault( msg_cat, list() ).append( handler )
+
+        # lines are only typed for subscribers when nothing else reads them
+        self._content_types = None
+        if self._subscriptions and not self._all_handlers and not self._keep_lines and \
+           self._summary is None and self._stats is None :
+            self._content_types = ( frozenset( self._type_handlers ) - frozenset( [ 'render_options' ] ) ,
+                                    frozenset( self._cat_handlers  ) )
+
+    def _dispatch( self, line_data, blocks ) :
+        """Call the handlers subscribed to the given line."""
+
+        for handler in self._all_handlers :
+            handler( line_data )
+
+        type_handlers = self._type_handlers.get( line_data.msg_type, () )
+        for handler in type_handlers :
+            handler( line_data )
+
+        for handler in self._cat_handlers.get( line_data.msg_cat, () ) :
+            if handler not in type_handlers :
+                handler( line_data )
+
+        # an option block ended with this line
+        if blocks and not blocks.issubset( self._triggereds ) :
+            for handler in self._type_handlers[ 'render_options' ] :
+                handler( line_data )
+
+    def _parse_options( self, line_data ) :
+        """Fill the render options from the given line if it's part of an option block."""
+
+        triggereds = self._triggereds
+        msg_rest   = line_data.msg_rest
+
+        # an option block ends at the first non option line, even if its
+        # latest expected option is missing.
+        if triggereds and not re_opt_line.match( msg_rest ) :
+            triggereds.clear()
+
+        if 'frame_settings' in triggereds :
+            ############################################################
+            # Frame settings
+            ############################################################
+            if 'frame_settings' not in self._options :
+                self._options[ 'frame_settings' ] = dict()
+
+            # shortcut
+            d = self._options[ 'frame_settings' ]
+
+            match_grp = re_opt_frame_settings_resolution.match( msg_rest )
+            if match_grp :
+                x = to_int( match_grp.group( 'x_resolution' ) )
+                y = to_int( match_grp.group( 'y_resolution' ) )
+                d[ 'resolution' ] = ( x, y )
+
+            match_grp = re_opt_frame_settings_tile_size.match( msg_rest )
+            if match_grp :
+                x = to_int( match_grp.group( 'x_resolution' ) )
+                y = to_int( match_grp.group( 'y_resolution' ) )
+                d[ 'tile_size' ] = ( x, y )
+
+            match_grp = re_opt_frame_settings_pixel_format.match( msg_rest )
+            if match_grp :
+                d[ 'pixel_format' ] = match_grp.group( 'pixel_format' )
+
+            match_grp = re_opt_frame_settings_filter.match( msg_rest )
+            if match_grp :
+                d[ 'filter' ] = match_grp.group( 'filter' )
+
+            match_grp = re_opt_frame_settings_filter_size.match( msg_rest )
+            if match_grp :
+                d[ 'filter_size' ] = float( match_grp.group( 'filter_size' ) )
+
+            match_grp = re_opt_frame_settings_color_space.match( msg_rest )
+            if match_grp :
+                d[ 'color_space' ] = match_grp.group( 'color_space' )
+
+            match_grp = re_opt_frame_settings_premult_alpha.match( msg_rest )
+            if match_grp :
+                premult_alpha = match_grp.group( 'premult_alpha' )
+                d[ 'premult_alpha' ] = True if premult_alpha == 'on' else False
+
+            match_grp = re_opt_frame_settings_clamping.match( msg_rest )
+            if match_grp :
+                clamping = match_grp.group( 'clamping' )
+                d[ 'clamping' ] = True if clamping == 'on' else False
+
+            match_grp = re_opt_frame_settings_gamma_correction.match( msg_rest )
+            if match_grp :
+                d[ 'gamma_correction' ] = float( match_grp.group( 'gamma_correction' ) )
+
+            # latest line of the option
+            match_grp = re_opt_frame_settings_crop_window.match( msg_rest )
+            if match_grp :
+                x_top_left     = to_int( match_grp.group( 'x_top_left'     ) )
+                y_top_left     = to_int( match_grp.group( 'y_top_left'     ) )
+                x_bottom_right = to_int( match_grp.group( 'x_bottom_right' ) )
+                y_bottom_right = to_int( match_grp.group( 'y_bottom_right' ) )
+                d[ 'crop_window' ] = ( x_top_left     , y_top_left     ,
+                                       x_bottom_right , y_bottom_right )
+                triggereds.remove( 'frame_settings' ) # close the option
+
+        if 'path_tracing_settings' in triggereds :
+            ############################################################
+            # Path tracing settings
+            ############################################################
+            d = self._options.setdefault( 'path_tracing_settings', dict() )
+
+            match_grp = re_opt_path_tracing_settings_direct_lighting.match( msg_rest )
+            if match_grp :
+                d[ 'direct_lighting' ] = match_grp.group( 'direct_lighting' ) == 'on'
+
+            match_grp = re_opt_path_tracing_settings_ibl.match( msg_rest )
+            if match_grp :
+                d[ 'ibl' ] = match_grp.group( 'ibl' ) == 'on'
+
+            match_grp = re_opt_path_tracing_settings_caustics.match( msg_rest )
+            if match_grp :
+                d[ 'caustics' ] = match_grp.group( 'caustics' ) == 'on'
+
+            match_grp = re_opt_path_tracing_settings_max_path_length.match( msg_rest )
+            if match_grp :
+                d[ 'max_path_length' ] = to_int_or_inf( match_grp.group( 'max_path_length' ) )
+
+            match_grp = re_opt_path_tracing_settings_rr_min_path_len.match( msg_rest )
+            if match_grp :
+                d[ 'rr_min_path_length' ] = to_int_or_inf( match_grp.group( 'rr_min_path_length' ) )
+
+            match_grp = re_opt_path_tracing_settings_next_event_est.match( msg_rest )
+            if match_grp :
+                d[ 'next_event_estimation' ] = match_grp.group( 'next_event_estimation' ) == 'on'
+
+            match_grp = re_opt_path_tracing_settings_dl_light_samples.match( msg_rest )
+            if match_grp :
+                d[ 'dl_light_samples' ] = float( match_grp.group( 'dl_light_samples' ) )
+
+            match_grp = re_opt_path_tracing_settings_ibl_env_samples.match( msg_rest )
+            if match_grp :
+                d[ 'ibl_env_samples' ] = float( match_grp.group( 'ibl_env_samples' ) )
+
+            # latest line of the option
+            match_grp = re_opt_path_tracing_settings_max_ray_intens.match( msg_rest )
+            if match_grp :
+                d[ 'max_ray_intensity' ] = to_float_or_inf( match_grp.group( 'max_ray_intensity' ) )
+                triggereds.remove( 'path_tracing_settings' ) # close the option
+
+        if line_data.frame_setting_trigger :
+            triggereds.add( 'frame_settings' )
+
+        if line_data.path_tracing_setting_trigger :
+            triggereds.add( 'path_tracing_settings' )
+
+    def _update_ranges( self, line_data ) :
+        """Update graph ranges if needed."""
+
+        ranges    = self._ranges
+        timestamp = line_data.timestamp
+
+        if ranges[ 'first_datetime' ] is None :
+            ranges[ 'first_datetime' ] = timestamp
+
+        if ranges[ 'last_datetime' ] is None      or \
+           ranges[ 'last_datetime' ] < timestamp     :
+            ranges[ 'last_datetime' ] = timestamp
+
+        vm_min, vm_max = ranges[ 'vm' ]
+        if line_data.vm < vm_min or line_data.vm > vm_max :
+            ranges[ 'vm' ] = ( min( vm_min, line_data.vm ) ,
+                               max( vm_max, line_data.vm ) )
+
+    def export_to_csv( self, path ) :
+        """Export the current parsed log to csv at the given path."""
+
+        csv_file   = open( path, 'wb' )
+        csv_writer = csv.writer( csv_file                  ,
+                                 delimiter = ';'           ,
+                                 quotechar = '"'           ,
+                                 quoting   = csv.QUOTE_ALL )
+        csv_writer.writerow( [ 'Time in sec' ,
+                               'VM'          ,
+                               'Progress'    ] )
+
+        progress = 0.0
+
+        for line in self._lines_data :
+
+            line_delta_time = line.timestamp - self._ranges[ 'first_datetime' ]
+            time_in_sec     = line_delta_time.total_seconds()
+
+            # Second part of the message
+            if line.msg_type == 'rendering_progress' :
+                progress = line.content( 'percentage' )
+
+            csv_writer.writerow( [ float( time_in_sec ) ,
+                                   float( line.vm     ) ,
+                                   float( progress    ) ] )
+
+        csv_file.close()
+
+        print "Exported to csv file : %s" % path
+
+    def export_to_sqlite( self, path ) :
+        """Export the current parsed log to the SQLite database at the given path.
+
+        See `appleseed_log.database` to export many logs at once.
+        """
+        from .database import ASLogDatabase
+
+        database = ASLogDatabase( path )
+        database.add_log( self )
+        database.close()
+
+        print "Exported to SQLite database : %s" % path
+
+    def export_to_chrome_trace( self, path ) :
+        """Export the phase and thread timeline of the parsed log as a Chrome trace.
+
+        See `appleseed_log.timeline` to stream huge logs with merged spans.
+        """
+        from .timeline import export_trace
+
+        export_trace( self._lines_data, path )
+
+        print "Exported to Chrome trace file : %s" % path
+
+    def memory_footprints( self ) :
+        """Return the memory footprint of each render session of the parsed log.
+
+        See `appleseed_log.memory` to build it while parsing many logs.
+        """
+        from .memory import ASLogMemory
+
+        memory = ASLogMemory( self._path )
+        for line_data in self._lines_data :
+            memory.add( line_data )
+        return memory.footprints()
+
+    def export_to_gnuplot( self, file_path ) :
+        """Export the .csv and the .plot file to execute with gnuplot.
+
+        The given file path shouldn't have file extention.
+        """
+
+        csv_path  = file_path + ".csv"
+        plot_path = file_path + ".plot"
+
+        self.export_to_csv( csv_path )
+
+        # Add few margin for cosmetic graph
+        vm_for_graph = self._ranges[ 'vm_max' ]
+        last_second = ( self._ranges[ 'last_datetime' ] - self._ranges[ 'first_datetime' ] ).total_seconds()
+        margin_second = last_second*0.05+1
+        last_second += margin_second
+
+        # Generate the gnuplot string
+        raw_str  = str()
+        #raw_str += 'set terminal x11 persist\n'
+        raw_str += 'set xtics font "Times-Roman, 6"\n'
+        raw_str += 'set datafile separator ";"\n'
+        raw_str += 'plot "%s" using 1:2 with lines title columnhead axes x1y1,' % csv_path
+        raw_str += ' "" using 1:3 with lines title columnhead axes x1y2\n'
+        raw_str += 'set yrange [0:%s]\n' % int( vm_for_graph )
+        raw_str += 'set ylabel "VM: 0-%s MB"\n' % int( vm_for_graph)
+        #raw_str += 'set autoscale y\n'
+        raw_str += 'set autoscale y2\n'
+        #raw_str += 'set y2range [0:100]\n' # progress is percentage
+        #raw_str += 'set y2label "Progress"\n'
+        #raw_str += 'set ytics 60\n'
+        #raw_str += 'set mxtics 1\n'
+        raw_str += 'set xdata time\n'
+        raw_str += 'set timefmt "%s"\n'
+        raw_str += 'set format x "%Hh%Mm"\n'
+        raw_str += 'set xlabel "Time"\n'
+        #raw_str += 'set ylabel "Angle"\n'
+        #raw_str += 'set xrange [%s:%s]\n' % ( -margin_second, last_second )
+        raw_str += 'set title "%s"\n' % os.path.basename( 'toto' ) # self._path TODO this method should be outside the class
+        raw_str += 'replot\n'
+        raw_str += 'pause -1  "Hit return to continue"\n'
+
+        with open( plot_path, 'w' ) as plot_file :
+            plot_file.write( raw_str )
+
+        print "Exported to gnuplot script : %s" % plot_path
+
+    @property
+    def loaded_mesh_files( self ) :
+        """Return a list of loaded mesh files found in the log."""
+        return self._path_get( 'mesh_path', 'loaded_mesh_file' )
+
+    @property
+    def scene_bounding_box( self ) :
+        """Return the scene bounding box ((x,y,z),(x,y,z))."""
+        return self._path_get( 'bounding_box', 'scene_bounding_box' )
+
+    @property
+    def scene_diameter( self ) :
+        """Return an iterator over scene diameters"""
+        return self._path_get( 'diameter', 'scene_diameter' )
+
+    @property
+    def loaded_project_files( self ) :
+        """Return an iterator over loaded project files found in the log."""
+        return self._path_get( 'project_file_path', 'loading_project_file' )
+
+    @property
+    def opened_texture_files( self ) :
+        """Return an iterator over opened texture files found in the log."""
+        return self._path_get( 'texture_path', 'opening_texture_file' )
+
+    @property
+    def rendering_threads( self ) :
+        """Return an iterator over rendering thread counts found in the log."""
+        return self._path_get( 'threads', 'rendering_threads' )
+
+    @property
+    def tile_borders_wasted( self ) :
+        """Return an iterator over rendering effort (percentage) wasted by tile borders."""
+        return self._path_get( 'percentage', 'tile_borders_wasted' )
+
+    @property
+    def rendering_durations( self ) :
+        """Return an iterator over rendering durations (seconds) found in the log."""
+        return self._path_get( 'seconds', 'rendering_finished' )
+
+    @property
+    def opened_texture_ids( self ) :
+        """Return the string IDs (array) of opened texture files found in the log."""
+        return self.path_ids( 'opening_texture_file' )
+
+    @property
+    def loaded_mesh_ids( self ) :
+        """Return the string IDs (array) of loaded mesh files found in the log."""
+        return self.path_ids( 'loaded_mesh_file' )
+
+    def path_ids( self, type ) :
+        """Return the string IDs (array) of the paths of the given message type.
+
+        Decode them with `appleseed_log.strings`, IDs are shared by every log
+        of the process so logs can be joined on them.
+        """
+        columns = self.columns
+        type_id = strings.id( type )
+        if type_id is None :
+            return array.array( 'I' )
+        return array.array( 'I', compress( columns.path, imap( operator.eq, columns.type, repeat( type_id ) ) ) )
+
+    def path_counts( self, type ) :
+        """Return how many times each path (string ID) of the given message type appears.
+
+        :Example:
+
+        >>> counts = as_log.path_counts( 'opening_texture_file' )
+        >>> [ ( strings[ i ], n ) for i, n in counts.most_common( 3 ) ]
+        [('./_textures/coke_can_diff.exr', 12), ...]
+        """
+        return collections.Counter( self.path_ids( type ) )
+
+    def _path_get( self, msg_cat, type ) :
+        """Return an iterator over values of the specified category for the specified message type."""
+        return ( l.content( msg_cat )
+                    for l in self._lines_data
+                        if l.msg_type == type )
+
+    @property
+    def lines( self ) :
+        return self._lines_data
+
+    @property
+    def path( self ) :
+        """Return the log file path."""
+        return self._path
+
+    @property
+    def store( self ) :
+        """Return the `BlockStore` of the raw lines, None if lines keep their text."""
+        return self._store
+
+    def line_text( self, line_data ) :
+        """Return the raw text of the given parsed line, from the store if any."""
+        if line_data.line is not None or self._store is None :
+            return line_data.line
+        return self._store[ line_data.number ]
+
+    @property
+    def summary( self ) :
+        """Return the constant memory summary (`ASLogSummary`) of the parsed lines.
+
+        Built on first access if it wasn't filled while parsing, then kept up
+        to date by `update()`.
+        """
+        if self._summary is None :
+            self._summary = ASLogSummary()
+            for line_data in self._lines_data :
+                self._summary.add( line_data )
+        return self._summary
+
+    @property
+    def line_count( self ) :
+        """Return the number of lines read from the log, kept or not, parsable or not."""
+        return self._line_count
+
+    @property
+    def unparsable_count( self ) :
+        """Return the number of lines which couldn't be parsed."""
+        return self._unparsable_count
+
+    @property
+    def render_options( self ) :
+        """Return the render options (dict) found in the log."""
+        return self._options
+
+    @property
+    def ranges( self ) :
+        """Return the differents min/max values (dict) found in the log."""
+        return self._ranges
+
+    @property
+    def columns( self ) :
+        """Return the column arrays (`ASLogColumns`) of the parsed lines.
+
+        Built on first access and extended with lines parsed since.
+        """
+        if self._columns is None :
+            self._columns = ASLogColumns()
+
+        if len( self._columns ) < len( self._lines_data ) :
+            self._columns.extend( self._lines_data[ len( self._columns ): ] ,
+                                  self._ranges[ 'first_datetime' ]          )
+
+        return self._columns
+
+    @property
+    def templates( self ) :
+        """Return the message template miner (`ASLogTemplateMiner`) of the parsed lines.
+
+        Built on first access and fed with lines parsed since.
+        """
+        if self._templates is None :
+            self._templates = ASLogTemplateMiner()
+
+        template_ids = self._template_ids
+        if len( template_ids ) < len( self._lines_data ) :
+            add = self._templates.add
+            template_ids.extend( add( line_data.msg_rest )
+                                 for line_data in self._lines_data[ len( template_ids ): ] )
+
+        return self._templates
+
+    @property
+    def template_ids( self ) :
+        """Return the template ID (array) of each parsed line."""
+        self.templates
+        return self._template_ids
+
+    def template_runs( self, indices = None ) :
+        """Return ( template ID, first, last ) runs of consecutive lines sharing a template.
+
+        `indices` are the sorted line indices to walk (all lines if None),
+        `first` and `last` are positions in `indices` (both included).
+
+        :Example:
+
+        >>> for template_id, first, last in as_log.template_runs() :
+        ...     print last - first + 1, as_log.templates[ template_id ].text
+        ...
+        1 loading project file <*>
+        356 opening texture file <*> for reading...
+        """
+        if indices is None :
+            indices = xrange( len( self._lines_data ) )
+        return template_runs( self.template_ids, indices )
+
+    @property
+    def index( self ) :
+        """Return the sparse seek index (`ASLogIndex`) of the log file.
+
+        Loaded from (or saved to) its sidecar file on first access.
+        """
+        if self._index is None :
+            self._index = ASLogIndex.load_or_build( self._path )
+        return self._index
+
+    def lines_range( self, first, last ) :
+        """Return the parsed lines whose line number is in [first, last[.
+
+        If the log is not parsed, only this window is read and parsed using
+        the seek index.
+        """
+
+        if self._parsed :
+            numbers = self.columns.number
+            return self._lines_data[ bisect.bisect_left( numbers, first ) :
+                                     bisect.bisect_left( numbers, last  ) ]
+
+        index          = self.index
+        offset, number = index.seek_line( first )
+        lines_data     = list()
+
+        for number, line in index.read( offset, number ) :
+            if number >= last :
+                break
+            if number < first :
+                continue
+            try :
+                lines_data.append( self._line_class( line, number ) )
+            except ValueError :
+                continue
+
+        return lines_data
+
+    def between( self, start = None, end = None ) :
+        """Return the parsed lines whose timestamp is in [start, end].
+
+        `start` and `end` are `datetime` objects or raw log timestamps
+        ('2014-02-22T16:08:16.924473Z'), None for no bound. If the log is not
+        parsed, only this window is read and parsed using the seek index.
+        """
+
+        if isinstance( start, datetime.datetime ) :
+            start = start.strftime( datetime_str_format )
+        if isinstance( end, datetime.datetime ) :
+            end = end.strftime( datetime_str_format )
+
+        if self._parsed :
+            columns = self.columns
+            first   = self._ranges[ 'first_datetime' ]
+            if first is None :
+                return list()
+
+            low  = self._seconds( start, first ) if start is not None else float( '-inf' )
+            high = self._seconds( end  , first ) if end   is not None else float( 'inf'  )
+
+            if columns.time_sorted :
+                return self._lines_data[ bisect.bisect_left(  columns.time, low  ) :
+                                         bisect.bisect_right( columns.time, high ) ]
+            return [ self._lines_data[ i ] for i in self.query( BetweenQuery( 'time', low, high ) ) ]
+
+        index = self.index
+        if start is not None :
+            offset, number = index.seek_time( start )
+        else :
+            offset, number = 0, 0
+
+        lines_data = list()
+
+        for number, line in index.read( offset, number ) :
+            raw = raw_timestamp( line )
+            if raw is None or ( start is not None and raw < start ) :
+                continue
+            if end is not None and raw > end :
+                break
+            try :
+                lines_data.append( self._line_class( line, number ) )
+            except ValueError :
+                continue
+
+        return lines_data
+
+    @staticmethod
+    def _seconds( raw, first_datetime ) :
+        """Return seconds from `first_datetime` to the given raw timestamp."""
+        timestamp = datetime.datetime.strptime( raw, datetime_str_format )
+        return ( timestamp - first_datetime ).total_seconds()
+
+    def query( self, expression ) :
+        """Return the sorted indices (array) of lines matching the given query.
+
+        :Example:
+
+        >>> indices = as_log.query( 'msg_cat in (warning,error) and vm > 40' )
+        >>> [ as_log[ i ].msg_rest for i in indices ]
+
+        See `appleseed_log.query` for the expression syntax. `expression`
+        can also be an already compiled `ASLogQuery`.
+        """
+        if isinstance( expression, basestring ) :
+            expression = compile_query( expression )
+        return expression( self.columns )
+
+    @property
+    def stats( self ) :
+        """Return the parse instrumentation (`ASLogStats`), None if disabled."""
+        return self._stats
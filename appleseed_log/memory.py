@@ -0,0 +1,272 @@
+import argparse
+import json
+import multiprocessing
+import re
+
+from .log import ASLog, to_bytes, to_int
+
+# Scene memory footprint.
+#
+# appleseed logs the size of what it builds before rendering: acceleration
+# trees ("triangle tree #1778 statistics:" then "  size   6.0 MB"), an
+# intersection filter per alpha mapped object ("(masks: 41 bytes, uvs:
+# 2.3 KB)") and the size of its core data structures ("data structures
+# size:" block). Each render session gets its footprint, objects ranked by
+# filter memory and trees with the VM growth seen while building them, so
+# the assets to optimize stand out when render nodes run out of memory.
+#
+#   python -m appleseed_log.memory /renders/logs --pattern "*.log" --top 20 --json memory.json
+
+re_size            = '[\d.,]+ (?:bytes?|[KMGT]B)'
+re_tree_build      = re.compile( '\s*(?:collecting geometry for|building)(?: bvh)? (?P<tree>\w+) tree'
+                                 '(?: #(?P<tree_id>\d+))?(?: \((?P<triangles>[\d,]+) static triangles?)?' )
+re_tree_statistics = re.compile( '\s*(?P<tree>\w+) tree(?: #(?P<tree_id>\d+))? statistics:' )
+re_tree_size       = re.compile( '\s{3}size\s+(?P<size>%s)$' % re_size )
+re_data_structures = re.compile( '\s*data structures size:' )
+re_block_size      = re.compile( '\s{3}(?P<name>\S+)\s+(?P<size>%s)$' % re_size )
+re_block_line      = re.compile( '\s{3}\S' )
+
+def new_scene( log_path, project, vm ) :
+    return { 'log'             : log_path ,
+             'project'         : project  ,
+             'filters'         : list()   ,  # [ { 'object', 'materials', 'masks', 'uvs', 'bytes', 'vm' } ]
+             'trees'           : list()   ,  # [ { 'tree', 'tree_id', 'bytes', 'triangles', 'vm_before', 'vm_after' } ]
+             'data_structures' : dict()   ,  # type name -> bytes of one instance
+             'vm_start'        : vm       ,  # MB
+             'vm_peak'         : vm       ,
+             'accounted'       : 0        ,  # bytes of the trees and filters logged so far
+             'vm_events'       : list()   }  # [ ( accounted bytes, vm ) ] after each sized structure
+
+
+class ASLogMemory( object ) :
+    """Memory footprint of the render sessions of a log, fed line per line.
+
+    Give it to `ASLog.subscribe()` to build it in the same pass as the parse.
+
+    :Example:
+
+    >>> memory = ASLogMemory( 'frame.1001.log' )
+    >>> as_log = ASLog( 'frame.1001.log', parse = False, keep_lines = False, summary = False )
+    >>> as_log.subscribe( memory.add )
+    >>> as_log.update()
+    >>> memory.footprints()[ -1 ][ 'filters' ][ 0 ]
+    {'object': '_Home_set_01_glass1_Home_set_01_glassShape1.0', 'bytes': 2396, ...}
+    """
+
+    def __init__( self, log_path = None ) :
+        self.log_path = log_path
+        self.scenes   = list()
+        self._builds  = dict()  # ( tree, tree_id ) -> vm when its build started
+        self._block   = None    # ( thread id, 'tree' or 'data_structures', tree record ) while in a block
+
+    def add( self, line_data ) :
+        """Add the given parsed line (`ASLogLine`), lines must come in log order."""
+
+        msg_rest = line_data.msg_rest
+        vm       = line_data.vm
+
+        if line_data.msg_type == 'loading_project_file' or not self.scenes :
+            self.scenes.append( new_scene( self.log_path, line_data.content( 'project_file_path' ), vm ) )
+            self._builds.clear()
+        scene = self.scenes[ -1 ]
+        scene[ 'vm_peak' ] = max( scene[ 'vm_peak' ], vm )
+
+        # indented lines of a block, other threads may log in between
+        if self._block is not None and self._block[ 0 ] == line_data.thread_id :
+            if re_block_line.match( msg_rest ) :
+                self._block_line( scene, msg_rest )
+                return
+            self._block = None
+
+        if line_data.msg_type == 'intersection_filter' :
+            masks, uvs = line_data.content( 'masks' ), line_data.content( 'uvs' )
+            scene[ 'filters' ].append( { 'object'    : line_data.content( 'object'    ) ,
+                                         'materials' : line_data.content( 'materials' ) ,
+                                         'masks'     : masks                            ,
+                                         'uvs'       : uvs                              ,
+                                         'bytes'     : masks + uvs                      ,
+                                         'vm'        : vm                               } )
+            self._vm_event( scene, masks + uvs, vm )
+            return
+
+        if line_data.msg_type is not None :
+            return
+
+        match_grp = re_tree_statistics.match( msg_rest )
+        if match_grp :
+            key  = ( match_grp.group( 'tree' ), match_grp.group( 'tree_id' ) )
+            tree = { 'tree'      : key[ 0 ]                                     ,
+                     'tree_id'   : int( key[ 1 ] ) if key[ 1 ] else None        ,
+                     'bytes'     : None                                         ,
+                     'triangles' : self._builds.get( key, ( None, None ) )[ 1 ] ,
+                     'vm_before' : self._builds.get( key, ( vm, None ) )[ 0 ]   ,
+                     'vm_after'  : vm                                           }
+            scene[ 'trees' ].append( tree )
+            self._block = ( line_data.thread_id, 'tree', tree )
+            return
+
+        if re_data_structures.match( msg_rest ) :
+            self._block = ( line_data.thread_id, 'data_structures', None )
+            return
+
+        match_grp = re_tree_build.match( msg_rest )
+        if match_grp :
+            key       = ( match_grp.group( 'tree' ), match_grp.group( 'tree_id' ) )
+            triangles = match_grp.group( 'triangles' )
+            start_vm, known = self._builds.get( key, ( vm, None ) )
+            self._builds[ key ] = ( start_vm, to_int( triangles ) if triangles else known )
+
+    def _block_line( self, scene, msg_rest ) :
+
+        _, kind, tree = self._block
+        if kind == 'tree' :
+            match_grp = re_tree_size.match( msg_rest )
+            if match_grp :
+                tree[ 'bytes' ] = to_bytes( match_grp.group( 'size' ) )
+                self._vm_event( scene, tree[ 'bytes' ], tree[ 'vm_after' ] )
+        else :
+            match_grp = re_block_size.match( msg_rest )
+            if match_grp :
+                scene[ 'data_structures' ][ match_grp.group( 'name' ) ] = to_bytes( match_grp.group( 'size' ) )
+
+    def _vm_event( self, scene, size, vm ) :
+        scene[ 'accounted' ] += size
+        scene[ 'vm_events' ].append( ( scene[ 'accounted' ], vm ) )
+
+    def footprints( self ) :
+        """Return the footprint report (picklable dict) of each scene."""
+        return [ scene_footprint( scene ) for scene in self.scenes
+                     if scene[ 'filters' ] or scene[ 'trees' ] or scene[ 'data_structures' ] ]
+
+def correlation( pairs ) :
+    """Return the Pearson correlation of the given ( x, y ) pairs, None if undefined."""
+    n = len( pairs )
+    if n < 3 :
+        return None
+    mean_x = sum( x for x, _ in pairs ) / float( n )
+    mean_y = sum( y for _, y in pairs ) / float( n )
+    cov    = sum( ( x - mean_x ) * ( y - mean_y ) for x, y in pairs )
+    var_x  = sum( ( x - mean_x ) ** 2 for x, _ in pairs )
+    var_y  = sum( ( y - mean_y ) ** 2 for _, y in pairs )
+    if not var_x or not var_y :
+        return None
+    return cov / ( var_x * var_y ) ** 0.5
+
+def scene_footprint( scene ) :
+    """Return the footprint report of a scene: ranked filters, tree totals and their VM share."""
+
+    mb           = float( 1 << 20 )
+    filters      = sorted( scene[ 'filters' ], key = lambda f : -f[ 'bytes' ] )
+    trees        = scene[ 'trees' ]
+    tree_bytes   = sum( tree[ 'bytes' ] or 0 for tree in trees )
+    filter_bytes = sum( f[ 'bytes' ] for f in filters )
+    vm_growth    = scene[ 'vm_peak' ] - scene[ 'vm_start' ]
+
+    for tree in trees :
+        tree[ 'vm_delta' ] = tree[ 'vm_after' ] - tree[ 'vm_before' ]
+        tree[ 'bytes_per_triangle' ] = tree[ 'bytes' ] * 1.0 / tree[ 'triangles' ] \
+                                           if tree[ 'bytes' ] and tree[ 'triangles' ] else None
+
+    return { 'log'             : scene[ 'log'             ] ,
+             'project'         : scene[ 'project'         ] ,
+             'filters'         : filters                    ,
+             'trees'           : trees                      ,
+             'data_structures' : scene[ 'data_structures' ] ,
+             'filter_bytes'    : filter_bytes               ,
+             'tree_bytes'      : tree_bytes                 ,
+             'vm_start'        : scene[ 'vm_start'        ] ,
+             'vm_peak'         : scene[ 'vm_peak'         ] ,
+             # share of the VM growth explained by the logged structures
+             'vm_share'        : ( tree_bytes + filter_bytes ) / mb / vm_growth if vm_growth > 0 else None ,
+             # do the logged structures follow the VM curve
+             'vm_correlation'  : correlation( scene[ 'vm_events' ] ) }
+
+################################################################################
+# Logs
+################################################################################
+def log_footprints( path ) :
+    """Return the scene footprints of the log at the given path, in a single parse (for worker processes)."""
+    memory = ASLogMemory( path )
+    as_log = ASLog( path, parse = False, engine = 'split', keep_lines = False, summary = False )
+    as_log.subscribe( memory.add )
+    as_log.update()
+    return memory.footprints()
+
+def load_footprints( paths, processes = None ) :
+    """Return the scene footprints of the given logs, parsed in parallel."""
+    if len( paths ) < 2 or processes == 1 :
+        results = [ log_footprints( path ) for path in paths ]
+    else :
+        pool = multiprocessing.Pool( processes )
+        try :
+            results = pool.map( log_footprints, paths )
+        finally :
+            pool.close()
+            pool.join()
+    return [ footprint for footprints in results for footprint in footprints ]
+
+def rank_objects( footprints, top = None ) :
+    """Return objects ranked by their largest filter memory across scenes.
+
+    Each entry is { 'object', 'bytes' (largest), 'scenes' (count), 'logs' }.
+    """
+    objects = dict()
+    for footprint in footprints :
+        for f in footprint[ 'filters' ] :
+            entry = objects.setdefault( f[ 'object' ], { 'object' : f[ 'object' ], 'bytes' : 0,
+                                                         'scenes' : 0, 'logs' : set() } )
+            entry[ 'bytes'  ] = max( entry[ 'bytes' ], f[ 'bytes' ] )
+            entry[ 'scenes' ] += 1
+            entry[ 'logs'   ].add( footprint[ 'log' ] )
+
+    ranked = sorted( objects.values(), key = lambda entry : ( -entry[ 'bytes' ], entry[ 'object' ] ) )
+    for entry in ranked :
+        entry[ 'logs' ] = sorted( entry[ 'logs' ] )
+    return ranked[ :top ] if top else ranked
+
+def human_size( size ) :
+    """Return the given bytes as a short human string ('2.3 KB')."""
+    for unit in ( 'bytes', 'KB', 'MB', 'GB' ) :
+        if abs( size ) < 1024 or unit == 'GB' :
+            return ( '%d %s' if unit == 'bytes' else '%.1f %s' ) % ( size, unit )
+        size /= 1024.0
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Report the scene memory footprint of appleseed logs.' )
+    parser.add_argument( 'logs'        , nargs = '+', help = 'log files or directories'              )
+    parser.add_argument( '--pattern'   , default = '*.log'                                            )
+    parser.add_argument( '--processes' , default = None, type = int                                   )
+    parser.add_argument( '--top'       , default = 10  , type = int, help = 'objects listed per scene' )
+    parser.add_argument( '--json'      , default = None, help = 'write the report to this json file'  )
+    args = parser.parse_args()
+
+    from .database import log_paths
+    footprints = load_footprints( log_paths( args.logs, args.pattern ), args.processes )
+
+    for footprint in footprints :
+        print "%s (%s)" % ( footprint[ 'log' ], footprint[ 'project' ] )
+        print "    trees %s, intersection filters %s, VM %d -> %d MB, explains %s of the VM growth (correlation %s)" % (
+            human_size( footprint[ 'tree_bytes' ] ), human_size( footprint[ 'filter_bytes' ] ),
+            footprint[ 'vm_start' ], footprint[ 'vm_peak' ],
+            '%.0f%%' % ( footprint[ 'vm_share' ] * 100 ) if footprint[ 'vm_share' ] is not None else 'n/a',
+            '%.2f' % footprint[ 'vm_correlation' ] if footprint[ 'vm_correlation' ] is not None else 'n/a' )
+        for tree in footprint[ 'trees' ] :
+            print "    %s tree%s : %s, VM +%d MB%s" % (
+                tree[ 'tree' ], ' #%d' % tree[ 'tree_id' ] if tree[ 'tree_id' ] is not None else '',
+                human_size( tree[ 'bytes' ] or 0 ), tree[ 'vm_delta' ],
+                ', %.0f bytes per triangle' % tree[ 'bytes_per_triangle' ] if tree[ 'bytes_per_triangle' ] else '' )
+        for f in footprint[ 'filters' ][ :args.top ] :
+            print "    %10s  %s" % ( human_size( f[ 'bytes' ] ), f[ 'object' ] )
+
+    print "largest intersection filters :"
+    for entry in rank_objects( footprints, args.top ) :
+        print "    %10s  %s (%d scenes)" % ( human_size( entry[ 'bytes' ] ), entry[ 'object' ], entry[ 'scenes' ] )
+
+    if args.json :
+        with open( args.json, 'w' ) as json_file :
+            json.dump( { 'scenes'  : footprints, 'objects' : rank_objects( footprints ) } ,
+                       json_file, indent = 4, sort_keys = True )
+
+if __name__ == '__main__' :
+    main()
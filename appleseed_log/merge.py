@@ -0,0 +1,215 @@
+import argparse
+import datetime
+import heapq
+import os
+
+from .log import ASLog, datetime_str_format, read_lines
+from .timeline import export_trace, log_time_range
+
+# Time ordered merge of the logs of several render nodes.
+#
+# Distributed and region renders leave one log per node. Their lines are
+# merged through a heap holding the next line of each source, so only k
+# lines are in memory whatever the log sizes: log files are streamed, not
+# parsed in full (an `ASLog` source already holds all its lines). Each
+# merged line is tagged with its source and its time is corrected by the
+# clock offset of its node.
+#
+#   python -m appleseed_log.merge node_*.log --offset node_2.log=-1.25 --output merged.log
+#   python -m appleseed_log.merge node_*.log --align-starts --trace merged.trace.json
+
+# merged thread IDs are source index * thread_stride + thread ID with `separate_threads`
+thread_stride = 1000
+
+
+class ASLogMergedLine( object ) :
+    """A parsed line of a merged source, other attributes are the line's ones.
+
+    `timestamp` is corrected by the source clock offset, `line` holds the
+    raw text with that corrected timestamp, read from the store of an
+    `ASLog` source built with one.
+    """
+
+    __slots__ = ( 'line_data', 'source', 'source_index', 'source_log', 'timestamp', 'thread_id', '_offset' )
+
+    def __init__( self, line_data, source, source_index, source_log, timestamp, thread_id, offset ) :
+        self.line_data    = line_data
+        self.source       = source
+        self.source_index = source_index
+        self.source_log   = source_log  # `ASLog` source, None for other sources
+        self.timestamp    = timestamp
+        self.thread_id    = thread_id
+        self._offset      = offset
+
+    def __getattr__( self, name ) :
+        return getattr( self.line_data, name )
+
+    @property
+    def line( self ) :
+        if self.source_log is not None :
+            line = self.source_log.line_text( self.line_data )
+        else :
+            line = self.line_data.line
+        if not self._offset or line is None :
+            return line
+        return self.timestamp.strftime( datetime_str_format ) + line[ len( self.line_data._raw_timestamp ): ]
+
+    def __repr__( self ) :
+        return '<ASLogMergedLine {0.source} {0.number} {0.timestamp}>'.format( self )
+
+def source_lines( source, engine = 'split' ) :
+    """Return the parsed lines of a source: a log path (streamed), an `ASLog` or an iterable of lines."""
+    if isinstance( source, basestring ) :
+        return read_lines( source, engine )
+    if isinstance( source, ASLog ) :
+        return iter( source.lines )
+    return iter( source )
+
+def source_name( source, index ) :
+    if isinstance( source, basestring ) :
+        return os.path.basename( source )
+    if isinstance( source, ASLog ) and isinstance( source.path, basestring ) :
+        return os.path.basename( source.path )
+    return 'source %d' % index
+
+def start_offsets( paths ) :
+    """Return the clock offsets (dict of path -> seconds) aligning the first line of each log on the earliest one.
+
+    For renders started at the same time on every node, only the head of
+    each log is read.
+    """
+    starts = dict( ( path, log_time_range( path ) ) for path in paths )
+    starts = dict( ( path, time_range[ 0 ] ) for path, time_range in starts.iteritems() if time_range )
+    if not starts :
+        return dict()
+    earliest = min( starts.itervalues() )
+    return dict( ( path, ( earliest - start ).total_seconds() ) for path, start in starts.iteritems() )
+
+
+class ASLogMerge( object ) :
+    """Time ordered k-way merge of parsed log sources.
+
+    Sources are log paths, `ASLog` instances or iterables of parsed lines,
+    each in its own time order. Log paths are streamed, an `ASLog` source
+    holds all its lines in memory (their text maybe in its store), so only
+    paths keep the merge memory to k lines. `offsets` (dict of source or
+    name -> seconds) is added to the times of a source, equal times keep
+    the source order. Give `separate_threads = True` so threads of
+    different sources get different IDs (source index * 1000 + thread ID).
+
+    :Example:
+
+    >>> merge = ASLogMerge( [ 'node_1.log', 'node_2.log' ], offsets = { 'node_2.log' : -1.25 } )
+    >>> for line_data in merge :
+    ...     print line_data.source, line_data.timestamp, line_data.msg_rest
+    node_1.log 2014-02-22 15:44:52.991536  loading project file ...
+    >>> export_trace( ASLogMerge( paths, separate_threads = True ), 'merged.trace.json' )
+    """
+
+    def __init__( self, sources, names = None, offsets = None, engine = 'split', separate_threads = False ) :
+
+        self.sources          = list( sources )
+        self.names            = list( names ) if names else [ source_name( source, i )
+                                                              for i, source in enumerate( self.sources ) ]
+        self.engine           = engine
+        self.separate_threads = separate_threads
+        self.offsets          = list()
+
+        offsets = offsets or dict()
+        for source, name in zip( self.sources, self.names ) :
+            key    = source if isinstance( source, basestring ) and source in offsets else name
+            offset = offsets.get( key, 0.0 )
+            if not isinstance( offset, datetime.timedelta ) :
+                offset = datetime.timedelta( seconds = offset )
+            self.offsets.append( offset )
+
+    def _merged( self, index, line_data ) :
+        offset    = self.offsets[ index ]
+        thread_id = line_data.thread_id
+        if self.separate_threads :
+            thread_id += index * thread_stride
+        source     = self.sources[ index ]
+        source_log = source if isinstance( source, ASLog ) else None
+        return ASLogMergedLine( line_data, self.names[ index ], index, source_log ,
+                                line_data.timestamp + offset, thread_id, offset )
+
+    def __iter__( self ) :
+        """Yield the `ASLogMergedLine` of every source in time order."""
+
+        # [ corrected time, source index, merged line, source iterator ], one per source
+        heap = list()
+        for index, source in enumerate( self.sources ) :
+            lines = source_lines( source, self.engine )
+            for line_data in lines :
+                merged = self._merged( index, line_data )
+                heap.append( [ merged.timestamp, index, merged, lines ] )
+                break
+        heapq.heapify( heap )
+
+        while heap :
+            entry = heap[ 0 ]
+            _, index, merged, lines = entry
+            yield merged
+            for line_data in lines :
+                merged     = self._merged( index, line_data )
+                entry[ 0 ] = merged.timestamp
+                entry[ 2 ] = merged
+                heapq.heapreplace( heap, entry )
+                break
+            else :
+                heapq.heappop( heap )
+
+def write_merged( lines, path, tag = False ) :
+    """Write the raw text of the given merged lines at `path`, `tag` prefixes messages with their source.
+
+    Raise a ValueError for a line without raw text (a parsed line of an
+    iterable source whose text went to a store).
+    """
+    with open( path, 'wb' ) as log_file :
+        for merged in lines :
+            line = merged.line
+            if line is None :
+                raise ValueError( "Line %d of %s has no raw text to write" % ( merged.number, merged.source ) )
+            if tag :
+                header, pipe, msg_rest = line.partition( '|' )
+                line = '%s%s [%s]%s' % ( header, pipe, merged.source, msg_rest )
+            log_file.write( line if line.endswith( '\n' ) else line + '\n' )
+
+def parse_offsets( values ) :
+    """Return the offsets (dict) of '<log or name>=<seconds>' strings."""
+    offsets = dict()
+    for value in values :
+        name, _, seconds = value.rpartition( '=' )
+        offsets[ name ] = float( seconds )
+    return offsets
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Merge appleseed logs of several nodes in time order.' )
+    parser.add_argument( 'logs'          , nargs = '+'                                                       )
+    parser.add_argument( '--offset'      , action = 'append', default = list(),
+                         help = 'clock offset of a log, <log>=<seconds>, added to its times'                )
+    parser.add_argument( '--align-starts', action = 'store_true', help = 'align the first line of each log' )
+    parser.add_argument( '--output'      , default = None, help = 'write the merged log to this file'       )
+    parser.add_argument( '--tag'         , action = 'store_true', help = 'prefix messages with their log'   )
+    parser.add_argument( '--trace'       , default = None, help = 'write a Chrome trace of the merged logs' )
+    args = parser.parse_args()
+
+    offsets = start_offsets( args.logs ) if args.align_starts else dict()
+    offsets.update( parse_offsets( args.offset ) )
+
+    if args.output :
+        write_merged( ASLogMerge( args.logs, offsets = offsets ), args.output, args.tag )
+        print "Merged %d logs to : %s" % ( len( args.logs ), args.output )
+
+    if args.trace :
+        export_trace( ASLogMerge( args.logs, offsets = offsets, separate_threads = True ), args.trace )
+        print "Exported to Chrome trace file : %s" % args.trace
+
+    if not args.output and not args.trace :
+        for merged in ASLogMerge( args.logs, offsets = offsets ) :
+            print "%s %-16s %s" % ( merged.timestamp.strftime( datetime_str_format ), merged.source,
+                                    merged.msg_rest.rstrip() )
+
+if __name__ == '__main__' :
+    main()
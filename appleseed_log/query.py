@@ -0,0 +1,462 @@
+import array
+import bisect
+import operator
+import re
+from itertools import chain, compress, imap, islice, repeat
+
+# Query expressions filter parsed log lines, they are compiled to predicates
+# running over `ASLogColumns` arrays and returning sorted index arrays.
+#
+#   msg_cat in (warning,error) and vm > 40 and thread_id == 3
+#   type == rendering_progress and time between 10s..60s
+#   not (msg contains "texture" or line < 100)
+#
+# Fields:
+#   time      : seconds since the first line (accept ms, s, m and h suffixes)
+#   vm        : virtual memory in MB
+#   thread_id : thread number
+#   line      : line number in the file
+#   msg_cat   : debug/info/warning/error/fatal
+#   type      : message type (rendering_progress, loaded_mesh_file, none...)
+#   path      : texture, mesh, project or image path ("./_textures/a.exr")
+#   msg       : the message (everything after the pipe)
+#
+# Operators: == != < <= > >= in (a,b,...) between a..b contains ~ (regex)
+
+################################################################################
+# Errors
+################################################################################
+class QuerySyntaxError( ValueError ) :
+    """Raised when a query expression can't be compiled."""
+    pass
+
+################################################################################
+# Index arrays helpers
+################################################################################
+def index_array( indices = () ) :
+    return array.array( 'l', indices )
+
+def intersect( a, b ) :
+    """Return the sorted intersection of two sorted index arrays."""
+    # hash the smallest one, filter the biggest one
+    if len( a ) < len( b ) :
+        a, b = b, a
+    b_set = set( b )
+    return index_array( compress( a, imap( b_set.__contains__, a ) ) )
+
+def union( a, b ) :
+    """Return the sorted union of two sorted index arrays."""
+    if not a :
+        return index_array( b )
+    if not b :
+        return index_array( a )
+
+    # sorting two sorted runs is linear, then drop duplicates
+    merged = index_array( sorted( chain( a, b ) ) )
+    unique = chain( imap( operator.ne, merged, islice( merged, 1, None ) ), ( True, ) )
+    return index_array( compress( merged, unique ) )
+
+def difference( a, b ) :
+    """Return the sorted indices of `a` which are not in `b`."""
+    b_set = set( b )
+    return index_array( i for i in a if i not in b_set )
+
+################################################################################
+# Predicates
+################################################################################
+numeric_fields = { 'time'      : 'time'      ,
+                   'vm'        : 'vm'        ,
+                   'thread_id' : 'thread_id' ,
+                   'line'      : 'number'    }
+coded_fields   = ( 'msg_cat', 'type', 'path' )
+text_fields    = ( 'msg', )
+
+operators = { '==' : operator.eq ,
+              '!=' : operator.ne ,
+              '<'  : operator.lt ,
+              '<=' : operator.le ,
+              '>'  : operator.gt ,
+              '>=' : operator.ge }
+
+
+class ASLogQuery( object ) :
+    """A compiled query, call it with `ASLogColumns` to get matching indices.
+
+    Queries compose with `&`, `|` and `~`.
+    """
+
+    def __call__( self, columns, candidates = None ) :
+        """Return sorted indices (array) of matching lines.
+
+        If `candidates` (sorted index array) is given, only those are tested.
+        """
+        raise NotImplementedError
+
+    def __and__( self, other ) :
+        return AndQuery( self, other )
+
+    def __or__( self, other ) :
+        return OrQuery( self, other )
+
+    def __invert__( self ) :
+        return NotQuery( self )
+
+
+class AndQuery( ASLogQuery ) :
+
+    def __init__( self, left, right ) :
+        self.left  = left
+        self.right = right
+
+    def __call__( self, columns, candidates = None ) :
+        # the right side only tests what the left side kept
+        return self.right( columns, self.left( columns, candidates ) )
+
+    def __repr__( self ) :
+        return '(%r and %r)' % ( self.left, self.right )
+
+
+class OrQuery( ASLogQuery ) :
+
+    def __init__( self, left, right ) :
+        self.left  = left
+        self.right = right
+
+    def __call__( self, columns, candidates = None ) :
+        return union( self.left(  columns, candidates ) ,
+                      self.right( columns, candidates ) )
+
+    def __repr__( self ) :
+        return '(%r or %r)' % ( self.left, self.right )
+
+
+class NotQuery( ASLogQuery ) :
+
+    def __init__( self, query ) :
+        self.query = query
+
+    def __call__( self, columns, candidates = None ) :
+        if candidates is None :
+            candidates = index_array( xrange( len( columns ) ) )
+        return difference( candidates, self.query( columns, candidates ) )
+
+    def __repr__( self ) :
+        return '(not %r)' % self.query
+
+
+class CompareQuery( ASLogQuery ) :
+    """Compare a numeric column to a value."""
+
+    def __init__( self, field, op, value ) :
+        self.field = field
+        self.op    = op
+        self.value = value
+
+    def __call__( self, columns, candidates = None ) :
+
+        column = getattr( columns, numeric_fields[ self.field ] )
+        test   = operators[ self.op ]
+
+        # time is usually sorted, so ranges come from a bisect
+        if self.field == 'time' and columns.time_sorted and self.op != '!=' and candidates is None :
+            if self.op == '==' :
+                return BetweenQuery( 'time', self.value, self.value )( columns, candidates )
+            if self.op in ( '<', '<=' ) :
+                bisect_fn = bisect.bisect_left if self.op == '<' else bisect.bisect_right
+                indices   = index_array( xrange( 0, bisect_fn( column, self.value ) ) )
+            else :
+                bisect_fn = bisect.bisect_right if self.op == '>' else bisect.bisect_left
+                indices   = index_array( xrange( bisect_fn( column, self.value ), len( column ) ) )
+            return indices
+
+        if candidates is None :
+            return index_array( compress( xrange( len( column ) ) ,
+                                          imap( test, column, repeat( self.value ) ) ) )
+
+        return index_array( compress( candidates ,
+                                      imap( test, imap( column.__getitem__, candidates ), repeat( self.value ) ) ) )
+
+    def __repr__( self ) :
+        return '(%s %s %r)' % ( self.field, self.op, self.value )
+
+
+class BetweenQuery( ASLogQuery ) :
+    """Test a numeric column is in [low, high]."""
+
+    def __init__( self, field, low, high ) :
+        self.field = field
+        self.low   = low
+        self.high  = high
+
+    def __call__( self, columns, candidates = None ) :
+
+        column = getattr( columns, numeric_fields[ self.field ] )
+
+        if self.field == 'time' and columns.time_sorted and candidates is None :
+            return index_array( xrange( bisect.bisect_left(  column, self.low  ) ,
+                                        bisect.bisect_right( column, self.high ) ) )
+
+        if candidates is None :
+            candidates = xrange( len( column ) )
+            values     = column
+        else :
+            values     = imap( column.__getitem__, candidates )
+
+        low, high = self.low, self.high
+        in_range  = imap( lambda v : low <= v <= high, values )
+        return index_array( compress( candidates, in_range ) )
+
+    def __repr__( self ) :
+        return '(%s between %r..%r)' % ( self.field, self.low, self.high )
+
+
+class InQuery( ASLogQuery ) :
+    """Test a `msg_cat`/`type`/`path` column against one or several values."""
+
+    def __init__( self, field, values, negate = False ) :
+        self.field  = field
+        self.values = values
+        self.negate = negate
+
+    def __call__( self, columns, candidates = None ) :
+
+        codes    = [ columns.code( self.field, v ) for v in self.values ]
+        code_set = set( c for c in codes if c is not None )  # unknown values never match
+        column   = getattr( columns, self.field )
+
+        if self.negate :
+            if candidates is None :
+                candidates = xrange( len( column ) )
+            values = imap( column.__getitem__, candidates )
+            return index_array( compress( candidates ,
+                                          imap( operator.not_, imap( code_set.__contains__, values ) ) ) )
+
+        if candidates is None :
+            return index_array( compress( xrange( len( column ) ), imap( code_set.__contains__, column ) ) )
+
+        values = imap( column.__getitem__, candidates )
+        return index_array( compress( candidates, imap( code_set.__contains__, values ) ) )
+
+    def __repr__( self ) :
+        return '(%s %sin %r)' % ( self.field, 'not ' if self.negate else '', self.values )
+
+
+class TextQuery( ASLogQuery ) :
+    """Test the message text contains a string or matches a regex."""
+
+    def __init__( self, text, regex = False ) :
+        self.text    = text
+        self.regex   = regex
+        self._search = re.compile( text ).search if regex else None # raise re.error early
+
+    def __call__( self, columns, candidates = None ) :
+
+        msg_rest = columns.msg_rest
+
+        if self.regex :
+            test = self._search
+        else :
+            text = self.text
+            test = lambda msg : text in msg
+
+        if candidates is None :
+            return index_array( compress( xrange( len( msg_rest ) ), imap( test, msg_rest ) ) )
+
+        return index_array( compress( candidates, imap( test, imap( msg_rest.__getitem__, candidates ) ) ) )
+
+    def __repr__( self ) :
+        return '(msg %s %r)' % ( '~' if self.regex else 'contains', self.text )
+
+################################################################################
+# Tokenizer
+################################################################################
+re_token = re.compile( r'\s*(?:'
+                       r'(?P<op>==|!=|<=|>=|<|>|~|\.\.|\(|\)|,)|'
+                       r'(?P<string>"[^"]*"|\'[^\']*\')|'
+                       r'(?P<word>(?:[^\s(),=!<>~"\'.]|\.(?!\.))+)'
+                       r')' )
+
+re_duration = re.compile( r'^(?P<number>-?[\d.]+)(?P<unit>ms|s|m|h)?$' )
+
+duration_units = { None : 1.0, 'ms' : 0.001, 's' : 1.0, 'm' : 60.0, 'h' : 3600.0 }
+
+keywords = ( 'and', 'or', 'not', 'in', 'between', 'contains' )
+
+
+def tokenize( expression ) :
+    """Return a list of ( kind, text ) tokens."""
+
+    tokens = list()
+    pos    = 0
+    end    = len( expression.rstrip() )
+
+    while pos < end :
+        match_grp = re_token.match( expression, pos )
+        if not match_grp or match_grp.end() == pos :
+            raise QuerySyntaxError( "Unexpected character at {0} : {1}".format( pos, expression[ pos: ] ) )
+        pos = match_grp.end()
+
+        if match_grp.group( 'op' ) :
+            tokens.append( ( 'op', match_grp.group( 'op' ) ) )
+        elif match_grp.group( 'string' ) :
+            tokens.append( ( 'string', match_grp.group( 'string' )[1:-1] ) )
+        else :
+            word = match_grp.group( 'word' )
+            kind = 'keyword' if word.lower() in keywords else 'word'
+            tokens.append( ( kind, word.lower() if kind == 'keyword' else word ) )
+
+    return tokens
+
+################################################################################
+# Parser
+################################################################################
+class QueryParser( object ) :
+    """Recursive descent parser turning tokens into `ASLogQuery` objects.
+
+    expr       := and_expr ( 'or' and_expr )*
+    and_expr   := not_expr ( 'and' not_expr )*
+    not_expr   := 'not' not_expr | '(' expr ')' | comparison
+    comparison := field op value | field 'in' '(' values ')'
+                | field 'between' value '..' value
+                | 'msg' 'contains' value | 'msg' '~' value
+    """
+
+    def __init__( self, expression ) :
+        self.expression = expression
+        self.tokens     = tokenize( expression )
+        self.pos        = 0
+
+    def peek( self ) :
+        if self.pos < len( self.tokens ) :
+            return self.tokens[ self.pos ]
+        return ( None, None )
+
+    def next( self ) :
+        token     = self.peek()
+        self.pos += 1
+        return token
+
+    def expect( self, kind, text = None ) :
+        token = self.next()
+        if token[0] != kind or ( text is not None and token[1] != text ) :
+            raise QuerySyntaxError( "Expected {0} but got {1} in : {2}".format( text or kind     ,
+                                                                                token[1]         ,
+                                                                                self.expression ) )
+        return token[1]
+
+    def parse( self ) :
+        query = self.parse_or()
+        if self.pos != len( self.tokens ) :
+            raise QuerySyntaxError( "Unexpected {0} in : {1}".format( self.peek()[1], self.expression ) )
+        return query
+
+    def parse_or( self ) :
+        query = self.parse_and()
+        while self.peek() == ( 'keyword', 'or' ) :
+            self.next()
+            query = OrQuery( query, self.parse_and() )
+        return query
+
+    def parse_and( self ) :
+        query = self.parse_not()
+        while self.peek() == ( 'keyword', 'and' ) :
+            self.next()
+            query = AndQuery( query, self.parse_not() )
+        return query
+
+    def parse_not( self ) :
+        token = self.peek()
+        if token == ( 'keyword', 'not' ) :
+            self.next()
+            return NotQuery( self.parse_not() )
+        if token == ( 'op', '(' ) :
+            self.next()
+            query = self.parse_or()
+            self.expect( 'op', ')' )
+            return query
+        return self.parse_comparison()
+
+    def parse_value( self ) :
+        kind, text = self.next()
+        if kind not in ( 'word', 'string' ) :
+            raise QuerySyntaxError( "Expected a value but got {0} in : {1}".format( text, self.expression ) )
+        return text
+
+    def parse_comparison( self ) :
+
+        field = self.expect( 'word' )
+        kind, op = self.next()
+
+        if field in text_fields :
+            if ( kind, op ) == ( 'keyword', 'contains' ) :
+                return TextQuery( self.parse_value() )
+            if ( kind, op ) == ( 'op', '~' ) :
+                pattern = self.parse_value()
+                try :
+                    return TextQuery( pattern, regex = True )
+                except re.error as e :
+                    raise QuerySyntaxError( "Invalid regex {0!r} at {1} ({2}) in : {3}".format(
+                                            pattern, self.expression.find( pattern ), e, self.expression ) )
+            raise QuerySyntaxError( "Field msg only accept contains and ~ in : {0}".format( self.expression ) )
+
+        if field in coded_fields :
+            if ( kind, op ) == ( 'keyword', 'in' ) :
+                return InQuery( field, self.parse_value_list( field ) )
+            if ( kind, op ) in ( ( 'op', '==' ), ( 'op', '!=' ) ) :
+                return InQuery( field, [ self.convert( field, self.parse_value() ) ], negate = op == '!=' )
+            raise QuerySyntaxError( "Field {0} only accept ==, != and in : {1}".format( field, self.expression ) )
+
+        if field in numeric_fields :
+            if ( kind, op ) == ( 'keyword', 'between' ) :
+                low = self.convert( field, self.parse_value() )
+                self.expect( 'op', '..' )
+                high = self.convert( field, self.parse_value() )
+                return BetweenQuery( field, low, high )
+            if ( kind, op ) == ( 'keyword', 'in' ) :
+                values = self.parse_value_list( field )
+                query  = CompareQuery( field, '==', values[0] )
+                for value in values[1:] :
+                    query = OrQuery( query, CompareQuery( field, '==', value ) )
+                return query
+            if kind == 'op' and op in operators :
+                return CompareQuery( field, op, self.convert( field, self.parse_value() ) )
+            raise QuerySyntaxError( "Unknown operator {0} in : {1}".format( op, self.expression ) )
+
+        raise QuerySyntaxError( "Unknown field {0} in : {1}".format( field, self.expression ) )
+
+    def parse_value_list( self, field ) :
+        self.expect( 'op', '(' )
+        values = [ self.convert( field, self.parse_value() ) ]
+        while self.peek() == ( 'op', ',' ) :
+            self.next()
+            values.append( self.convert( field, self.parse_value() ) )
+        self.expect( 'op', ')' )
+        return values
+
+    def convert( self, field, text ) :
+        """Convert the given value text to the type of the given field."""
+
+        if field == 'time' :
+            match_grp = re_duration.match( text )
+            if not match_grp :
+                raise QuerySyntaxError( "Invalid duration {0} in : {1}".format( text, self.expression ) )
+            return float( match_grp.group( 'number' ) ) * duration_units[ match_grp.group( 'unit' ) ]
+
+        if field in numeric_fields :
+            try :
+                return int( text.replace( ',', '' ) )
+            except ValueError :
+                raise QuerySyntaxError( "Invalid number {0} in : {1}".format( text, self.expression ) )
+
+        if field == 'type' and text.lower() == 'none' :
+            return None
+
+        return text
+
+
+def compile_query( expression ) :
+    """Compile the given query expression to an `ASLogQuery`.
+
+    Raise a `QuerySyntaxError` if the expression is not valid.
+    """
+    return QueryParser( expression ).parse()
@@ -0,0 +1,179 @@
+import datetime
+import re
+
+# Frozen reference line parser.
+#
+# A copy of the regex `ASLogLine` parser, kept apart so optimized engines
+# (and later changes of `appleseed_log.log`) are checked against what the
+# log parser always returned, see `appleseed_log.conformance`. Don't edit
+# it to make an engine pass: a new message type is added here on purpose,
+# once its parse is agreed on.
+
+re_main = re.compile( '(?P<timestamp>[0-9TZ:.-]+)\s+'
+                      '\<(?P<thread_id>\d{3})\>\s+'
+                      '(?P<vm>\d+)\s+MB\s+'
+                      '(?P<msg_cat>\w+)\s+'
+                      '\|(?P<msg_rest>.*)\n?' )
+
+re_opening_texture_file = re.compile( '\s*opening texture file (?P<texture_path>[\w./\\\\-]+) for reading\.\.\.' )
+re_rendering_progress   = re.compile( '\s*rendering\, (?P<percentage>[\d.]+)\% done' )
+re_wrote_image_file     = re.compile( '\s*wrote image file (?P<image_path>[\w./\\\\-]+) in (?P<milliseconds>[\d,]+) ms\.' )
+
+re_project_file_path    = re.compile( '\s*loading project file (?P<project_file_path>[\w./\\\\-]+)\.\.\.' )
+re_loaded_mesh_file     = re.compile( '\s*loaded mesh file (?P<mesh_path>[\w./\\\\-]+) '
+                                      '\((?P<objects>[\d,]+) object, '
+                                      '(?P<vertices>[\d,]+) vertices, '
+                                      '(?P<triangles>[\d,]+) triangles\) '
+                                      'in (?P<milliseconds>[\d,]+) ms\.' )
+
+re_scene_bounding_box   = re.compile(
+            '\s*scene bounding box\: '
+            '\((?P<pt1_x>[0-9.-]+)\, (?P<pt1_y>[0-9.-]+)\, (?P<pt1_z>[0-9.-]+)\)\-'
+            '\((?P<pt2_x>[0-9.-]+)\, (?P<pt2_y>[0-9.-]+)\, (?P<pt2_z>[0-9.-]+)\)\.' )
+
+re_scene_diameter       = re.compile( '\s*scene diameter\: (?P<diameter>[0-9.-]+)\.' )
+
+re_while_loading_mesh_object = re.compile( '\s*while loading mesh object \"(?P<object>[\w.]+)\"\:(?P<problem>.+)' )
+
+re_tile_borders_wasted  = re.compile( '\s*rendering effort wasted by tile borders\: (?P<percentage>[\d.]+)\% '
+                                      '\(tile dimensions\: (?P<tile_x>[\d,]+) x (?P<tile_y>[\d,]+), '
+                                      'tile margins\: (?P<margin_x>[\d,]+) x (?P<margin_y>[\d,]+)\)' )
+re_rendering_threads    = re.compile( '\s*using (?P<threads>[\d,]+) threads? for rendering\.' )
+re_rendering_finished   = re.compile( '\s*rendering finished in '
+                                      '(?:(?P<hours>\d+) hours? )?(?:(?P<minutes>\d+) minutes? )?'
+                                      '(?P<seconds>[\d.]+) seconds?\.' )
+re_intersection_filter  = re.compile( '\s*created intersection filter for object "(?P<object>[^"]+)" '
+                                      'with (?P<materials>[\d,]+) materials? '
+                                      '\(masks: (?P<masks>[\d.,]+ (?:bytes?|[KMGT]B)), '
+                                      'uvs: (?P<uvs>[\d.,]+ (?:bytes?|[KMGT]B))\)\.' )
+
+re_opt_frame_settings_trigger        = re.compile( '\s*frame settings\:' )
+re_opt_path_tracing_settings_trigger = re.compile( '\s*path tracing settings\:' )
+
+datetime_str_format = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+size_units = { 'byte' : 1, 'bytes' : 1, 'KB' : 1 << 10, 'MB' : 1 << 20, 'GB' : 1 << 30, 'TB' : 1 << 40 }
+
+def to_int( raw ) :
+    return int( raw.replace( ',', '' ) )
+
+def to_bytes( raw ) :
+    value, unit = raw.split()
+    return int( round( float( value.replace( ',', '' ) ) * size_units[ unit ] ) )
+
+def parse_loading_project_file( match_grp, msg_content ) :
+    msg_content[ 'project_file_path' ] = match_grp.group( 'project_file_path' )
+
+def parse_opening_texture_file( match_grp, msg_content ) :
+    msg_content[ 'texture_path' ] = match_grp.group( 'texture_path' )
+
+def parse_rendering_progress( match_grp, msg_content ) :
+    msg_content[ 'percentage' ] = float( match_grp.group( 'percentage' ) )
+
+def parse_wrote_image_file( match_grp, msg_content ) :
+    msg_content[ 'image_path'   ] = match_grp.group( 'image_path' )
+    msg_content[ 'milliseconds' ] = to_int( match_grp.group( 'milliseconds' ) )
+
+def parse_loaded_mesh_file( match_grp, msg_content ) :
+    msg_content[ 'mesh_path'    ] = match_grp.group( 'mesh_path' )
+    msg_content[ 'objects'      ] = to_int( match_grp.group( 'objects'      ) )
+    msg_content[ 'vertices'     ] = to_int( match_grp.group( 'vertices'     ) )
+    msg_content[ 'triangles'    ] = to_int( match_grp.group( 'triangles'    ) )
+    msg_content[ 'milliseconds' ] = to_int( match_grp.group( 'milliseconds' ) )
+
+def parse_scene_bounding_box( match_grp, msg_content ) :
+    msg_content[ 'bounding_box' ] = ( ( float( match_grp.group( 'pt1_x' ) ) ,
+                                        float( match_grp.group( 'pt1_y' ) ) ,
+                                        float( match_grp.group( 'pt1_z' ) ) ) ,
+                                      ( float( match_grp.group( 'pt2_x' ) ) ,
+                                        float( match_grp.group( 'pt2_y' ) ) ,
+                                        float( match_grp.group( 'pt2_z' ) ) ) )
+
+def parse_scene_diameter( match_grp, msg_content ) :
+    msg_content[ 'diameter' ] = match_grp.group( 'diameter' )
+
+def parse_while_loading_mesh_object( match_grp, msg_content ) :
+    msg_content[ 'object'  ] = match_grp.group( 'object'  )
+    msg_content[ 'problem' ] = match_grp.group( 'problem' )
+
+def parse_tile_borders_wasted( match_grp, msg_content ) :
+    msg_content[ 'percentage'   ] = float( match_grp.group( 'percentage' ) )
+    msg_content[ 'tile_size'    ] = ( to_int( match_grp.group( 'tile_x'   ) ) ,
+                                      to_int( match_grp.group( 'tile_y'   ) ) )
+    msg_content[ 'tile_margins' ] = ( to_int( match_grp.group( 'margin_x' ) ) ,
+                                      to_int( match_grp.group( 'margin_y' ) ) )
+
+def parse_rendering_threads( match_grp, msg_content ) :
+    msg_content[ 'threads' ] = to_int( match_grp.group( 'threads' ) )
+
+def parse_rendering_finished( match_grp, msg_content ) :
+    msg_content[ 'seconds' ] = int( match_grp.group( 'hours'   ) or 0 ) * 3600 + \
+                               int( match_grp.group( 'minutes' ) or 0 ) * 60   + \
+                               float( match_grp.group( 'seconds' ) )
+
+def parse_intersection_filter( match_grp, msg_content ) :
+    msg_content[ 'object'    ] = match_grp.group( 'object' )
+    msg_content[ 'materials' ] = to_int(   match_grp.group( 'materials' ) )
+    msg_content[ 'masks'     ] = to_bytes( match_grp.group( 'masks'     ) )
+    msg_content[ 'uvs'       ] = to_bytes( match_grp.group( 'uvs'       ) )
+
+msg_parsers = ( ( 'loading_project_file'     , re_project_file_path        , parse_loading_project_file      ) ,
+                ( 'opening_texture_file'     , re_opening_texture_file     , parse_opening_texture_file      ) ,
+                ( 'rendering_progress'       , re_rendering_progress       , parse_rendering_progress        ) ,
+                ( 'wrote_image_file'         , re_wrote_image_file         , parse_wrote_image_file          ) ,
+                ( 'loaded_mesh_file'         , re_loaded_mesh_file         , parse_loaded_mesh_file          ) ,
+                ( 'scene_bounding_box'       , re_scene_bounding_box       , parse_scene_bounding_box        ) ,
+                ( 'scene_diameter'           , re_scene_diameter           , parse_scene_diameter            ) ,
+                ( 'while_loading_mesh_object', re_while_loading_mesh_object, parse_while_loading_mesh_object ) ,
+                ( 'tile_borders_wasted'      , re_tile_borders_wasted      , parse_tile_borders_wasted       ) ,
+                ( 'rendering_threads'        , re_rendering_threads        , parse_rendering_threads         ) ,
+                ( 'rendering_finished'       , re_rendering_finished       , parse_rendering_finished        ) ,
+                ( 'intersection_filter'      , re_intersection_filter      , parse_intersection_filter       ) )
+
+
+class ReferenceLine( object ) :
+    """Frozen regex parse of a log line, same interface as `ASLogLine`."""
+
+    __slots__ = ( 'line', 'number', '_raw_timestamp', '_timestamp', 'thread_id', 'vm', 'msg_cat',
+                  'msg_rest', 'msg_content', 'frame_setting_trigger', 'path_tracing_setting_trigger' )
+
+    def __init__( self, line, number = -1, stats = None, types = None, msg_cats = () ) :
+        """Init the class instance
+
+        Raise a ValueError is the given line is not parsable, every message
+        type is always parsed: `stats`, `types` and `msg_cats` are ignored.
+        """
+        self.line        = line
+        self.number      = number
+        self._timestamp  = None
+        self.msg_content = { 'type' : None }
+
+        match_grp = re_main.match( line )
+        if not match_grp :
+            raise ValueError( "Can't parse line {0} : {1}".format( number, line ) )
+
+        self._raw_timestamp =      match_grp.group( 'timestamp' )
+        self.thread_id      = int( match_grp.group( 'thread_id' ) )
+        self.vm             = int( match_grp.group( 'vm'        ) )
+        self.msg_cat        =      match_grp.group( 'msg_cat'   )
+        self.msg_rest       =      match_grp.group( 'msg_rest'  )
+
+        for msg_type, regex, parse_fn in msg_parsers :
+            match_grp = regex.match( self.msg_rest )
+            if match_grp :
+                self.msg_content[ 'type' ] = msg_type
+                parse_fn( match_grp, self.msg_content )
+                break
+
+        self.frame_setting_trigger        = bool( re_opt_frame_settings_trigger.match( self.msg_rest ) )
+        self.path_tracing_setting_trigger = bool( re_opt_path_tracing_settings_trigger.match( self.msg_rest ) )
+
+    @property
+    def is_empty( self ) :
+        return len( self.line ) == 0 or self.line == '\n'
+
+    @property
+    def timestamp( self ) :
+        if self._timestamp is None :
+            self._timestamp = datetime.datetime.strptime( self._raw_timestamp, datetime_str_format )
+        return self._timestamp
@@ -0,0 +1,321 @@
+import argparse
+import json
+import multiprocessing
+import re
+
+from .database import log_paths
+from .log import ASLog
+
+# Render time regressions along a frame sequence.
+#
+# Every render session of every log becomes a frame, numbered from its
+# image (or project) file name. Per frame series (render time, peak VM,
+# triangles, texture opens) are then checked for outliers (robust z-score
+# from median and MAD) and step changes (shift of the median of the
+# following frames against the previous ones). Frames without a "rendering
+# finished" line (crashed or truncated renders) are incomplete: they have
+# no render time and are left out of the detection.
+#
+#   python -m appleseed_log.sequence /shots/sh010/logs --first 1001 --last 1240 --plot sh010
+
+# the frame number is the number between dots before the extension (or the AOV name)
+re_frame_number = re.compile( r'\.(\d+)(?=\.)' )
+
+# frame series, ( key, title )
+series = ( ( 'render_seconds', 'render s'  ) ,
+           ( 'vm_peak'       , 'VM MB'     ) ,
+           ( 'triangles'     , 'triangles' ) ,
+           ( 'texture_opens' , 'textures'  ) )
+
+def frame_number( path ) :
+    """Return the frame number of the given image or project path, None if there is none."""
+    if not path :
+        return None
+    match_grp = re_frame_number.search( path )
+    return int( match_grp.group( 1 ) ) if match_grp else None
+
+def session_frame( image, project ) :
+    """Return the frame number of a render session from its first written image, else from its project path."""
+    frame = frame_number( image )
+    return frame if frame is not None else frame_number( project )
+
+def log_frames( as_log ) :
+    """Return a picklable record (dict) of each render session of the given parsed log."""
+
+    frames = list()
+    frame  = None
+
+    for line_data in as_log.lines :
+
+        line_type = line_data.msg_type
+
+        if line_type == 'loading_project_file' or frame is None :
+            frame = { 'log'            : as_log.path                         ,
+                      'project'        : line_data.content( 'project_file_path' ) ,
+                      'image'          : None                                ,
+                      'start'          : line_data.timestamp                 ,
+                      'end'            : line_data.timestamp                 ,
+                      'render_seconds' : None                                ,
+                      'image_write_ms' : 0                                   ,
+                      'vm_peak'        : 0                                   ,
+                      'triangles'      : 0                                   ,
+                      'texture_opens'  : 0                                   }
+            frames.append( frame )
+
+        frame[ 'end'     ] = line_data.timestamp
+        frame[ 'vm_peak' ] = max( frame[ 'vm_peak' ], line_data.vm )
+
+        if line_type == 'wrote_image_file' :
+            # the first image is the beauty, the others are AOVs of the same frame
+            frame[ 'image' ] = frame[ 'image' ] or line_data.content( 'image_path' )
+            frame[ 'image_write_ms' ] += line_data.content( 'milliseconds' )
+        elif line_type == 'loaded_mesh_file' :
+            frame[ 'triangles' ] += line_data.content( 'triangles' )
+        elif line_type == 'opening_texture_file' :
+            frame[ 'texture_opens' ] += 1
+        elif line_type == 'rendering_finished' :
+            frame[ 'render_seconds' ] = line_data.content( 'seconds' )
+
+    for frame in frames :
+        frame[ 'wall_seconds' ] = ( frame.pop( 'end' ) - frame.pop( 'start' ) ).total_seconds()
+        frame[ 'complete'     ] = frame[ 'render_seconds' ] is not None
+        frame[ 'frame'        ] = session_frame( frame[ 'image' ], frame[ 'project' ] )
+
+    return frames
+
+def frame_log_file( path ) :
+    """Parse the given log file and return its frame records."""
+    return log_frames( ASLog( path, engine = 'split' ) )
+
+def load_frames( paths, processes = None, first = None, last = None ) :
+    """Return the frame records of the given logs sorted by frame number.
+
+    Logs are parsed concurrently, frames without number or out of
+    [first, last] are left out.
+    """
+
+    paths = list( paths )
+    if processes == 1 or len( paths ) < 2 :
+        results = [ frame_log_file( path ) for path in paths ]
+    else :
+        pool = multiprocessing.Pool( min( processes or multiprocessing.cpu_count(), len( paths ) ) )
+        try :
+            results = pool.map( frame_log_file, paths )
+        finally :
+            pool.close()
+            pool.join()
+
+    frames = [ frame for frames in results for frame in frames
+                   if frame[ 'frame' ] is not None                       and
+                      ( first is None or frame[ 'frame' ] >= first )     and
+                      ( last  is None or frame[ 'frame' ] <= last  )         ]
+    return sorted( frames, key = lambda frame : frame[ 'frame' ] )
+
+################################################################################
+# Detection
+################################################################################
+def median( values ) :
+    values = sorted( values )
+    middle = len( values ) // 2
+    if len( values ) % 2 :
+        return values[ middle ]
+    return ( values[ middle - 1 ] + values[ middle ] ) / 2.0
+
+def outliers( values, window = 5, threshold = 3.5, min_change = 0.1 ) :
+    """Return the indices and robust z-scores of the outliers of the given values.
+
+    The robust z-score is 0.6745 * ( x - median ) / MAD over the `window`
+    values on each side, so a step change doesn't make a whole side of the
+    sequence look like outliers. Outliers must also be `min_change` (10%)
+    away from that median, a flat neighbourhood has a MAD of 0.
+    """
+    found = list()
+    for i, x in enumerate( values ) :
+        neighbours = values[ max( 0, i - window ) : i + window + 1 ]
+        if len( neighbours ) < 3 :
+            continue
+        center = median( neighbours )
+        if abs( x - center ) <= min_change * abs( center ) :
+            continue
+        mad = median( [ abs( v - center ) for v in neighbours ] )
+        if not mad :
+            found.append( ( i, float( 'inf' ) if x > center else float( '-inf' ) ) )
+        elif abs( 0.6745 * ( x - center ) / mad ) > threshold :
+            found.append( ( i, 0.6745 * ( x - center ) / mad ) )
+    return found
+
+def step_changes( values, window = 5, min_change = 0.1 ) :
+    """Return the indices and relative changes where the values shift level.
+
+    The change at i compares the median of the `window` values from i with
+    the median of the `window` values before it. Changes of at least
+    `min_change` (10%) are kept when they are the largest of their
+    neighbourhood, so a step is reported once. Medians give about the same
+    change to the frames around a step, so steps are ranked by the smallest
+    of the median and the mean changes, the mean one peaking at the step.
+    """
+    changes = [ ( 0.0, 0.0 ) ] * len( values )
+    for i in xrange( window, len( values ) - window + 1 ) :
+        before = values[ i - window : i ]
+        after  = values[ i : i + window ]
+        if median( before ) and sum( before ) :
+            changes[ i ] = ( ( median( after ) - median( before ) ) / float( median( before ) ) ,
+                             ( sum( after ) - sum( before ) ) / float( sum( before ) )         )
+
+    def score( change ) :
+        return min( abs( change[ 0 ] ), abs( change[ 1 ] ) )
+
+    steps = list()
+    for i, change in enumerate( changes ) :
+        if abs( change[ 0 ] ) < min_change :
+            continue
+        neighbours = changes[ max( 0, i - window + 1 ) : i + window ]
+        if score( change ) == max( score( c ) for c in neighbours ) and not ( steps and i - steps[ -1 ][ 0 ] < window ) :
+            steps.append( ( i, change[ 0 ] ) )
+    return steps
+
+
+class ASLogSequence( object ) :
+    """Per frame series of a shot and their outliers and step changes.
+
+    :Example:
+
+    >>> sequence = ASLogSequence( glob.glob( '/shots/sh010/logs/*.log' ) )
+    >>> for flag in sequence.flags :
+    ...     print flag[ 'frame' ], flag[ 'series' ], flag[ 'kind' ], flag[ 'value' ]
+    1180 render_seconds step 0.21
+    >>> sequence.export_to_gnuplot( 'sh010' )
+    """
+
+    def __init__( self, paths, processes = None, first = None, last = None, window = 5, min_change = 0.1 ) :
+
+        self.frames     = load_frames( paths, processes, first, last )
+        self.window     = window
+        self.min_change = min_change
+
+    @property
+    def complete_frames( self ) :
+        """Return the frames which finished rendering."""
+        return [ frame for frame in self.frames if frame[ 'complete' ] ]
+
+    def series( self, key ) :
+        """Return the values of the given series over the complete frames."""
+        return [ frame[ key ] for frame in self.complete_frames ]
+
+    @property
+    def flags( self ) :
+        """Return the outliers and step changes (list of dicts) of every series, by frame.
+
+        Incomplete frames are left out, see `complete_frames`.
+        """
+        frames = self.complete_frames
+        flags  = list()
+        for key, _ in series :
+            values = self.series( key )
+            for i, score in outliers( values, self.window, min_change = self.min_change ) :
+                flags.append( { 'frame' : frames[ i ][ 'frame' ], 'series' : key, 'kind' : 'outlier',
+                                'value' : score, 'log' : frames[ i ][ 'log' ] } )
+            for i, change in step_changes( values, self.window, self.min_change ) :
+                flags.append( { 'frame' : frames[ i ][ 'frame' ], 'series' : key, 'kind' : 'step',
+                                'value' : change, 'log' : frames[ i ][ 'log' ] } )
+        return sorted( flags, key = lambda flag : ( flag[ 'frame' ], flag[ 'series' ] ) )
+
+    def table( self ) :
+        """Return the per frame table as a string, flagged values are marked."""
+
+        marks = dict()
+        for flag in self.flags :
+            marks[ ( flag[ 'frame' ], flag[ 'series' ] ) ] = '!' if flag[ 'kind' ] == 'outlier' else '^'
+
+        lines = [ '{0:>7} '.format( 'frame' ) + ' '.join( '{0:>13}'.format( title ) for _, title in series ) ]
+        for frame in self.frames :
+            cells = list()
+            for key, _ in series :
+                value = frame[ key ]
+                text  = '-' if value is None else '%.1f' % value if isinstance( value, float ) else str( value )
+                cells.append( '{0:>12}{1:1}'.format( text, marks.get( ( frame[ 'frame' ], key ), '' ) ) )
+            number = '%s%s' % ( frame[ 'frame' ], '' if frame[ 'complete' ] else '*' )
+            lines.append( '{0:>7} '.format( number ) + ' '.join( cells ) )
+        lines.append( '(! outlier, ^ step change from this frame, * incomplete render left out)' )
+        return '\n'.join( lines )
+
+    def to_dict( self ) :
+        return { 'frames' : self.frames ,
+                 'flags'  : self.flags  }
+
+    def dump( self, path ) :
+        """Write the frames and flags as json at the given path."""
+        with open( path, 'w' ) as json_file :
+            json.dump( self.to_dict(), json_file, indent = 4, sort_keys = True )
+
+    def export_to_gnuplot( self, file_path ) :
+        """Export the .csv and the .plot file to execute with gnuplot.
+
+        The given file path shouldn't have file extention. Series are
+        plotted relative to their median so they share an axis, flagged
+        frames are drawn as points.
+        """
+
+        csv_path  = file_path + ".csv"
+        plot_path = file_path + ".plot"
+
+        medians = dict( ( key, median( self.series( key ) or [ 1 ] ) or 1 ) for key, _ in series )
+        flagged = set( ( flag[ 'frame' ], flag[ 'series' ] ) for flag in self.flags )
+
+        with open( csv_path, 'w' ) as csv_file :
+            csv_file.write( ';'.join( [ '"frame"' ] + [ '"%s"' % title for _, title in series ] +
+                                      [ '"%s flag"' % title for _, title in series ] ) + '\n' )
+            for frame in self.complete_frames :
+                values = [ frame[ key ] / float( medians[ key ] ) for key, _ in series ]
+                flags  = [ '%s' % value if ( frame[ 'frame' ], key ) in flagged else '?'
+                           for value, ( key, _ ) in zip( values, series ) ]
+                csv_file.write( ';'.join( [ str( frame[ 'frame' ] ) ] + [ '%s' % v for v in values ] + flags ) + '\n' )
+
+        raw_str  = str()
+        raw_str += 'set datafile separator ";"\n'
+        raw_str += 'set datafile missing "?"\n'
+        raw_str += 'set xlabel "Frame"\n'
+        raw_str += 'set ylabel "Ratio to the sequence median"\n'
+        raw_str += 'set title "%s"\n' % file_path
+        raw_str += 'plot ' + ', '.join(
+            [ '"%s" using 1:%d with lines title columnhead' % ( csv_path if i == 0 else '', i + 2 )
+              for i in xrange( len( series ) ) ] +
+            [ '"" using 1:%d with points pt 7 notitle' % ( i + 2 + len( series ) ) for i in xrange( len( series ) ) ] ) + '\n'
+        raw_str += 'pause -1  "Hit return to continue"\n'
+
+        with open( plot_path, 'w' ) as plot_file :
+            plot_file.write( raw_str )
+
+        print "Exported to gnuplot script : %s" % plot_path
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Find render time regressions along a frame sequence.' )
+    parser.add_argument( 'logs'         , nargs = '+', help = 'log files or directories'                 )
+    parser.add_argument( '--pattern'    , default = '*.log'                                               )
+    parser.add_argument( '--first'      , default = None, type = int, help = 'first frame'                )
+    parser.add_argument( '--last'       , default = None, type = int, help = 'last frame'                 )
+    parser.add_argument( '--window'     , default = 5   , type = int, help = 'frames compared for steps'  )
+    parser.add_argument( '--min-change' , default = 0.1 , type = float                                    )
+    parser.add_argument( '--processes'  , default = None, type = int                                      )
+    parser.add_argument( '--plot'       , default = None, help = 'gnuplot files path, without extension'  )
+    parser.add_argument( '--json'       , default = None, help = 'write frames and flags to this json file' )
+    args = parser.parse_args()
+
+    sequence = ASLogSequence( log_paths( args.logs, args.pattern ), args.processes, args.first, args.last,
+                              args.window, args.min_change )
+
+    print sequence.table()
+    for flag in sequence.flags :
+        if flag[ 'kind' ] == 'step' :
+            print "frame %s : %s %+.0f%% from this frame" % ( flag[ 'frame' ], flag[ 'series' ], flag[ 'value' ] * 100 )
+        else :
+            print "frame %s : %s outlier (robust z %.1f)" % ( flag[ 'frame' ], flag[ 'series' ], flag[ 'value' ] )
+
+    if args.plot :
+        sequence.export_to_gnuplot( args.plot )
+    if args.json :
+        sequence.dump( args.json )
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,405 @@
+import BaseHTTPServer
+import Queue
+import argparse
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+import urlparse
+
+from .log import ASLog, datetime_str_format
+from .query import QuerySyntaxError
+
+# Local HTTP/JSON service sharing parsed logs between tools:
+#
+#   python -m appleseed_log.server --port 8642 --root /renders
+#
+#   GET /summary?path=frame.1001.log
+#   GET /options?path=frame.1001.log
+#   GET /ranges?path=frame.1001.log
+#   GET /lines?path=frame.1001.log&query=msg_cat==error&offset=0&limit=100
+#   GET /series?path=frame.1001.log&field=vm&points=500
+#   GET /cache
+#
+# Responses carry an ETag made of the parsed size and mtime of the log file
+# the served lines were parsed from, requests with a matching If-None-Match
+# get a 304 without parsing an unchanged log again.
+
+# seconds without change after which the last line of a log without end of line is parsed
+settled_seconds = 2.0
+
+################################################################################
+# Parse cache
+################################################################################
+class ASLogCache( object ) :
+    """Thread safe, memory bounded LRU cache of parsed logs.
+
+    Memory is estimated from log file sizes, `max_bytes` is the sum of log
+    file sizes kept parsed. Concurrent requests for the same log wait for a
+    single parse. A log which grew since it was parsed is updated
+    incrementally, a log which shrank is parsed again. A last line without
+    end of line is only parsed once the log stopped changing for
+    `settled_seconds`, until then the log is updated on every request.
+    """
+
+    def __init__( self, max_bytes = 2 << 30 ) :
+
+        self._max_bytes = max_bytes
+        self._bytes     = 0
+        self._entries   = collections.OrderedDict() # path -> ( ASLog, parsed size, mtime ), LRU first
+        self._lock      = threading.Lock()
+        self._log_locks = dict() # path -> [ lock, checkout count ], one parse per path
+
+        self.hits    = 0
+        self.misses  = 0
+        self.updates = 0
+
+    @staticmethod
+    def key( path ) :
+        """Return ( size, mtime ) of the given log file."""
+        st = os.stat( path )
+        return st.st_size, st.st_mtime
+
+    @contextlib.contextmanager
+    def checkout( self, path ) :
+        """Yield ( parsed log (`ASLog`), ( size, mtime ) ) of the given up to date log path.
+
+        ( size, mtime ) is the parsed size and the mtime of the log file the
+        yielded lines were parsed from. The log can't be updated by another
+        thread until the block ends.
+        """
+
+        path = os.path.abspath( path )
+
+        # locks are only kept while a thread checks the log out
+        with self._lock :
+            log_lock     = self._log_locks.setdefault( path, [ threading.Lock(), 0 ] )
+            log_lock[1] += 1
+
+        try :
+            with log_lock[0] :
+                yield self._checkout( path )
+        finally :
+            with self._lock :
+                log_lock[1] -= 1
+                if not log_lock[1] :
+                    del self._log_locks[ path ]
+
+    def _checkout( self, path ) :
+        """Return ( parsed log, ( parsed size, mtime ) ) of the given log, its lock held."""
+
+        size, mtime = self.key( path )
+
+        with self._lock :
+            entry = self._entries.pop( path, None )
+            if entry :
+                self._bytes -= entry[1]
+
+        if entry and entry[1:] == ( size, mtime ) :
+            self.hits += 1
+            as_log = entry[0]
+        else :
+            if entry and size >= entry[1] :
+                self.updates += 1
+                as_log = entry[0]
+                as_log.update()
+            else :
+                self.misses += 1
+                as_log = ASLog( path, follow = True )
+            # the log stopped changing, its last line is complete even without end of line
+            if as_log._offset < size and time.time() - mtime > settled_seconds and self.key( path ) == ( size, mtime ) :
+                as_log.update( complete = True )
+            # the parsed size tells the lines we have, the log may have changed while it was read
+            size = as_log._offset
+
+        with self._lock :
+            self._entries[ path ] = ( as_log, size, mtime )
+            self._bytes          += size
+            self._evict( path )
+
+        return as_log, ( size, mtime )
+
+    def _evict( self, keep ) :
+        """Drop least recently used logs until we fit in the budget."""
+        for path in list( self._entries ) :
+            if self._bytes <= self._max_bytes :
+                break
+            if path == keep :
+                continue
+            entry        = self._entries.pop( path )
+            self._bytes -= entry[1]
+
+    def to_dict( self ) :
+        with self._lock :
+            return { 'logs'      : list( self._entries ) ,
+                     'bytes'     : self._bytes           ,
+                     'max_bytes' : self._max_bytes       ,
+                     'hits'      : self.hits             ,
+                     'misses'    : self.misses           ,
+                     'updates'   : self.updates          }
+
+################################################################################
+# Json views
+################################################################################
+def json_safe( data ) :
+    """Return the given data with infinite and NaN floats, not valid json, as the log spells them."""
+    if isinstance( data, float ) :
+        if data != data :
+            return None
+        if data in ( float( 'inf' ), float( '-inf' ) ) :
+            return 'infinite' if data > 0 else '-infinite'
+        return data
+    if isinstance( data, dict ) :
+        return dict( ( k, json_safe( v ) ) for k, v in data.iteritems() )
+    if isinstance( data, ( list, tuple ) ) :
+        return [ json_safe( v ) for v in data ]
+    return data
+
+def positive_int( params, name, default, minimum = 0 ) :
+    """Return the given integer request parameter, raise a ValueError if it's below `minimum`."""
+    value = int( params.get( name, default ) )
+    if value < minimum :
+        raise ValueError( "Parameter %s must be at least %d : %d" % ( name, minimum, value ) )
+    return value
+
+def format_datetime( value ) :
+    return value.strftime( datetime_str_format ) if value is not None else None
+
+def summary_view( as_log ) :
+    """Return a summary (dict) of the given parsed log."""
+
+    msg_cats   = collections.Counter( line.msg_cat  for line in as_log.lines )
+    line_types = collections.Counter( line.msg_type for line in as_log.lines )
+
+    progress = 0.0
+    for percentage in as_log._path_get( 'percentage', 'rendering_progress' ) :
+        progress = max( progress, percentage )
+
+    return { 'path'                : as_log.path                                   ,
+             'lines'               : len( as_log )                                 ,
+             'msg_cats'            : msg_cats                                      ,
+             'line_types'          : dict( ( str( k ), v ) for k, v in line_types.items() ) ,
+             'progress'            : progress                                      ,
+             'wrote_image_file_ms' : list( as_log._path_get( 'milliseconds', 'wrote_image_file' ) ) ,
+             'ranges'              : ranges_view( as_log )                         }
+
+def ranges_view( as_log ) :
+    ranges = as_log.ranges
+    return { 'first_datetime' : format_datetime( ranges[ 'first_datetime' ] ) ,
+             'last_datetime'  : format_datetime( ranges[ 'last_datetime'  ] ) ,
+             'vm'             : ranges[ 'vm' ]                                }
+
+def line_view( line ) :
+    return { 'number'    : line.number                          ,
+             'timestamp' : line._raw_timestamp                  ,
+             'thread_id' : line.thread_id                       ,
+             'vm'        : line.vm                              ,
+             'msg_cat'   : line.msg_cat                         ,
+             'msg'       : line.msg_rest                        ,
+             'content'   : line.msg_content                     }
+
+def lines_view( as_log, query = None, offset = 0, limit = 100 ) :
+    """Return a page of (filtered) lines."""
+
+    if query :
+        indices = as_log.query( query )
+        total   = len( indices )
+        page    = indices[ offset:offset + limit ]
+    else :
+        total   = len( as_log )
+        page    = xrange( offset, min( offset + limit, total ) )
+
+    return { 'total'  : total                                   ,
+             'offset' : offset                                  ,
+             'limit'  : limit                                   ,
+             'lines'  : [ line_view( as_log[ i ] ) for i in page ] }
+
+def series_view( as_log, field = 'vm', points = 500 ) :
+    """Return a time series downsampled to at most `points` buckets.
+
+    Each bucket keeps min and max values so peaks survive downsampling.
+    """
+
+    columns = as_log.columns
+
+    if field == 'vm' :
+        times  = columns.time
+        values = columns.vm
+    elif field == 'progress' :
+        indices = as_log.query( 'type == rendering_progress' )
+        times   = [ columns.time[ i ] for i in indices ]
+        values  = list()
+        progress = 0.0
+        for i in indices :
+            progress = max( progress, as_log[ i ].content( 'percentage' ) )
+            values.append( progress )
+    else :
+        raise ValueError( "Unknown series field : %s" % field )
+
+    if not times :
+        return { 'field' : field, 'time' : [], 'min' : [], 'max' : [] }
+
+    duration = times[ -1 ] or 1.0
+    buckets  = dict()
+    for t, value in zip( times, values ) :
+        b = min( int( t / duration * points ), points - 1 )
+        if b in buckets :
+            low, high    = buckets[ b ]
+            buckets[ b ] = ( min( low, value ), max( high, value ) )
+        else :
+            buckets[ b ] = ( value, value )
+
+    keys = sorted( buckets )
+    return { 'field' : field                                        ,
+             'time'  : [ k * duration / points for k in keys ]      ,
+             'min'   : [ buckets[ k ][0] for k in keys ]            ,
+             'max'   : [ buckets[ k ][1] for k in keys ]            }
+
+################################################################################
+# Server
+################################################################################
+class ASLogRequestHandler( BaseHTTPServer.BaseHTTPRequestHandler ) :
+
+    server_version = 'ASLogServer/0.1'
+
+    views = ( 'summary', 'options', 'ranges', 'lines', 'series' )
+
+    def do_GET( self ) :
+
+        url    = urlparse.urlparse( self.path )
+        params = dict( ( k, v[-1] ) for k, v in urlparse.parse_qs( url.query ).items() )
+        view   = url.path.strip( '/' )
+
+        if view == 'cache' :
+            return self.send_json( self.server.cache.to_dict() )
+
+        if view not in self.views :
+            return self.send_error( 404, "Unknown view : %s" % view )
+
+        path = params.get( 'path' )
+        if not path :
+            return self.send_error( 400, "Missing path parameter" )
+        path = os.path.realpath( path )
+
+        if self.server.root and not path.startswith( self.server.root + os.sep ) :
+            return self.send_error( 403, "Path outside of served root : %s" % path )
+
+        if not os.path.isfile( path ) :
+            return self.send_error( 404, "Log not found : %s" % path )
+
+        # a cached, unchanged log is checked out without being read
+        try :
+            with self.server.cache.checkout( path ) as ( as_log, ( size, mtime ) ) :
+                etag = '"%x-%x"' % ( size, int( mtime * 1000000 ) )
+                if self.headers.get( 'If-None-Match' ) == etag :
+                    data = None
+                else :
+                    data = self.view( as_log, view, params )
+        except OSError :
+            return self.send_error( 404, "Log not found : %s" % path )
+        except ( ValueError, QuerySyntaxError ) as e :
+            return self.send_error( 400, str( e ) )
+
+        if data is None :
+            self.send_response( 304 )
+            self.send_header( 'ETag', etag )
+            self.end_headers()
+            return
+
+        self.send_json( data, etag )
+
+    def view( self, as_log, view, params ) :
+        """Return the json data of the given view."""
+
+        if view == 'summary' :
+            return summary_view( as_log )
+        if view == 'options' :
+            return as_log.render_options
+        if view == 'ranges' :
+            return ranges_view( as_log )
+        if view == 'lines' :
+            return lines_view( as_log                                             ,
+                               params.get( 'query' )                              ,
+                               positive_int( params, 'offset', 0 )                ,
+                               min( positive_int( params, 'limit', 100 ), 10000 ) )
+        return series_view( as_log                                   ,
+                            params.get( 'field', 'vm' )              ,
+                            positive_int( params, 'points', 500, 1 ) )
+
+    def send_json( self, data, etag = None ) :
+
+        body = json.dumps( json_safe( data ), allow_nan = False )
+
+        self.send_response( 200 )
+        self.send_header( 'Content-Type'  , 'application/json' )
+        self.send_header( 'Content-Length', str( len( body ) ) )
+        if etag :
+            self.send_header( 'ETag', etag )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def log_message( self, format, *args ) :
+        if self.server.verbose :
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message( self, format, *args )
+
+
+class ASLogServer( BaseHTTPServer.HTTPServer ) :
+    """HTTP server answering requests from a fixed pool of threads."""
+
+    allow_reuse_address = True
+
+    def __init__( self, address, cache = None, root = None, threads = 8, verbose = False ) :
+
+        BaseHTTPServer.HTTPServer.__init__( self, address, ASLogRequestHandler )
+
+        self.cache   = cache or ASLogCache()
+        self.root    = os.path.realpath( root ) if root else None
+        self.verbose = verbose
+
+        self._requests = Queue.Queue( threads * 4 )
+        self._workers  = list()
+        for i in xrange( threads ) :
+            worker        = threading.Thread( target = self._work, name = 'ASLogServer-%d' % i )
+            worker.daemon = True
+            worker.start()
+            self._workers.append( worker )
+
+    def process_request( self, request, client_address ) :
+        """Queue the request for the worker threads (blocks when they are all busy)."""
+        self._requests.put( ( request, client_address ) )
+
+    def _work( self ) :
+        while True :
+            request, client_address = self._requests.get()
+            try :
+                self.finish_request( request, client_address )
+            except Exception :
+                self.handle_error( request, client_address )
+            finally :
+                self.shutdown_request( request )
+
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Serve parsed appleseed logs as json.' )
+    parser.add_argument( '--host'     , default = '127.0.0.1'                                        )
+    parser.add_argument( '--port'     , default = 8642, type = int                                   )
+    parser.add_argument( '--root'     , default = None, help = 'only serve logs under this directory' )
+    parser.add_argument( '--threads'  , default = 8   , type = int                                   )
+    parser.add_argument( '--cache-mb' , default = 2048, type = int, help = 'log bytes kept parsed'   )
+    parser.add_argument( '--verbose'  , action  = 'store_true'                                       )
+    args = parser.parse_args()
+
+    server = ASLogServer( ( args.host, args.port )                  ,
+                          ASLogCache( args.cache_mb << 20 )         ,
+                          root    = args.root                       ,
+                          threads = args.threads                    ,
+                          verbose = args.verbose                    )
+
+    print "Serving appleseed logs on http://%s:%s" % ( args.host, args.port )
+    server.serve_forever()
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,277 @@
+import math
+
+# Mergeable streaming accumulators.
+#
+# Each accumulator summarizes any number of values in constant memory and
+# two of them merge into the accumulator of both value streams. Sums are
+# kept exact (as non overlapping float partials) and quantile buckets are
+# counts, so merging in any order gives the same result as a single pass.
+
+def add_partial( partials, x ) :
+    """Add x to the exact sum held as non overlapping float `partials` (Shewchuk)."""
+    i = 0
+    for y in partials :
+        if abs( x ) < abs( y ) :
+            x, y = y, x
+        hi = x + y
+        lo = y - ( hi - x )
+        if lo :
+            partials[ i ] = lo
+            i += 1
+        x = hi
+    partials[ i: ] = [ x ]
+
+
+class Moments( object ) :
+    """Count, mean, variance, min and max of a value stream.
+
+    :Example:
+
+    >>> moments = Moments()
+    >>> for vm in ( 10, 12, 15 ) :
+    ...     moments.add( vm )
+    >>> moments.mean, moments.max
+    (12.333333333333334, 15)
+    """
+
+    __slots__ = ( 'count', 'min', 'max', '_sum', '_sum_sq' )
+
+    def __init__( self ) :
+        self.count   = 0
+        self.min     = None
+        self.max     = None
+        self._sum    = list()  # partials of the exact sum of values
+        self._sum_sq = list()  # partials of the exact sum of squared values
+
+    def add( self, value ) :
+        self.count += 1
+        if self.min is None or value < self.min :
+            self.min = value
+        if self.max is None or value > self.max :
+            self.max = value
+        add_partial( self._sum   , float( value ) )
+        add_partial( self._sum_sq, float( value ) * value )
+
+    def merge( self, other ) :
+        """Add the values of an other `Moments` to this one, return self."""
+        if other.count :
+            self.count += other.count
+            self.min    = other.min if self.min is None else min( self.min, other.min )
+            self.max    = other.max if self.max is None else max( self.max, other.max )
+            for x in other._sum :
+                add_partial( self._sum, x )
+            for x in other._sum_sq :
+                add_partial( self._sum_sq, x )
+        return self
+
+    @property
+    def sum( self ) :
+        return math.fsum( self._sum )
+
+    @property
+    def mean( self ) :
+        return self.sum / self.count if self.count else None
+
+    @property
+    def variance( self ) :
+        """Return the sample variance, None under two values."""
+        if self.count < 2 :
+            return None
+        total = self.sum
+        return max( 0.0, ( math.fsum( self._sum_sq ) - total * total / self.count ) / ( self.count - 1 ) )
+
+    @property
+    def std( self ) :
+        variance = self.variance
+        return None if variance is None else math.sqrt( variance )
+
+    def to_dict( self ) :
+        """Return the state as a json serializable dict, see `from_dict()`."""
+        return { 'count'  : self.count        ,
+                 'min'    : self.min          ,
+                 'max'    : self.max          ,
+                 'sum'    : list( self._sum    ) ,
+                 'sum_sq' : list( self._sum_sq ) }
+
+    @classmethod
+    def from_dict( cls, d ) :
+        moments         = cls()
+        moments.count   = d[ 'count' ]
+        moments.min     = d[ 'min'   ]
+        moments.max     = d[ 'max'   ]
+        moments._sum    = list( d[ 'sum'    ] )
+        moments._sum_sq = list( d[ 'sum_sq' ] )
+        return moments
+
+    def __eq__( self, other ) :
+        return isinstance( other, Moments ) and self.count == other.count and \
+               self.min == other.min and self.max == other.max            and \
+               self.sum == other.sum and math.fsum( self._sum_sq ) == math.fsum( other._sum_sq )
+
+    def __ne__( self, other ) :
+        return not self == other
+
+
+class QuantileSketch( object ) :
+    """Relative error quantile sketch of positive values (DDSketch).
+
+    Values go in logarithmic buckets of ratio gamma = (1 + accuracy) / (1 - accuracy)
+    so any returned quantile is within `accuracy` (1%) of a true value of
+    that rank. Zero and negative values are counted apart and returned as 0.
+    Buckets more than `max_buckets` below the highest one are folded in the
+    lowest kept one, loosing accuracy on the lowest quantiles only. That
+    floor only depends on the highest value, so a merge of sketches still
+    equals the sketch of a single pass.
+
+    :Example:
+
+    >>> sketch = QuantileSketch()
+    >>> for ms in mesh_load_ms :
+    ...     sketch.add( ms )
+    >>> sketch.quantile( 0.99 )
+    1204.7...
+    """
+
+    __slots__ = ( 'accuracy', 'max_buckets', 'gamma', '_log_gamma', 'count', 'zero_count', 'buckets', '_floor' )
+
+    def __init__( self, accuracy = 0.01, max_buckets = 2048 ) :
+        self.accuracy    = accuracy
+        self.max_buckets = max_buckets
+        self.gamma       = ( 1.0 + accuracy ) / ( 1.0 - accuracy )
+        self._log_gamma  = math.log( self.gamma )
+        self.count       = 0
+        self.zero_count  = 0
+        self.buckets     = dict()  # bucket index -> count, bucket i holds ( gamma**(i-1), gamma**i ]
+        self._floor      = None    # lowest kept bucket index, highest index - max_buckets + 1
+
+    def add( self, value, count = 1 ) :
+        self.count += count
+        if value <= 0 :
+            self.zero_count += count
+            return
+        index = int( math.ceil( math.log( value ) / self._log_gamma ) )
+        if self._floor is None or index - self.max_buckets + 1 > self._floor :
+            self._collapse( index - self.max_buckets + 1 )
+        elif index < self._floor :
+            index = self._floor
+        self.buckets[ index ] = self.buckets.get( index, 0 ) + count
+
+    def _collapse( self, floor ) :
+        """Fold the buckets below the given index in its bucket."""
+        self._floor = floor
+        excess      = [ index for index in self.buckets if index < floor ]
+        if excess :
+            self.buckets[ floor ] = self.buckets.get( floor, 0 ) + sum( self.buckets.pop( i ) for i in excess )
+
+    def merge( self, other ) :
+        """Add the values of an other sketch of the same accuracy, return self."""
+        if other.accuracy != self.accuracy :
+            raise ValueError( "Can't merge sketches of accuracy %s and %s" % ( self.accuracy, other.accuracy ) )
+        self.count      += other.count
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.iteritems() :
+            self.buckets[ index ] = self.buckets.get( index, 0 ) + count
+        if self.buckets :
+            self._collapse( max( self.buckets ) - self.max_buckets + 1 )
+        return self
+
+    def quantile( self, q ) :
+        """Return the value of the given quantile (0.0 to 1.0), None if empty."""
+        if not self.count :
+            return None
+        rank = q * ( self.count - 1 )
+        seen = self.zero_count
+        if rank < seen :
+            return 0.0
+        for index in sorted( self.buckets ) :
+            seen += self.buckets[ index ]
+            if rank < seen :
+                return 2.0 * self.gamma ** index / ( self.gamma + 1.0 )
+        return 2.0 * self.gamma ** max( self.buckets ) / ( self.gamma + 1.0 )
+
+    def to_dict( self ) :
+        """Return the state as a json serializable dict, see `from_dict()`."""
+        return { 'accuracy'    : self.accuracy    ,
+                 'max_buckets' : self.max_buckets ,
+                 'count'       : self.count       ,
+                 'zero_count'  : self.zero_count  ,
+                 'buckets'     : sorted( self.buckets.items() ) }
+
+    @classmethod
+    def from_dict( cls, d ) :
+        sketch            = cls( d[ 'accuracy' ], d[ 'max_buckets' ] )
+        sketch.count      = d[ 'count'      ]
+        sketch.zero_count = d[ 'zero_count' ]
+        sketch.buckets    = dict( ( int( i ), c ) for i, c in d[ 'buckets' ] )
+        if sketch.buckets :
+            sketch._collapse( max( sketch.buckets ) - sketch.max_buckets + 1 )
+        return sketch
+
+    def __eq__( self, other ) :
+        return isinstance( other, QuantileSketch ) and self.accuracy == other.accuracy and \
+               self.count == other.count and self.zero_count == other.zero_count   and \
+               self.buckets == other.buckets
+
+    def __ne__( self, other ) :
+        return not self == other
+
+
+class Distribution( object ) :
+    """`Moments` and `QuantileSketch` of a same value stream."""
+
+    __slots__ = ( 'moments', 'sketch' )
+
+    quantiles = ( 0.5, 0.9, 0.99 )
+
+    def __init__( self, accuracy = 0.01 ) :
+        self.moments = Moments()
+        self.sketch  = QuantileSketch( accuracy )
+
+    def add( self, value ) :
+        self.moments.add( value )
+        self.sketch.add( value )
+
+    def merge( self, other ) :
+        self.moments.merge( other.moments )
+        self.sketch.merge( other.sketch )
+        return self
+
+    @property
+    def count( self ) :
+        return self.moments.count
+
+    def quantile( self, q ) :
+        """Return the sketch quantile, clamped to the exact min and max."""
+        value = self.sketch.quantile( q )
+        if value is None :
+            return None
+        return min( max( value, self.moments.min ), self.moments.max )
+
+    def report( self ) :
+        """Return the readable statistics (dict) of the distribution."""
+        moments = self.moments
+        report  = { 'count' : moments.count ,
+                    'mean'  : moments.mean  ,
+                    'std'   : moments.std   ,
+                    'min'   : moments.min   ,
+                    'max'   : moments.max   }
+        for q in self.quantiles :
+            report[ 'p%g' % ( q * 100 ) ] = self.quantile( q )
+        return report
+
+    def to_dict( self ) :
+        return { 'moments' : self.moments.to_dict() ,
+                 'sketch'  : self.sketch.to_dict()  }
+
+    @classmethod
+    def from_dict( cls, d ) :
+        distribution         = cls.__new__( cls )
+        distribution.moments = Moments.from_dict(        d[ 'moments' ] )
+        distribution.sketch  = QuantileSketch.from_dict( d[ 'sketch'  ] )
+        return distribution
+
+    def __eq__( self, other ) :
+        return isinstance( other, Distribution ) and self.moments == other.moments and self.sketch == other.sketch
+
+    def __ne__( self, other ) :
+        return not self == other
@@ -0,0 +1,128 @@
+import Queue
+import argparse
+import sys
+import threading
+
+from .log import ASLog, chunk_lines, stream_chunks
+from .summary import ASLogSummary
+
+# Streamed parse of a render output.
+#
+# A render wrapper pipes appleseed's output straight in, without writing a
+# log file: a reader thread cuts the stream into batches of raw lines on a
+# bounded queue, and batches are parsed as they are consumed. Lines aren't
+# kept by default, so memory stays flat whatever the render length, and the
+# summary of the whole render is there once the stream ends.
+#
+#   appleseed.cli -r shot_010.appleseed 2>&1 | python -m appleseed_log.stream
+
+end_of_stream = None # queue item after the last batch
+
+
+class ASLogStream( object ) :
+    """Parse a byte stream (file object or iterable of chunks) as it is written.
+
+    The reader thread puts batches of at most `batch_lines` raw lines on a
+    queue of `max_batches`. A late consumer fills the queue, the reader
+    then waits and stops reading, and the producer waits on its full pipe.
+    Batches are parsed in the consuming thread so `as_log` (ranges, render
+    options, summary) is always the state of the batches handed out.
+
+    :Example:
+
+    >>> render = subprocess.Popen( [ 'appleseed.cli', '-r', 'shot.appleseed' ], stdout = subprocess.PIPE )
+    >>> stream = ASLogStream( render.stdout )
+    >>> for lines in stream :
+    ...     for line_data in lines :
+    ...         if line_data.msg_type == 'rendering_progress' :
+    ...             print line_data.content( 'percentage' )
+    >>> stream.summary.report()[ 'lines' ]
+    48213
+    """
+
+    def __init__( self, source, batch_lines = 1024, max_batches = 16, engine = 'split' ,
+                  keep_lines = False, store = None ) :
+
+        self.source      = source
+        self.batch_lines = batch_lines
+        self.as_log      = ASLog( source, parse = False, engine = engine, summary = True ,
+                                  keep_lines = keep_lines, store = store                 )
+        self.finished    = False
+
+        self._queue      = Queue.Queue( max_batches )
+        self._thread     = None
+        self._error      = None
+
+    def start( self ) :
+        """Start reading the stream, done by the first iteration otherwise."""
+        if self._thread is None :
+            self._thread        = threading.Thread( target = self._read, name = 'ASLogStream reader' )
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _read( self ) :
+        try :
+            for lines in chunk_lines( stream_chunks( self.source ) ) :
+                for start in xrange( 0, len( lines ), self.batch_lines ) :
+                    self._queue.put( lines[ start : start + self.batch_lines ] )
+        except Exception as e :
+            self._error = e
+        finally :
+            self._queue.put( end_of_stream )
+
+    def __iter__( self ) :
+        """Yield the parsed lines (list of `ASLogLine`) of each batch, up to the end of the stream."""
+
+        self.start()
+        while not self.finished :
+            raw_lines = self._queue.get()
+            if raw_lines is end_of_stream :
+                self._thread.join()
+                self.finished = True
+                break
+            yield self.as_log.add_lines( raw_lines )
+
+        if self._error is not None :
+            raise self._error
+
+    def run( self ) :
+        """Parse the whole stream without looking at its lines, return the summary."""
+        for _ in self :
+            pass
+        return self.summary
+
+    @property
+    def summary( self ) :
+        """Return the `ASLogSummary` of the lines parsed so far, render options included."""
+        return ASLogSummary().add_log( self.as_log )
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Parse an appleseed render output read from stdin.' )
+    parser.add_argument( '--batch-lines', default = 1024, type = int                                  )
+    parser.add_argument( '--max-batches', default = 16  , type = int                                  )
+    parser.add_argument( '--output'     , default = None, help = 'write the summary to this json file' )
+    parser.add_argument( '--quiet'      , action = 'store_true', help = "don't print progress and errors" )
+    args = parser.parse_args()
+
+    stream   = ASLogStream( sys.stdin, args.batch_lines, args.max_batches )
+    progress = None
+    for lines in stream :
+        if args.quiet :
+            continue
+        for line_data in lines :
+            if line_data.msg_type == 'rendering_progress' and int( line_data.content( 'percentage' ) ) != progress :
+                progress = int( line_data.content( 'percentage' ) )
+                print "rendering %d%%" % progress
+            elif line_data.msg_cat in ( 'error', 'fatal' ) :
+                print "%s : %s" % ( line_data.msg_cat, line_data.msg_rest.strip() )
+        sys.stdout.flush()
+
+    report = stream.summary.report()
+    print "%d lines, %d unparsable, %s to %s" % ( report[ 'lines' ], report[ 'unparsable' ],
+                                                  report[ 'first_datetime' ], report[ 'last_datetime' ] )
+    if args.output :
+        stream.summary.dump( args.output )
+
+if __name__ == '__main__' :
+    main()
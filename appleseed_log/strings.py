@@ -0,0 +1,68 @@
+import threading
+
+# Process wide string table. Paths, mesh object names, message types and
+# categories are repeated on thousands of lines and across every log of a
+# frame sequence. Parsed lines keep the integer ID of their paths and object
+# names, decoded on access (`ASLogLine.content()`), and the table's copy of
+# their type and category; column arrays store the IDs of all of them, so
+# logs of the same process can be joined on IDs. The table never shrinks:
+# only these short, repeated fields go in, not message texts, so it grows
+# with the distinct paths and objects seen.
+#
+#   >>> shared = set( log_a.opened_texture_ids ) & set( log_b.opened_texture_ids )
+#   >>> sorted( strings[ i ] for i in shared )
+#   ['./_textures/coke_can_diff.exr', ...]
+#
+# IDs are only valid in the process which created them, decode them before
+# sending results to another process.
+
+class StringTable( object ) :
+    """Intern strings into integer IDs, ID 0 is always None."""
+
+    def __init__( self ) :
+
+        self._ids    = { None : 0 }  # string -> ID
+        self._values = [ None ]      # ID -> string
+        self._lock   = threading.Lock()
+
+    def __len__( self ) :
+        return len( self._values )
+
+    def __contains__( self, value ) :
+        return value in self._ids
+
+    def __getitem__( self, id ) :
+        """Return the string of the given ID."""
+        return self._values[ id ]
+
+    def id( self, value ) :
+        """Return the ID of the given string, None if it was never interned."""
+        return self._ids.get( value )
+
+    def intern( self, value ) :
+        """Return the ID of the given string, adding it to the table if needed."""
+        id = self._ids.get( value )
+        if id is not None :
+            return id
+
+        with self._lock :
+            id = self._ids.get( value )
+            if id is None :
+                # the value is there before its ID is visible to other threads
+                id = len( self._values )
+                self._values.append( value )
+                self._ids[ value ] = id
+        return id
+
+    def canonical( self, value ) :
+        """Return the table's copy of the given string."""
+        return self._values[ self.intern( value ) ]
+
+    def decode( self, ids ) :
+        """Return the strings of the given IDs."""
+        values = self._values
+        return [ values[ id ] for id in ids ]
+
+
+# shared by every ASLog of the process
+strings = StringTable()
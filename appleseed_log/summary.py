@@ -0,0 +1,334 @@
+import json
+
+from .sketches import Distribution
+
+# Constant memory summary of parsed lines.
+#
+# Fed line per line while parsing (see `ASLog( path, summary = True )`), so
+# a summary of a huge log doesn't need its lines to stay in memory.
+#
+# Summaries are also partial results of a map-reduce over a render farm:
+# each node writes the summary of its own logs to a small versioned json
+# file and `merge()` combines any number of them, in any order, into the
+# summary a single central pass would give.
+#
+#   python -m appleseed_log.summary /local/logs --output node12.summary.json
+#   python -m appleseed_log.summary --merge nodes/*.summary.json --output farm.summary.json
+#   python -m appleseed_log.summary /renders/logs --check --processes 8
+
+summary_version = 1
+
+class ASLogSummary( object ) :
+    """Counts and distributions of the lines of a log.
+
+    Distributions (`appleseed_log.sketches.Distribution`) give count, mean,
+    std, min, max and quantiles of VM, delay between lines, mesh loads,
+    texture opens, progress intervals per thread and render times. Summaries
+    of different logs merge with `merge()`.
+
+    :Example:
+
+    >>> as_log = ASLog( 'frame.1001.log', summary = True, keep_lines = False )
+    >>> as_log.summary.distributions[ 'mesh_load_ms' ].quantile( 0.99 )
+    151.3...
+    >>> as_log.summary.report()[ 'progress_interval' ][ 3 ][ 'p50' ]
+    2.01...
+    """
+
+    # distributions of every summary
+    names = ( 'vm'                    ,  # MB
+              'line_interval'         ,  # seconds since the previous line
+              'mesh_load_ms'          ,
+              'mesh_vertices'         ,
+              'mesh_triangles'        ,
+              'texture_open_interval' ,  # seconds since the previous texture open
+              'render_seconds'        )  # "rendering finished in" times
+
+    def __init__( self ) :
+
+        self.logs              = 0
+        self.unparsable        = 0
+        self.options           = dict()  # render options fingerprint -> log count
+        self.lines             = 0
+        self.msg_cats          = dict()  # message category -> line count
+        self.types             = dict()  # message type -> line count, None for untyped lines
+        self.first_datetime    = None
+        self.last_datetime     = None
+        self.distributions     = dict( ( name, Distribution() ) for name in self.names )
+        self.progress_interval = dict()  # thread id -> Distribution of seconds between its progress lines
+
+        # latest times of the summarized log, not merged
+        self._origin           = None
+        self._last_time        = None
+        self._last_texture     = None
+        self._last_progress    = dict()  # thread id -> time
+
+    def add( self, line_data ) :
+        """Add the given parsed line (`ASLogLine`)."""
+
+        line_type = line_data.msg_type
+        msg_cat   = line_data.msg_cat
+        timestamp = line_data.timestamp
+        dists     = self.distributions
+
+        self.lines               += 1
+        self.msg_cats[ msg_cat   ] = self.msg_cats.get( msg_cat, 0 ) + 1
+        self.types[    line_type ] = self.types.get( line_type, 0 ) + 1
+
+        if self.first_datetime is None or timestamp < self.first_datetime :
+            self.first_datetime = timestamp
+        if self.last_datetime is None or timestamp > self.last_datetime :
+            self.last_datetime = timestamp
+
+        # times are seconds since the first summarized line
+        if self._origin is None :
+            self._origin = timestamp
+        time = ( timestamp - self._origin ).total_seconds()
+
+        dists[ 'vm' ].add( line_data.vm )
+        if self._last_time is not None :
+            dists[ 'line_interval' ].add( time - self._last_time )
+        self._last_time = time
+
+        if line_type == 'loaded_mesh_file' :
+            dists[ 'mesh_load_ms'   ].add( line_data.content( 'milliseconds' ) )
+            dists[ 'mesh_vertices'  ].add( line_data.content( 'vertices'     ) )
+            dists[ 'mesh_triangles' ].add( line_data.content( 'triangles'    ) )
+
+        elif line_type == 'opening_texture_file' :
+            if self._last_texture is not None :
+                dists[ 'texture_open_interval' ].add( time - self._last_texture )
+            self._last_texture = time
+
+        elif line_type == 'rendering_progress' :
+            thread_id = line_data.thread_id
+            last      = self._last_progress.get( thread_id )
+            if last is not None :
+                distribution = self.progress_interval.get( thread_id )
+                if distribution is None :
+                    distribution = self.progress_interval[ thread_id ] = Distribution()
+                distribution.add( time - last )
+            self._last_progress[ thread_id ] = time
+
+        elif line_type == 'rendering_finished' :
+            dists[ 'render_seconds' ].add( line_data.content( 'seconds' ) )
+
+    def add_log( self, as_log ) :
+        """Merge the summary of the given parsed `ASLog`, return self."""
+        self.merge( as_log.summary )
+        fingerprint                 = options_fingerprint( as_log.render_options )
+        self.logs                  += 1
+        self.unparsable            += as_log.unparsable_count
+        self.options[ fingerprint ] = self.options.get( fingerprint, 0 ) + 1
+        return self
+
+    def merge( self, other ) :
+        """Add the counts and distributions of an other summary, return self."""
+
+        self.logs       += other.logs
+        self.unparsable += other.unparsable
+        self.lines      += other.lines
+        for counts, other_counts in ( ( self.msg_cats, other.msg_cats ) ,
+                                      ( self.types   , other.types    ) ,
+                                      ( self.options , other.options  ) ) :
+            for key, count in other_counts.iteritems() :
+                counts[ key ] = counts.get( key, 0 ) + count
+
+        if other.first_datetime is not None :
+            if self.first_datetime is None or other.first_datetime < self.first_datetime :
+                self.first_datetime = other.first_datetime
+            if self.last_datetime is None or other.last_datetime > self.last_datetime :
+                self.last_datetime = other.last_datetime
+
+        for name, distribution in other.distributions.iteritems() :
+            self.distributions[ name ].merge( distribution )
+
+        for thread_id, distribution in other.progress_interval.iteritems() :
+            if thread_id in self.progress_interval :
+                self.progress_interval[ thread_id ].merge( distribution )
+            else :
+                self.progress_interval[ thread_id ] = Distribution().merge( distribution )
+
+        return self
+
+    def report( self ) :
+        """Return the readable statistics (dict) of the summary."""
+        report = dict( ( name, distribution.report() ) for name, distribution in self.distributions.iteritems() )
+        report[ 'progress_interval' ] = dict( ( thread_id, distribution.report() )
+                                              for thread_id, distribution in self.progress_interval.iteritems() )
+        report[ 'logs'           ] = self.logs
+        report[ 'unparsable'     ] = self.unparsable
+        report[ 'options'        ] = dict( self.options )
+        report[ 'lines'          ] = self.lines
+        report[ 'msg_cats'       ] = dict( self.msg_cats )
+        report[ 'types'          ] = dict( self.types    )
+        report[ 'first_datetime' ] = self.first_datetime
+        report[ 'last_datetime'  ] = self.last_datetime
+        return report
+
+    def to_dict( self ) :
+        """Return the summary as a json serializable dict, see `from_dict()`."""
+        from .log import datetime_str_format
+
+        def raw( timestamp ) :
+            return None if timestamp is None else timestamp.strftime( datetime_str_format )
+
+        return { 'version'           : summary_version            ,
+                 'logs'              : self.logs                  ,
+                 'unparsable'        : self.unparsable            ,
+                 'options'           : self.options               ,
+                 'lines'             : self.lines                 ,
+                 'msg_cats'          : sorted( self.msg_cats.items() ) ,
+                 'types'             : sorted( self.types.items()    ) ,  # type may be None
+                 'first_datetime'    : raw( self.first_datetime ) ,
+                 'last_datetime'     : raw( self.last_datetime  ) ,
+                 'distributions'     : dict( ( name, distribution.to_dict() )
+                                             for name, distribution in self.distributions.iteritems() ) ,
+                 'progress_interval' : sorted( ( thread_id, distribution.to_dict() )
+                                               for thread_id, distribution in self.progress_interval.iteritems() ) }
+
+    @classmethod
+    def from_dict( cls, d ) :
+        """Return the summary of a `to_dict()` dict.
+
+        Raise a ValueError if the dict was written by another summary version.
+        """
+        from .log import parse_timestamp
+
+        if d.get( 'version' ) != summary_version :
+            raise ValueError( "Summary version {0} can't be read, expected {1}".format( d.get( 'version' ) ,
+                                                                                       summary_version    ) )
+        summary                   = cls()
+        summary.logs              = d[ 'logs'       ]
+        summary.unparsable        = d[ 'unparsable' ]
+        summary.options           = dict( d[ 'options' ] )
+        summary.lines             = d[ 'lines'      ]
+        summary.msg_cats          = dict( d[ 'msg_cats' ] )
+        summary.types             = dict( d[ 'types'    ] )
+        summary.first_datetime    = d[ 'first_datetime' ] and parse_timestamp( d[ 'first_datetime' ] )
+        summary.last_datetime     = d[ 'last_datetime'  ] and parse_timestamp( d[ 'last_datetime'  ] )
+        summary.distributions     = dict( ( name, Distribution.from_dict( distribution ) )
+                                          for name, distribution in d[ 'distributions' ].iteritems() )
+        summary.progress_interval = dict( ( thread_id, Distribution.from_dict( distribution ) )
+                                          for thread_id, distribution in d[ 'progress_interval' ] )
+        return summary
+
+    def dump( self, path ) :
+        """Write the summary as json at the given path."""
+        with open( path, 'w' ) as json_file :
+            json.dump( self.to_dict(), json_file, sort_keys = True )
+
+    @classmethod
+    def load( cls, path ) :
+        """Return the summary written by `dump()` at the given path."""
+        with open( path ) as json_file :
+            return cls.from_dict( json.load( json_file ) )
+
+    def __eq__( self, other ) :
+        """Return if both summaries hold the same counts and distributions."""
+        return isinstance( other, ASLogSummary )                  and \
+               self.logs              == other.logs              and \
+               self.unparsable        == other.unparsable        and \
+               self.options           == other.options           and \
+               self.lines             == other.lines             and \
+               self.msg_cats          == other.msg_cats          and \
+               self.types             == other.types             and \
+               self.first_datetime    == other.first_datetime    and \
+               self.last_datetime     == other.last_datetime     and \
+               self.distributions     == other.distributions     and \
+               self.progress_interval == other.progress_interval
+
+    def __ne__( self, other ) :
+        return not self == other
+
+def options_fingerprint( render_options ) :
+    """Return a short hash of the given render options, equal options give equal hashes."""
+    import hashlib
+
+    text = json.dumps( render_options, sort_keys = True )
+    return hashlib.sha1( text ).hexdigest()[ :12 ]
+
+def summarize_logs( paths ) :
+    """Return the summary of the logs at the given paths, parsed without keeping their lines."""
+    from .log import ASLog
+
+    summary = ASLogSummary()
+    for path in paths :
+        summary.add_log( ASLog( path, engine = 'split', keep_lines = False ) )
+    return summary
+
+def summarize_shard( shard ) :
+    """Write the summary of a shard, a ( log paths, json path ) tuple, with `dump()` (for worker processes)."""
+    paths, json_path = shard
+    summarize_logs( paths ).dump( json_path )
+
+def summarize_shards( paths, processes = None ) :
+    """Return the summaries of the given logs split in one shard per worker process.
+
+    Each worker dumps its summary to a json file which is loaded back, as
+    the summaries of farm nodes are.
+    """
+    import multiprocessing
+    import os
+    import shutil
+    import tempfile
+
+    processes = processes or multiprocessing.cpu_count()
+    directory = tempfile.mkdtemp( prefix = 'summary' )
+    shards    = [ ( paths[ i :: processes ], os.path.join( directory, 'shard%d.summary.json' % i ) )
+                  for i in xrange( processes ) ]
+    try :
+        pool = multiprocessing.Pool( processes )
+        try :
+            pool.map( summarize_shard, shards )
+        finally :
+            pool.close()
+            pool.join()
+        return [ ASLogSummary.load( json_path ) for _, json_path in shards ]
+    finally :
+        shutil.rmtree( directory )
+
+def merge_summaries( summaries ) :
+    """Return the merge of the given summaries in a new summary."""
+    total = ASLogSummary()
+    for summary in summaries :
+        total.merge( summary )
+    return total
+
+def main() :
+    import argparse
+
+    parser = argparse.ArgumentParser( description = 'Write and merge partial summaries of appleseed logs.' )
+    parser.add_argument( 'logs'        , nargs = '*', help = 'log files or directories'                   )
+    parser.add_argument( '--pattern'   , default = '*.log'                                                 )
+    parser.add_argument( '--merge'     , nargs = '+', default = list(), help = 'summary files to merge'    )
+    parser.add_argument( '--output'    , default = None, help = 'write the summary to this json file'      )
+    parser.add_argument( '--check'     , action = 'store_true',
+                         help = 'check the merge of sharded summaries, dumped and loaded, equals a single pass' )
+    parser.add_argument( '--processes' , default = None, type = int                                        )
+    args = parser.parse_args()
+
+    from .database import log_paths
+    paths = log_paths( args.logs, args.pattern )
+
+    if args.check :
+        summary = summarize_logs( paths )
+        merged  = merge_summaries( summarize_shards( paths, args.processes ) )
+        print "merge of shards %s single pass over %d logs" % ( 'equals' if merged == summary else 'DIFFERS from',
+                                                                len( paths ) )
+    else :
+        summary = merge_summaries( [ summarize_logs( paths ) ] +
+                                   [ ASLogSummary.load( path ) for path in args.merge ] )
+
+    report = summary.report()
+    print "%d logs, %d lines, %s to %s" % ( report[ 'logs' ], report[ 'lines' ],
+                                            report[ 'first_datetime' ], report[ 'last_datetime' ] )
+    for name in ASLogSummary.names :
+        print "    {0:<22} count {count:8d}  mean {mean!s:>14}  p50 {p50!s:>14}  p99 {p99!s:>14}".format(
+            name, **report[ name ] )
+
+    if args.output :
+        summary.dump( args.output )
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,213 @@
+import re
+
+# Online message template mining, in the style of Drain (He et al., ICWS 2017).
+#
+# Messages are split in tokens and routed through a fixed depth tree: first by
+# token count, then by their leading tokens. Each leaf holds a few templates,
+# a message joins the most similar one (positions which differ become
+# wildcards) or starts a new template. Each message is seen once and the tree
+# size is bounded, so mining runs in a single streaming pass.
+#
+#   ' rendering, 12.5% done'                           -> 'rendering, <*> done'
+#   ' opening texture file ./a.exr for reading...'     -> 'opening texture file <*> for reading...'
+#   ' while loading mesh object "a": invalid normal.'  -> 'while loading mesh object <*> invalid normal.'
+
+wildcard = '<*>'
+
+# tokens holding a digit are variables most of the time (counts, sizes, paths)
+re_digit = re.compile( '\d' )
+
+
+class ASLogTemplate( object ) :
+    """A message template, its tokens and how many messages it matched."""
+
+    __slots__ = ( 'id'     ,
+                  'tokens' ,  # list of tokens, variable ones are wildcards
+                  'count'  )
+
+    def __init__( self, id, tokens ) :
+        self.id     = id
+        self.tokens = tokens
+        self.count  = 0
+
+    @property
+    def text( self ) :
+        """Return the template as a string."""
+        return ' '.join( self.tokens )
+
+    def similarity( self, tokens ) :
+        """Return ( equal token ratio, wildcard count ) against the given tokens."""
+        equal     = 0
+        wildcards = 0
+        for token, other in zip( self.tokens, tokens ) :
+            if token == wildcard :
+                wildcards += 1
+            elif token == other :
+                equal += 1
+        return float( equal ) / len( tokens ), wildcards
+
+    def merge( self, tokens ) :
+        """Turn the tokens which differ from the given ones into wildcards."""
+        self.tokens = [ token if token == other else wildcard
+                        for token, other in zip( self.tokens, tokens ) ]
+
+    def __repr__( self ) :
+        return '<ASLogTemplate %d x%d : %s>' % ( self.id, self.count, self.text )
+
+
+class ASLogTemplateMiner( object ) :
+    """Group messages into templates, see `add()`.
+
+    :Example:
+
+    >>> miner = ASLogTemplateMiner()
+    >>> miner.add( ' rendering, 12.5% done' )
+    0
+    >>> miner.add( ' rendering, 13.0% done' )
+    0
+    >>> miner[ 0 ].text, miner[ 0 ].count
+    ('rendering, <*> done', 2)
+
+    `depth` is the tree depth (root and token count levels included),
+    `similarity` the equal token ratio needed to join a template,
+    `max_children` the max children per tree node (extra tokens share a
+    wildcard child) and `max_templates` the max template count, once reached
+    messages join their closest template even below `similarity`.
+    """
+
+    def __init__( self, depth = 4, similarity = 0.5, max_children = 100, max_templates = 2000 ) :
+
+        assert depth >= 3, depth
+
+        self.depth         = depth
+        self.similarity    = similarity
+        self.max_children  = max_children
+        self.max_templates = max_templates
+
+        self.templates     = list()  # template ID -> ASLogTemplate
+        self._tree         = dict()  # token count -> nested token dicts -> leaf list
+        self._overflow     = None    # template of messages routed to a full, empty leaf
+
+    def __len__( self ) :
+        return len( self.templates )
+
+    def __getitem__( self, id ) :
+        return self.templates[ id ]
+
+    def __iter__( self ) :
+        return iter( self.templates )
+
+    @staticmethod
+    def tokenize( message ) :
+        """Return the tokens of the given message, digit holding ones as wildcards."""
+        return [ wildcard if re_digit.search( token ) else token
+                 for token in message.split() ]
+
+    def _leaf( self, tokens, create ) :
+        """Return the template list of the given tokens, None if missing and not `create`."""
+
+        node = self._tree
+        key  = len( tokens )
+
+        for token in tokens[ : self.depth - 2 ] :
+            child = node.get( key )
+            if child is None :
+                if not create :
+                    return None
+                child = node[ key ] = dict()
+            node = child
+
+            key = token
+            if key not in node and len( node ) >= self.max_children :
+                key = wildcard
+
+        leaf = node.get( key )
+        if leaf is None and create :
+            leaf = node[ key ] = list()
+        return leaf
+
+    @staticmethod
+    def _closest( leaf, tokens ) :
+        """Return ( template, similarity ) of the closest template of the leaf."""
+        best     = None
+        best_key = ( -1.0, -1 )
+        for template in leaf :
+            key = template.similarity( tokens ) if tokens else ( 1.0, 0 )
+            if key > best_key :
+                best, best_key = template, key
+        return best, best_key[0]
+
+    def add( self, message ) :
+        """Add the given message and return the ID of its template."""
+
+        tokens = self.tokenize( message )
+        leaf   = self._leaf( tokens, True )
+
+        template, similarity = self._closest( leaf, tokens )
+
+        if template is None or similarity < self.similarity :
+            if len( self.templates ) < self.max_templates :
+                template = ASLogTemplate( len( self.templates ), tokens )
+                self.templates.append( template )
+                leaf.append( template )
+            elif template is None :
+                if self._overflow is None :
+                    self._overflow = ASLogTemplate( len( self.templates ), [ wildcard ] )
+                    self.templates.append( self._overflow )
+                template = self._overflow
+            else :
+                template.merge( tokens )
+        else :
+            template.merge( tokens )
+
+        template.count += 1
+        return template.id
+
+    def match( self, message ) :
+        """Return the ID of the template of the given message without learning it, None if none."""
+
+        tokens = self.tokenize( message )
+        leaf   = self._leaf( tokens, False )
+        if not leaf :
+            return None
+
+        template, similarity = self._closest( leaf, tokens )
+        if similarity < self.similarity :
+            return None
+        return template.id
+
+    def most_common( self, count = None ) :
+        """Return templates sorted by decreasing match count."""
+        templates = sorted( self.templates, key = lambda t : t.count, reverse = True )
+        return templates[ : count ] if count is not None else templates
+
+    def to_dict( self ) :
+        """Return the templates as a json serializable dict."""
+        return { 'templates' : [ { 'id'    : t.id    ,
+                                   'text'  : t.text  ,
+                                   'count' : t.count } for t in self.templates ] }
+
+
+def template_runs( template_ids, indices ) :
+    """Return ( template ID, first, last ) runs of consecutive equal templates.
+
+    `indices` are the line indices to walk (sorted), `first` and `last` are
+    positions in `indices` (both included).
+    """
+
+    runs    = list()
+    first   = 0
+    last_id = None
+
+    for position, index in enumerate( indices ) :
+        template_id = template_ids[ index ]
+        if template_id != last_id :
+            if last_id is not None :
+                runs.append( ( last_id, first, position - 1 ) )
+            first   = position
+            last_id = template_id
+
+    if last_id is not None :
+        runs.append( ( last_id, first, len( indices ) - 1 ) )
+
+    return runs
@@ -0,0 +1,446 @@
+import argparse
+import array
+import json
+import multiprocessing
+import operator
+
+from .log import ASLog
+from .strings import strings
+
+# Texture cache thrash detection.
+#
+# appleseed logs "opening texture file X for reading..." each time its texture
+# cache opens a file, a texture opened again and again while rendering was
+# evicted in between: the cache is too small for the scene.
+#
+#   python -m appleseed_log.textures frame.1001.log frame.1002.log
+#
+# Everything is computed in one pass over the opens, memory only grows with
+# the number of distinct textures (plus a bounded number of time windows):
+# logs are parsed without keeping their lines, opens are recorded as they
+# are parsed.
+
+# message types the thrash detector is fed with
+thrash_types = ( 'opening_texture_file', 'rendering_progress', 'loading_project_file' )
+
+def pair_sums( values ) :
+    """Yield the sums of consecutive value pairs."""
+    for i in xrange( 0, len( values ), 2 ) :
+        yield values[ i ] + ( values[ i + 1 ] if i + 1 < len( values ) else 0 )
+
+################################################################################
+# Reuse distances
+################################################################################
+class ReuseDistances( object ) :
+    """LRU stack distance of each access of a stream of keys.
+
+    The distance of an access is the number of distinct other keys accessed
+    since the previous access of the same key: an LRU cache holding more
+    keys than that would have kept it.
+
+    Each key keeps the stamp of its latest access in a Fenwick tree, stamps
+    are renumbered when the tree is full so memory only depends on the
+    number of distinct keys and each access costs O(log(keys)).
+    """
+
+    def __init__( self ) :
+
+        self._stamps   = dict()  # key -> stamp of its latest access
+        self._clock    = 0       # next stamp
+        self._capacity = 64
+        self._tree     = array.array( 'l', [ 0 ] * ( self._capacity + 1 ) )
+
+        self.histogram = array.array( 'l' )  # distance -> access count
+
+    def __len__( self ) :
+        return len( self._stamps )
+
+    def _add( self, stamp, value ) :
+        tree = self._tree
+        i    = stamp + 1
+        while i <= self._capacity :
+            tree[ i ] += value
+            i += i & -i
+
+    def _prefix( self, stamp ) :
+        """Return how many keys have a stamp <= the given one."""
+        tree  = self._tree
+        i     = stamp + 1
+        count = 0
+        while i > 0 :
+            count += tree[ i ]
+            i -= i & -i
+        return count
+
+    def _renumber( self ) :
+        """Give stamps 0..keys-1 to keys, keeping their order, in a tree with room to grow."""
+
+        keys           = sorted( self._stamps, key = self._stamps.__getitem__ )
+        self._capacity = max( 64, 4 * len( keys ) )
+        self._clock    = len( keys )
+
+        # linear Fenwick build from all ones
+        tree = array.array( 'l', [ 0 ] * ( self._capacity + 1 ) )
+        for i in xrange( 1, self._capacity + 1 ) :
+            if i <= len( keys ) :
+                tree[ i ] += 1
+            parent = i + ( i & -i )
+            if parent <= self._capacity :
+                tree[ parent ] += tree[ i ]
+        self._tree = tree
+
+        for stamp, key in enumerate( keys ) :
+            self._stamps[ key ] = stamp
+
+    def access( self, key ) :
+        """Record an access, return its distance (None for the first access of the key)."""
+
+        if self._clock == self._capacity :
+            self._renumber()
+
+        distance = None
+        stamp    = self._stamps.get( key )
+        if stamp is not None :
+            distance = len( self._stamps ) - self._prefix( stamp )
+            self._add( stamp, -1 )
+
+            histogram = self.histogram
+            if distance >= len( histogram ) :
+                histogram.extend( [ 0 ] * ( distance + 1 - len( histogram ) ) )
+            histogram[ distance ] += 1
+
+        self._stamps[ key ] = self._clock
+        self._add( self._clock, 1 )
+        self._clock += 1
+
+        return distance
+
+    def reset( self ) :
+        """Forget previous accesses, keep the histogram."""
+        self._stamps.clear()
+        self._clock    = 0
+        self._capacity = 64
+        self._tree     = array.array( 'l', [ 0 ] * ( self._capacity + 1 ) )
+
+    def cache_size( self, hit_ratio ) :
+        """Return the smallest LRU size (in keys) avoiding `hit_ratio` of the repeated accesses."""
+        total = sum( self.histogram )
+        if not total :
+            return 0
+        hits = 0
+        for distance, count in enumerate( self.histogram ) :
+            hits += count
+            if hits >= hit_ratio * total :
+                return distance + 1
+        return len( self.histogram )
+
+################################################################################
+# Per texture stats
+################################################################################
+class ASLogTextureStats( object ) :
+    """Open statistics of a texture, bounded whatever its open count."""
+
+    __slots__ = ( 'path'         ,
+                  'opens'        ,
+                  'reopens'      ,  # opens after the first one of a session
+                  'first_time'   ,  # seconds
+                  'last_time'    ,
+                  'interval_sum' ,  # sum of reopen intervals in seconds
+                  'min_interval' ,
+                  'max_interval' ,
+                  'threads'      )  # set of thread ids
+
+    def __init__( self, path ) :
+        self.path         = path
+        self.opens        = 0
+        self.reopens      = 0
+        self.first_time   = None
+        self.last_time    = None
+        self.interval_sum = 0.0
+        self.min_interval = float( 'inf' )
+        self.max_interval = 0.0
+        self.threads      = set()
+
+    @property
+    def mean_interval( self ) :
+        """Return the mean seconds between two opens, None if never reopened."""
+        if not self.reopens :
+            return None
+        return self.interval_sum / self.reopens
+
+    def to_dict( self ) :
+        return { 'path'          : self.path                                   ,
+                 'opens'         : self.opens                                  ,
+                 'reopens'       : self.reopens                                ,
+                 'first_time'    : self.first_time                             ,
+                 'last_time'     : self.last_time                              ,
+                 'mean_interval' : self.mean_interval                          ,
+                 'min_interval'  : self.min_interval if self.reopens else None ,
+                 'max_interval'  : self.max_interval if self.reopens else None ,
+                 'threads'       : sorted( self.threads )                      }
+
+################################################################################
+# Thrash detector
+################################################################################
+class ASLogTextureThrash( object ) :
+    """Detect texture cache thrashing from texture open events.
+
+    :Example:
+
+    >>> thrash = ASLogTextureThrash()
+    >>> as_log = ASLog( 'frame.1001.log', parse = False, keep_lines = False )
+    >>> thrash.subscribe( as_log )
+    >>> as_log.update()
+    >>> thrash.recommended_cache_size
+    48
+    >>> thrash.dump( 'frame.1001.textures.json' )
+
+    `window` is the initial time window (seconds) reopen rates are measured
+    on, windows double when there are more than `max_windows` of them.
+    A window with at least `heavy_rate` reopens per second is heavy.
+    `hit_ratio` is the share of reopens the recommended cache size avoids.
+    """
+
+    def __init__( self, window = 1.0, heavy_rate = 10.0, max_windows = 4096, hit_ratio = 0.95 ) :
+
+        self.window       = window
+        self.heavy_rate   = heavy_rate
+        self.max_windows  = max_windows
+        self.hit_ratio    = hit_ratio
+
+        self.textures     = dict()  # texture -> ASLogTextureStats
+        self._last_opens  = dict()  # texture -> latest open time of the current session
+        self.distances    = ReuseDistances()
+        self.windows      = array.array( 'l' )  # reopen count per window
+        self.opens        = 0
+        self.reopens      = 0
+
+        # rendering span of each session, from its first to its latest progress line
+        self.render_spans = list()  # [ start, end ]
+        self._span        = None    # span of the current session
+
+        self._ranges      = None  # ranges of the subscribed log, for its first line time
+
+    def new_session( self ) :
+        """Start a new render, textures opened before are not reopens anymore."""
+        self.distances.reset()
+        self._last_opens.clear()
+        self._span = None
+
+    def add_progress( self, time ) :
+        """Record a rendering progress line at the given time."""
+        if self._span is None :
+            self._span = [ time, time ]
+            self.render_spans.append( self._span )
+        self._span[ 1 ] = time
+
+    def add_open( self, time, texture, thread_id ) :
+        """Record the opening of the given texture (path or string ID) at the given time."""
+
+        self.opens += 1
+
+        stats = self.textures.get( texture )
+        if stats is None :
+            stats = self.textures[ texture ] = ASLogTextureStats( texture )
+        stats.opens += 1
+        stats.threads.add( thread_id )
+
+        if stats.first_time is None :
+            stats.first_time = time
+
+        self.distances.access( texture )
+
+        last_open = self._last_opens.get( texture )
+        if last_open is not None :
+            interval            = time - last_open
+            stats.reopens      += 1
+            stats.interval_sum += interval
+            stats.min_interval  = min( stats.min_interval, interval )
+            stats.max_interval  = max( stats.max_interval, interval )
+            self.reopens       += 1
+            self._add_to_window( time )
+
+        stats.last_time             = time
+        self._last_opens[ texture ] = time
+
+    def _add_to_window( self, time ) :
+
+        index = int( max( 0.0, time ) / self.window )
+        while index >= self.max_windows :
+            # merge windows two by two
+            windows      = self.windows
+            self.windows = array.array( 'l', pair_sums( windows ) )
+            self.window *= 2
+            index        = int( max( 0.0, time ) / self.window )
+
+        windows = self.windows
+        if index >= len( windows ) :
+            windows.extend( [ 0 ] * ( index + 1 - len( windows ) ) )
+        windows[ index ] += 1
+
+    def subscribe( self, as_log ) :
+        """Record texture opens and progress lines of the given log while it's parsed."""
+        self._ranges = as_log.ranges
+        as_log.subscribe( self.add_line, types = thrash_types )
+
+    def add_line( self, line_data ) :
+        """Record a parsed line of `thrash_types` of the subscribed log."""
+
+        first_datetime = self._ranges[ 'first_datetime' ]
+        time           = ( line_data.timestamp - first_datetime ).total_seconds()
+        line_type      = line_data.msg_type
+        if line_type == 'opening_texture_file' :
+            self.add_open( time, line_data.content( 'texture_path' ), line_data.thread_id )
+        elif line_type == 'rendering_progress' :
+            self.add_progress( time )
+        elif line_type == 'loading_project_file' and line_data.timestamp != first_datetime :
+            self.new_session()
+
+    def add_log( self, as_log ) :
+        """Record texture opens and progress lines of the given parsed log."""
+
+        columns       = as_log.columns
+        texture_code  = columns.code( 'type', 'opening_texture_file' )
+        progress_code = columns.code( 'type', 'rendering_progress'   )
+        project_code  = columns.code( 'type', 'loading_project_file' )
+
+        time      = columns.time
+        thread_id = columns.thread_id
+        path      = columns.path
+
+        for i, type_code in enumerate( columns.type ) :
+            if type_code == texture_code :
+                self.add_open( time[ i ], path[ i ], thread_id[ i ] )
+            elif type_code == progress_code :
+                self.add_progress( time[ i ] )
+            elif type_code == project_code and i :
+                self.new_session()
+
+    @property
+    def recommended_cache_size( self ) :
+        """Return the texture count a LRU cache needs to avoid `hit_ratio` of reopens."""
+        return self.distances.cache_size( self.hit_ratio )
+
+    @property
+    def render_seconds( self ) :
+        """Return the seconds of rendering, summed over the render sessions."""
+        return sum( end - start for start, end in self.render_spans )
+
+    @property
+    def heavy_seconds( self ) :
+        """Return the seconds of rendering spent in heavy reopen windows."""
+
+        seconds = 0.0
+        for index, count in enumerate( self.windows ) :
+            start = index * self.window
+            end   = start + self.window
+            if count >= self.heavy_rate * self.window :
+                for render_start, render_end in self.render_spans :
+                    seconds += max( 0.0, min( end, render_end ) - max( start, render_start ) )
+        return seconds
+
+    @property
+    def heavy_share( self ) :
+        """Return the share (0-1) of rendering time spent in heavy reopen windows."""
+        render_seconds = self.render_seconds
+        if render_seconds <= 0 :
+            return 0.0
+        return self.heavy_seconds / render_seconds
+
+    def ranked( self, count = None ) :
+        """Return texture stats sorted by decreasing reopen count."""
+        textures = sorted( self.textures.itervalues(), key = operator.attrgetter( 'reopens' ), reverse = True )
+        return textures[ : count ] if count is not None else textures
+
+    def to_dict( self, count = 50, texture_size = None ) :
+        """Return the thrash report as a json serializable dict.
+
+        Give the mean `texture_size` in bytes to also get the recommended
+        cache size in bytes.
+        """
+
+        textures = list()
+        for texture in self.ranked( count ) :
+            d = texture.to_dict()
+            if not isinstance( d[ 'path' ], basestring ) :
+                d[ 'path' ] = strings[ d[ 'path' ] ]
+            textures.append( d )
+
+        cache_size = self.recommended_cache_size
+        return { 'opens'                   : self.opens                                          ,
+                 'reopens'                 : self.reopens                                        ,
+                 'distinct_textures'       : len( self.textures )                                ,
+                 'render_seconds'          : self.render_seconds                                 ,
+                 'heavy_seconds'           : self.heavy_seconds                                  ,
+                 'heavy_share'             : self.heavy_share                                    ,
+                 'recommended_cache_size'  : cache_size                                          ,
+                 'recommended_cache_bytes' : cache_size * texture_size if texture_size else None ,
+                 'textures'                : textures                                            }
+
+    def dump( self, path, count = 50, texture_size = None ) :
+        """Write the thrash report as json at the given path."""
+        with open( path, 'w' ) as json_file :
+            json.dump( self.to_dict( count, texture_size ), json_file, indent = 4, sort_keys = True )
+
+################################################################################
+# Logs
+################################################################################
+def texture_report( path, count = 50, texture_size = None ) :
+    """Return the thrash report (dict) of the log at the given path."""
+    thrash = ASLogTextureThrash()
+    as_log = ASLog( path, parse = False, engine = 'split', keep_lines = False, summary = False )
+    thrash.subscribe( as_log )
+    as_log.update()
+    report = thrash.to_dict( count, texture_size )
+    report[ 'log' ] = path
+    return report
+
+def texture_reports( paths, count = 50, texture_size = None, processes = None ) :
+    """Return the thrash reports of the given logs, parsed in parallel."""
+    if len( paths ) < 2 or processes == 1 :
+        return [ texture_report( path, count, texture_size ) for path in paths ]
+
+    pool = multiprocessing.Pool( processes )
+    try :
+        results = [ pool.apply_async( texture_report, ( path, count, texture_size ) ) for path in paths ]
+        return [ result.get() for result in results ]
+    finally :
+        pool.close()
+        pool.join()
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Rank textures reopened by appleseed renders.' )
+    parser.add_argument( 'logs'           , nargs   = '+'                                                )
+    parser.add_argument( '--count'        , default = 20  , type = int                                   )
+    parser.add_argument( '--texture-mb'   , default = None, type = float, help = 'mean texture size'     )
+    parser.add_argument( '--json'         , default = None, help = 'write the reports to this json file' )
+    args = parser.parse_args()
+
+    texture_size = int( args.texture_mb * ( 1 << 20 ) ) if args.texture_mb else None
+    reports      = texture_reports( args.logs, args.count, texture_size )
+
+    for report in reports :
+        print "%s" % report[ 'log' ]
+        print "    opens %d, reopens %d, distinct textures %d" % ( report[ 'opens'             ] ,
+                                                                  report[ 'reopens'           ] ,
+                                                                  report[ 'distinct_textures' ] )
+        print "    %.1f%% of %.1fs of rendering with heavy reopens" % ( report[ 'heavy_share'    ] * 100 ,
+                                                                          report[ 'render_seconds' ]       )
+        print "    recommended cache size : %d textures" % report[ 'recommended_cache_size' ]
+        if report[ 'recommended_cache_bytes' ] :
+            print "                             %.0f MB" % ( report[ 'recommended_cache_bytes' ] / float( 1 << 20 ) )
+        for texture in report[ 'textures' ] :
+            if not texture[ 'reopens' ] :
+                break
+            print "    %8d reopens %8.3fs mean interval %3d threads  %s" % ( texture[ 'reopens'       ] ,
+                                                                              texture[ 'mean_interval' ] ,
+                                                                              len( texture[ 'threads' ] ) ,
+                                                                              texture[ 'path'          ] )
+
+    if args.json :
+        with open( args.json, 'w' ) as json_file :
+            json.dump( reports, json_file, indent = 4, sort_keys = True )
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+
+from .index import raw_timestamp
+from .log import parse_timestamp, read_lines
+
+# Timeline of render phases and threads, exported as Chrome Trace Event JSON
+# (open it in chrome://tracing or https://ui.perfetto.dev).
+#
+# Each render session (starting at "loading project file") is a trace
+# process, sessions of merged logs are followed per source log. Its first track holds the phase spans, the other ones the
+# activity of each log thread: mesh loads and image writes (from their
+# logged milliseconds), tiles (between two progress lines of a thread) and
+# other lines (since the previous line of the thread). Events are written
+# as lines are read so huge logs stream through, short spans of a track
+# are merged so each track holds about `max_spans` spans.
+#
+#   python -m appleseed_log.timeline frame.1001.log frame.1001.trace.json
+
+# ( message start, phase ), a line starting with one of them starts the phase
+phase_starts = ( ( 'loading project file'                  , 'project_loading'   ) ,
+                 ( 'rendering frame'                       , 'scene_preparation' ) ,
+                 ( 'collecting geometry for triangle tree' , 'bvh_build'         ) ,
+                 ( 'building bvh'                          , 'bvh_build'         ) ,
+                 ( 'rendering, '                           , 'rendering'         ) ,
+                 ( 'writing frame to disk'                 , 'image_writing'     ) ,
+                 ( 'deleting assembly tree'                , 'cleanup'           ) )
+
+# message type -> span name of lines logging their own duration in milliseconds
+timed_types = { 'loaded_mesh_file' : 'mesh_load'   ,
+                'wrote_image_file' : 'image_write' }
+
+phases_tid = 0 # trace thread of the phase spans, log threads keep their ID
+
+def line_phase( line_data ) :
+    """Return the phase the given line starts, None if it doesn't start one."""
+    msg = line_data.msg_rest.lstrip()
+    for start, phase in phase_starts :
+        if msg.startswith( start ) :
+            return phase
+    return None
+
+def log_time_range( path, tail_size = 1 << 16 ) :
+    """Return the ( first, last ) `datetime` of a log file, only reading its head and tail."""
+
+    with open( path, 'rb' ) as log_file :
+        head = log_file.read( tail_size )
+        log_file.seek( max( 0, os.path.getsize( path ) - tail_size ) )
+        tail = log_file.read()
+
+    firsts = list( raw_timestamps( head.split( '\n' ) ) )
+    lasts  = list( raw_timestamps( tail.split( '\n' )[ 1: ] ) ) # the first tail line may be cut
+    if not firsts or not lasts :
+        return None
+    return parse_timestamp( firsts[ 0 ] ), parse_timestamp( max( lasts ) )
+
+def raw_timestamps( lines ) :
+    """Yield the raw timestamps of the given lines, skipping lines without one."""
+    for line in lines :
+        raw = raw_timestamp( line )
+        if raw is not None and len( raw ) == 27 :
+            yield raw
+
+
+class ASLogTimeline( object ) :
+    """Streamed Chrome trace of parsed lines.
+
+    Spans of a track starting less than `resolution` seconds after the
+    pending span of that track are merged with it, the merged span keeps
+    the span count per name in its args.
+
+    Lines of an `appleseed_log.merge.ASLogMerge` interleave several logs,
+    each source then has its own sessions (trace processes): a project
+    loaded by one node doesn't end the session of the others.
+
+    :Example:
+
+    >>> with open( 'frame.1001.trace.json', 'w' ) as trace_file :
+    ...     timeline = ASLogTimeline( trace_file, resolution = 0.01 )
+    ...     for line_data in as_log :
+    ...         timeline.add( line_data )
+    ...     timeline.close()
+    >>> timeline.critical_path[ 0 ][ 'dominant_phase' ]
+    'rendering'
+    """
+
+    def __init__( self, output, resolution = 0.0 ) :
+
+        self.output      = output
+        self.resolution  = resolution
+        self.span_count  = 0
+        self.sessions    = list()    # [ { 'project', 'source', 'phases' : [ [ phase, start, end ], ... ], ... } ]
+
+        self._origin     = None      # datetime of the first line, trace times are relative to it
+        self._pid        = 0
+        self._sources    = dict()    # source index (None out of a merge) -> state of its current session
+        self._state      = None      # state of the source of the latest line
+        self._first      = True
+
+        self.output.write( '{"traceEvents":[\n' )
+
+    def _event( self, event ) :
+        if not self._first :
+            self.output.write( ',\n' )
+        self._first = False
+        json.dump( event, self.output, separators = ( ',', ':' ) )
+
+    def _emit( self, state, tid, span ) :
+        name, start, end, names = span
+        args = { 'spans' : names } if sum( names.itervalues() ) > 1 else dict()
+        self._event( { 'name' : name          ,
+                       'cat'  : 'phase' if tid == phases_tid else 'thread' ,
+                       'ph'   : 'X'           ,
+                       'pid'  : state[ 'pid' ],
+                       'tid'  : tid           ,
+                       'ts'   : start * 1e6   ,
+                       'dur'  : max( 0.0, end - start ) * 1e6 ,
+                       'args' : args          } )
+        self.span_count += 1
+
+    def span( self, tid, name, start, end ) :
+        """Add a span to the given track of the current session, in seconds since the first line."""
+        self._span( self._state, tid, name, start, end )
+
+    def _span( self, state, tid, name, start, end ) :
+        pending = state[ 'pending' ].get( tid )
+        if pending is not None and start - pending[ 1 ] < self.resolution :
+            if name != pending[ 0 ] :
+                pending[ 0 ] = 'merged'
+            pending[ 2 ]  = max( pending[ 2 ], end )
+            pending[ 3 ][ name ] = pending[ 3 ].get( name, 0 ) + 1
+            return
+        if pending is not None :
+            self._emit( state, tid, pending )
+        state[ 'pending' ][ tid ] = [ name, start, end, { name : 1 } ]
+
+    def _flush( self, state ) :
+        for tid, pending in sorted( state[ 'pending' ].items() ) :
+            self._emit( state, tid, pending )
+        state[ 'pending' ].clear()
+
+    def _name( self, state, tid, name ) :
+        self._event( { 'name' : 'thread_name', 'ph' : 'M', 'pid' : state[ 'pid' ], 'tid' : tid,
+                       'args' : { 'name' : name } } )
+
+    def _new_session( self, source, source_name, project, time ) :
+        """Start a new session of the given source, return its state."""
+        previous = self._sources.get( source )
+        if previous is not None :
+            self._end_session( previous, time )
+        self._pid += 1
+        session = { 'project' : project, 'source' : source_name, 'phases' : list(), 'thread_ends' : dict() }
+        self.sessions.append( session )
+        state = self._sources[ source ] = { 'session'    : session   ,
+                                            'pid'        : self._pid ,
+                                            'pending'    : dict()    ,  # tid -> [ name, start, end, { name : count } ]
+                                            'last_times' : dict()    ,  # thread id -> time of its latest line
+                                            'last_tiles' : dict()    ,  # thread id -> time of its latest tile end
+                                            'threads'    : set()     }  # threads named in the session
+        name = project or 'session %d' % self._pid
+        if source_name is not None :
+            name = '%s : %s' % ( source_name, name )
+        self._event( { 'name' : 'process_name', 'ph' : 'M', 'pid' : self._pid, 'args' : { 'name' : name } } )
+        self._name( state, phases_tid, 'phases' )
+        return state
+
+    def _end_session( self, state, time ) :
+        phases = state[ 'session' ][ 'phases' ]
+        if phases :
+            phases[ -1 ][ 2 ] = time
+            self._span( state, phases_tid, *phases[ -1 ] )
+        self._flush( state )
+
+    def add( self, line_data ) :
+        """Add the given parsed line (`ASLogLine` or `ASLogMergedLine`), lines must come in time order."""
+
+        if self._origin is None :
+            self._origin = line_data.timestamp
+        time      = ( line_data.timestamp - self._origin ).total_seconds()
+        line_type = line_data.msg_type
+        thread_id = line_data.thread_id
+        source    = getattr( line_data, 'source_index', None )
+
+        state = self._sources.get( source )
+        if line_type == 'loading_project_file' or state is None :
+            state = self._new_session( source, getattr( line_data, 'source', None ) ,
+                                       line_data.content( 'project_file_path' ), time )
+        self._state = state
+
+        session    = state[ 'session'    ]
+        last_times = state[ 'last_times' ]
+        last_tiles = state[ 'last_tiles' ]
+        phases     = session[ 'phases' ]
+        phase      = line_phase( line_data )
+        if phase is not None and ( not phases or phases[ -1 ][ 0 ] != phase ) :
+            if phases :
+                phases[ -1 ][ 2 ] = time
+                self._span( state, phases_tid, *phases[ -1 ] )
+            phases.append( [ phase, time, time ] )
+        current = phases[ -1 ][ 0 ] if phases else 'startup'
+
+        if thread_id not in state[ 'threads' ] :
+            state[ 'threads' ].add( thread_id )
+            self._name( state, thread_id, 'thread %03d' % thread_id )
+
+        if line_type in timed_types :
+            self._span( state, thread_id, timed_types[ line_type ], time - line_data.content( 'milliseconds' ) / 1000.0, time )
+
+        elif line_type == 'rendering_progress' :
+            start = last_tiles.get( thread_id, phases[ -1 ][ 1 ] )
+            self._span( state, thread_id, 'tile', start, time )
+            last_tiles[ thread_id ] = time
+            session[ 'thread_ends' ][ thread_id ] = time
+
+        elif thread_id in last_times :
+            self._span( state, thread_id, current, last_times[ thread_id ], time )
+
+        last_times[ thread_id ] = time
+
+    def close( self ) :
+        """End the current session and the trace, return the critical path."""
+
+        for source, state in sorted( self._sources.items() ) :
+            self._end_session( state, max( state[ 'last_times' ].values() or [ 0.0 ] ) )
+        self.output.write( '\n],"displayTimeUnit":"ms","otherData":' )
+        json.dump( { 'critical_path' : self.critical_path }, self.output )
+        self.output.write( '}\n' )
+        return self.critical_path
+
+    @property
+    def critical_path( self ) :
+        """Return the phase times of each session and the phase dominating wall clock time.
+
+        Phases run one after the other, so the session wall clock time is
+        the sum of the phase times. The rendering phase ends with the last
+        thread to finish its tiles, reported with how long the others idled.
+        """
+
+        paths = list()
+        for session in self.sessions :
+
+            durations = dict()
+            for phase, start, end in session[ 'phases' ] :
+                durations[ phase ] = durations.get( phase, 0.0 ) + end - start
+            total  = sum( durations.values() )
+            ranked = sorted( durations.items(), key = lambda item : -item[ 1 ] )
+
+            path = { 'project'        : session[ 'project' ] ,
+                     'source'         : session[ 'source'  ] ,
+                     'seconds'        : total                ,
+                     'dominant_phase' : ranked[ 0 ][ 0 ] if ranked else None ,
+                     'phases'         : [ { 'phase'   : phase                              ,
+                                            'seconds' : seconds                            ,
+                                            'share'   : seconds / total if total else 0.0  }
+                                          for phase, seconds in ranked ] }
+
+            ends = session[ 'thread_ends' ]
+            if ends :
+                last = max( ends, key = ends.get )
+                path[ 'last_thread' ] = last
+                path[ 'tail_idle_seconds' ] = sum( ends[ last ] - end for end in ends.itervalues() )
+            paths.append( path )
+
+        return paths
+
+def export_trace( lines, path, resolution = 0.0 ) :
+    """Write the Chrome trace of the given parsed lines at `path`, return its critical path."""
+    with open( path, 'w' ) as trace_file :
+        timeline = ASLogTimeline( trace_file, resolution )
+        for line_data in lines :
+            timeline.add( line_data )
+        return timeline.close()
+
+def export_trace_file( log_path, trace_path, max_spans = 10000 ) :
+    """Stream the log at `log_path` to a Chrome trace, return its critical path.
+
+    Each track gets about `max_spans` spans, the merge resolution comes from
+    the log time range read from its head and tail.
+    """
+    time_range = log_time_range( log_path )
+    resolution = 0.0
+    if time_range is not None and max_spans :
+        resolution = ( time_range[ 1 ] - time_range[ 0 ] ).total_seconds() / max_spans
+    return export_trace( read_lines( log_path ), trace_path, resolution )
+
+def main() :
+
+    parser = argparse.ArgumentParser( description = 'Export an appleseed log to a Chrome trace.' )
+    parser.add_argument( 'log'                                                        )
+    parser.add_argument( 'trace'                                                      )
+    parser.add_argument( '--max-spans', default = 10000, type = int ,
+                         help = 'about this many spans per track, 0 to keep every span' )
+    args = parser.parse_args()
+
+    for path in export_trace_file( args.log, args.trace, args.max_spans ) :
+        print "%s : %.1fs, dominated by %s" % ( path[ 'project' ], path[ 'seconds' ], path[ 'dominant_phase' ] )
+        for phase in path[ 'phases' ] :
+            print "    {phase:<20} {seconds:10.3f} s {share:7.1%}".format( **phase )
+        if 'last_thread' in path :
+            print "    last thread %03d, other threads idled %.1fs waiting for it" % (
+                path[ 'last_thread' ], path[ 'tail_idle_seconds' ] )
+
+if __name__ == '__main__' :
+    main()
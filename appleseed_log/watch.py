@@ -0,0 +1,248 @@
+import collections
+import fnmatch
+import os
+import time
+
+from .log import ASLog
+
+# message types and categories a watched log state is made of
+state_types    = ( 'loading_project_file', 'rendering_progress', 'wrote_image_file' )
+state_msg_cats = ( 'error', 'fatal' )
+
+# first bytes of a log compared between polls, the first line timestamp tells rewritten logs apart
+head_size = 64
+
+def read_head( path ) :
+    """Return the first `head_size` bytes of the file at the given path."""
+    with open( path, 'rb' ) as log_file :
+        return log_file.read( head_size )
+
+class ASLogState( object ) :
+    """Published state of a watched log."""
+
+    __slots__ = ( 'path'     ,
+                  'lines'    ,  # read line count
+                  'progress' ,  # rendering progress percentage
+                  'eta'      ,  # estimated remaining seconds, None if unknown
+                  'vm_peak'  ,  # MB, 0 until a line is parsed
+                  'errors'   ,  # latest error/fatal messages
+                  'finished' ,  # True once the image file has been written
+                  'updated'  )  # time.time() of the latest change
+
+    def __init__( self, path ) :
+        self.path     = path
+        self.lines    = 0
+        self.progress = 0.0
+        self.eta      = None
+        self.vm_peak  = 0
+        self.errors   = list()
+        self.finished = False
+        self.updated  = None
+
+    def to_dict( self ) :
+        """Return the state as a json serializable dict."""
+        return dict( ( name, getattr( self, name ) ) for name in self.__slots__ )
+
+    def __repr__( self ) :
+        return '<ASLogState {0.path} {0.progress}% eta={0.eta} vm_peak={0.vm_peak}>'.format( self )
+
+
+class ASLogWatcher( object ) :
+    """Watch a directory of logs being written and publish their states.
+
+    Every poll costs one `stat()` per watched file plus one for the directory
+    (listed again only when its mtime changes). Only grown files are opened,
+    read from their latest parsed offset and closed right after, so no file
+    descriptor is kept open whatever the number of watched logs. Parsed
+    lines aren't kept, states are updated by subscribers while parsing.
+
+    :Example:
+
+    >>> watcher = ASLogWatcher( '/renders/shot_010', pattern = '*.log' )
+    >>> watcher.add_callback( lambda state : sys.stdout.write( '%r\\n' % state ) )
+    >>> for states in watcher.watch( interval = 5.0 ) :
+    ...     if all( s.finished for s in watcher.states.values() ) :
+    ...         break
+    """
+
+    def __init__( self, directory, pattern = '*.log', max_errors = 10 ) :
+
+        self._directory  = directory
+        self._pattern    = pattern
+        self._max_errors = max_errors
+
+        self._dir_mtime  = None
+        self._paths      = list()
+        self._sizes      = dict() # path -> ( size, mtime, inode ) at the latest poll
+        self._heads      = dict() # path -> first bytes of the log
+        self._logs       = dict() # path -> ASLog
+        self._states     = dict() # path -> ASLogState
+        self._errors     = dict() # path -> deque of the latest errors
+        self._progress   = dict() # path -> ( first progress time, first progress percentage )
+        self._callbacks  = list()
+
+    def add_callback( self, callback ) :
+        """Call the given function with every changed `ASLogState`."""
+        self._callbacks.append( callback )
+
+    @property
+    def states( self ) :
+        """Return the current state of every watched log (dict, key is the path)."""
+        return self._states
+
+    def _list( self ) :
+        """Refresh the watched paths if the directory changed."""
+
+        dir_mtime = os.stat( self._directory ).st_mtime
+        if dir_mtime == self._dir_mtime :
+            return
+        self._dir_mtime = dir_mtime
+
+        names       = fnmatch.filter( os.listdir( self._directory ), self._pattern )
+        self._paths = sorted( os.path.join( self._directory, name ) for name in names )
+
+        # forget removed logs
+        for path in set( self._logs ) - set( self._paths ) :
+            self._forget( path )
+
+    def _forget( self, path ) :
+        for d in ( self._sizes, self._heads, self._logs, self._states, self._errors, self._progress ) :
+            d.pop( path, None )
+
+    def poll( self ) :
+        """Check every watched log once, parse grown ones.
+
+        Return the list of changed `ASLogState`.
+        """
+
+        self._list()
+
+        changed = list()
+
+        for path in self._paths :
+
+            try :
+                st = os.stat( path )
+            except OSError : # removed since listed
+                self._forget( path )
+                continue
+
+            size_mtime = ( st.st_size, st.st_mtime, st.st_ino )
+            if self._sizes.get( path ) == size_mtime :
+                continue
+
+            previous = self._sizes.get( path )
+            self._sizes[ path ] = size_mtime
+
+            # new or rewritten log, parse it from scratch
+            if path not in self._logs or self._rewritten( path, previous, size_mtime ) :
+                self._forget( path )
+                self._sizes[  path ] = size_mtime
+                self._heads[  path ] = read_head( path )
+                self._states[ path ] = ASLogState( path )
+                self._errors[ path ] = collections.deque( maxlen = self._max_errors )
+                self._logs[   path ] = as_log = ASLog( path, follow = True, parse = False, keep_lines = False ,
+                                                       summary = False                                      )
+                as_log.subscribe( lambda line_data, path = path : self._add_line( path, line_data ) ,
+                                  state_types, state_msg_cats                                       )
+                as_log.update()
+            else :
+                as_log = self._logs[ path ]
+                count  = as_log.line_count
+                as_log.update()
+                if as_log.line_count == count :
+                    continue
+
+            changed.append( self._refresh_state( path ) )
+
+        for state in changed :
+            for callback in self._callbacks :
+                callback( state )
+
+        return changed
+
+    def _rewritten( self, path, previous, size_mtime ) :
+        """Return if the given log was rewritten rather than appended to since the latest poll.
+
+        A replaced file has another inode, a log changed without growing was
+        rewritten, and a log rewritten in place to a larger size starts with
+        other bytes (the first line timestamp).
+        """
+        size, mtime, inode = size_mtime
+        if inode != previous[2] or size <= previous[0] :
+            return True
+
+        head                = self._heads.get( path, '' )
+        self._heads[ path ] = read_head( path )
+        return not self._heads[ path ].startswith( head )
+
+    def _add_line( self, path, line ) :
+        """Update the state of the given log with a parsed line of `state_types` or `state_msg_cats`."""
+
+        state     = self._states[ path ]
+        line_type = line.msg_type
+
+        # a new render session appended to the same log
+        if line_type == 'loading_project_file' :
+            state.progress = 0.0
+            state.eta      = None
+            state.finished = False
+            self._progress.pop( path, None )
+
+        elif line_type == 'rendering_progress' :
+            percentage = line.content( 'percentage' )
+            if percentage > state.progress :
+                state.progress = percentage
+                if path not in self._progress :
+                    self._progress[ path ] = ( line.timestamp, percentage )
+                else :
+                    state.eta = self._eta( self._progress[ path ], line.timestamp, percentage )
+
+        elif line_type == 'wrote_image_file' :
+            state.finished = True
+            state.eta      = 0.0
+
+        if line.msg_cat in state_msg_cats :
+            self._errors[ path ].append( line.msg_rest.strip() )
+
+    def _refresh_state( self, path ) :
+        """Update the state of the given log once its new lines are parsed."""
+
+        as_log = self._logs[   path ]
+        state  = self._states[ path ]
+
+        state.lines   = as_log.line_count
+        state.vm_peak = max( 0, as_log.ranges[ 'vm' ][1] )  # the range starts at -9999999
+        state.errors  = list( self._errors[ path ] )
+        state.updated = time.time()
+
+        return state
+
+    @staticmethod
+    def _eta( first, timestamp, percentage ) :
+        """Return remaining seconds from the progress rate since the first progress line."""
+        first_timestamp, first_percentage = first
+        elapsed = ( timestamp - first_timestamp ).total_seconds()
+        done    = percentage - first_percentage
+        if done <= 0.0 or elapsed <= 0.0 :
+            return None
+        return ( 100.0 - percentage ) * elapsed / done
+
+    def watch( self, interval = 2.0, max_polls = None ) :
+        """Poll forever (or `max_polls` times) and yield lists of changed states."""
+
+        polls = 0
+        while max_polls is None or polls < max_polls :
+            start = time.time()
+
+            changed = self.poll()
+            if changed :
+                yield changed
+
+            polls += 1
+            time.sleep( max( 0.0, interval - ( time.time() - start ) ) )
+
+    def run( self, interval = 2.0, max_polls = None ) :
+        """Poll forever (or `max_polls` times), changes are sent to callbacks."""
+        for _ in self.watch( interval, max_polls ) :
+            pass
@@ -83,6 +83,9 @@ class Ui_MainWindow(object):
         self.msg_cat_cb = QtGui.QCheckBox(self.log_tab)
         self.msg_cat_cb.setObjectName("msg_cat_cb")
         self.horizontalLayout_4.addWidget(self.msg_cat_cb)
+        self.collapse_cb = QtGui.QCheckBox(self.log_tab)
+        self.collapse_cb.setObjectName("collapse_cb")
+        self.horizontalLayout_4.addWidget(self.collapse_cb)
         spacerItem1 = QtGui.QSpacerItem(40, 20, QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Minimum)
         self.horizontalLayout_4.addItem(spacerItem1)
         self.formLayout.setLayout(1, QtGui.QFormLayout.FieldRole, self.horizontalLayout_4)
@@ -242,6 +245,7 @@ class Ui_MainWindow(object):
         self.thread_id_cb.setText(QtGui.QApplication.translate("MainWindow", "Thead ID", None, QtGui.QApplication.UnicodeUTF8))
         self.vm_cb.setText(QtGui.QApplication.translate("MainWindow", "Virtual Memory", None, QtGui.QApplication.UnicodeUTF8))
         self.msg_cat_cb.setText(QtGui.QApplication.translate("MainWindow", "Message category", None, QtGui.QApplication.UnicodeUTF8))
+        self.collapse_cb.setText(QtGui.QApplication.translate("MainWindow", "Collapse repeats", None, QtGui.QApplication.UnicodeUTF8))
         self.filter_label.setText(QtGui.QApplication.translate("MainWindow", "Filter", None, QtGui.QApplication.UnicodeUTF8))
         self.clear_filter_button.setText(QtGui.QApplication.translate("MainWindow", "Clear", None, QtGui.QApplication.UnicodeUTF8))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.log_tab), QtGui.QApplication.translate("MainWindow", "Log", None, QtGui.QApplication.UnicodeUTF8))
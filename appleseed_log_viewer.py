@@ -0,0 +1,934 @@
+import datetime
+import functools
+import os.path
+import sys
+import time
+#from PyQt4 import uic, QtGui, QtCore
+from PySide import QtUiTools, QtGui, QtCore
+
+from appleseed_log import ASLog, datetime_str_format
+from appleseed_log.graph import ASLogGraphData
+from appleseed_log.query import QuerySyntaxError, TextQuery, compile_query
+import appleseed_log_parser_ui
+
+#http://thomas-cokelaer.info/tutorials/sphinx/docstring_python.html
+
+# seconds without change after which a followed log is complete, its last line parsed even without end of line
+live_settled_seconds = 2.0
+
+#class ASLogParserUI( QtGui.QMainWindow ) :
+class ASLogParserUI( QtGui.QMainWindow, appleseed_log_parser_ui.Ui_MainWindow ) :
+    def __init__( self     ,
+                  *args    ,
+                  **kwargs ) :
+        super( ASLogParserUI, self ).__init__( *args, **kwargs )
+
+        # recent_log_files_listWidget.as_log_file_path
+        # filtered_log_listWidget.as_line_data
+
+        # Icons
+        self._show_icons     = True
+        script_dir           = os.path.dirname( __file__ )
+        icon_dir             = os.path.join( script_dir, 'icons' )
+        texture_icon_path    = os.path.join( icon_dir, 'appleseed-texture-black-icon.svg'    )
+        mesh_icon_path       = os.path.join( icon_dir, 'appleseed-mesh-black-icon.svg'       )
+        bbox_icon_path       = os.path.join( icon_dir, 'appleseed-scene-bounding-box-icon'   )
+        diameter_icon_path   = os.path.join( icon_dir, 'appleseed-scene-diameter-icon'       )
+        progress_icon_path   = os.path.join( icon_dir, 'appleseed-progress-black-icon.svg'   )
+        resolution_icon_path = os.path.join( icon_dir, 'appleseed-resolution-black-icon.svg' )
+        tile_icon_path       = os.path.join( icon_dir, 'appleseed-tile-black-icon.svg'       )
+        empty_icon_path      = os.path.join( icon_dir, 'appleseed-empty-icon.svg'            )
+        self.icons           = dict()
+        self.icons[ 'progress'   ] = QtGui.QIcon( progress_icon_path   )
+        self.icons[ 'texture'    ] = QtGui.QIcon( texture_icon_path    )
+        self.icons[ 'mesh'       ] = QtGui.QIcon( mesh_icon_path       )
+        self.icons[ 'bbox'       ] = QtGui.QIcon( bbox_icon_path       )
+        self.icons[ 'diameter'   ] = QtGui.QIcon( diameter_icon_path   )
+        self.icons[ 'resolution' ] = QtGui.QIcon( resolution_icon_path )
+        self.icons[ 'tile'       ] = QtGui.QIcon( tile_icon_path       )
+        self.icons[ 'empty'      ] = QtGui.QIcon( empty_icon_path      )
+        self.icons[ 'open'       ] = QtGui.QIcon.fromTheme( 'document-open' )
+        self.icons[ 'copy'       ] = QtGui.QIcon.fromTheme( 'edit-copy'     )
+        self.icons[ 'remove'     ] = QtGui.QIcon.fromTheme( 'list-remove'   )
+
+        self._old_dir          = QtCore.QDir.homePath() # for file dialog "open log file"
+        self._current_log      = None
+        #self._current_log_id   = None
+        self._log_datas        = dict() # a dict of ASLog, key is the log file path
+        self._graph_datas      = dict() # a dict of ASLogGraphData, key is the log file path
+        self._recent_log_order = list() # store the order of rencent log files
+        self._log_levels       = set( [ 'info', 'warning', 'error', 'fatal' ] )
+        self._log_prefixes     = set( [ 'timestamp', 'thread_id', 'vm', 'msg_cat' ] )
+        self._filter_query     = None # compiled query of the filter line edit
+        self._collapse         = False # show one row per run of lines sharing a template
+        self._expanded_runs    = set() # ( log path, first line number ) of expanded runs
+
+        #uic.loadUi( 'appleseed_log_parser.ui', self )
+        self.setupUi(self)
+
+        self.recent_log_files_listWidget.clicked.connect( self.cb_recent_log_files_changed )
+        self.recent_log_files_listWidget.customContextMenuRequested.connect( self.cb_recent_log_view_menu )
+
+        self.all_cb.clicked.connect(     functools.partial( self.cb_log_level_changed, 'ALL'     ) )
+        self.info_cb.clicked.connect(    functools.partial( self.cb_log_level_changed, 'info'    ) )
+        self.warning_cb.clicked.connect( functools.partial( self.cb_log_level_changed, 'warning' ) )
+        self.error_cb.clicked.connect(   functools.partial( self.cb_log_level_changed, 'error'   ) )
+        self.fatal_cb.clicked.connect(   functools.partial( self.cb_log_level_changed, 'fatal'   ) )
+
+        self.timestamp_cb.clicked.connect( functools.partial( self.cb_log_prefix_changed, 'timestamp' ) )
+        self.thread_id_cb.clicked.connect( functools.partial( self.cb_log_prefix_changed, 'thread_id' ) )
+        self.vm_cb.clicked.connect(        functools.partial( self.cb_log_prefix_changed, 'vm'        ) )
+        self.msg_cat_cb.clicked.connect(   functools.partial( self.cb_log_prefix_changed, 'msg_cat'  ) )
+
+        self.filter_lineEdit.returnPressed.connect( self.cb_filter_changed )
+        self.clear_filter_button.clicked.connect( self.cb_filter_cleared )
+
+        self.filtered_log_listWidget.customContextMenuRequested.connect( self.cb_filtered_log_view_menu )
+
+        # Graph
+        self.graph_widget = ASLogGraphWidget( self.graph_tab )
+        graph_layout      = QtGui.QVBoxLayout( self.graph_tab )
+        graph_layout.setContentsMargins( 0, 0, 0, 0 )
+        graph_layout.addWidget( self.graph_widget )
+        self.graph_widget.line_clicked.connect( self.cb_graph_line_clicked )
+
+        # Logs still being written are parsed again regularly
+        self._live_timer = QtCore.QTimer( self )
+        self._live_timer.timeout.connect( self.cb_live_update )
+        self._live_timer.start( 2000 )
+
+        #self.frame_setting_resolution_label.setPixmap( self.icons[ 'resolution' ].pixmap( 16, 16 ) )
+        #self.frame_setting_tile_size_label.setPixmap( self.icons[ 'tile' ].pixmap( 16, 16 ) )
+
+        self.refresh_log_level_cb()
+        self.refresh_log_prefix_cb()
+        self.refresh_options_tab()
+
+    def on_icon_cb_clicked( self, checked = None ) :
+        if checked is None: return
+
+        self._show_icons = checked
+
+        self.refresh_filtered_log_view()
+
+    def on_collapse_cb_clicked( self, checked = None ) :
+        if checked is None: return
+
+        self._collapse = checked
+
+        self.refresh_filtered_log_view()
+
+    def on_action_Open_log_file_triggered( self, checked = None ) :
+        if checked is None: return
+
+        file_path = str( QtGui.QFileDialog.getOpenFileName( self            ,
+                                                            'Open log file' ,
+                                                            self._old_dir   ) )
+        if file_path :
+            self._old_dir = os.path.dirname( file_path )
+
+            self.change_current_log_file( file_path )
+
+    def on_action_Quit_triggered( self, checked = None ) :
+        """Close the app."""
+        if checked is None: return
+        self.close()
+
+    def cb_recent_log_files_changed( self ) :
+
+        selected_item = self.recent_log_files_listWidget.currentItem()
+        self.change_current_log_file( selected_item.as_log_file_path )
+
+    def change_current_log_file( self, file_path ) :
+        self._current_log = file_path
+
+        # if we don't have the log stored yet, we parse it.
+        if not file_path in self._log_datas :
+            # raw lines are only read back to be copied, keep them compressed
+            self._log_datas[ file_path ] = ASLog( file_path, follow = True, store = 'zlib' )
+            self.update_log( file_path )
+            self._graph_datas[ file_path ] = ASLogGraphData( self._log_datas[ file_path ] )
+            self._recent_log_order.append( file_path )
+
+        self.graph_widget.set_data( self._graph_datas[ file_path ] )
+        self.refresh_filtered_log_view()
+        self.refresh_options_tab()
+        self.refresh_recent_log_files_listWidget()
+
+    def remove_log_entry( self, log_file_path ) :
+        """Remove the given recent log entry."""
+
+        del self._log_datas[ log_file_path ]
+        del self._graph_datas[ log_file_path ]
+        self._recent_log_order.remove( log_file_path )
+
+        if log_file_path == self._current_log :
+            self.graph_widget.set_data( None )
+
+        self.refresh_recent_log_files_listWidget()
+
+    def refresh_recent_log_files_listWidget( self ) :
+        """Refresh the recent listWidget."""
+
+        self.recent_log_files_listWidget.clear()
+
+        for log_file_path in self._recent_log_order :
+            # TODO: put the label creation in a separate function
+            log_file_name = os.path.basename( log_file_path )
+            log_dir_name  = os.path.dirname( log_file_path )
+            label         = '%s (in %s)' % ( log_file_name, log_dir_name )
+            current_item  = QtGui.QListWidgetItem( label )
+            current_item.as_log_file_path = log_file_path
+            self.recent_log_files_listWidget.addItem( current_item )
+            if log_file_path == self._current_log :
+                self.recent_log_files_listWidget.setCurrentItem( current_item )
+
+    def refresh_filtered_log_view( self ) :
+
+        self.filtered_log_listWidget.clear()
+
+        current_log_data = self._log_datas[ self._current_log ]
+
+        # get ranges we need
+        vm_min, vm_max = current_log_data.ranges[ 'vm' ]
+        vm_max_str_len = len(str(vm_max))
+
+        #levels   = list( self._log_levels )
+        #prefixes = list( self._log_prefixes )
+
+        lines = current_log_data.lines
+        if self._filter_query is not None :
+            indices = current_log_data.query( self._filter_query )
+        else :
+            indices = xrange( len( lines ) )
+
+        # Skip unwanted levels
+        indices = [ i for i in indices if lines[ i ].msg_cat in self._log_levels ]
+
+        if not self._collapse :
+            for i in indices :
+                self.filtered_log_listWidget.addItem( self.line_item( lines[ i ], vm_max_str_len ) )
+        else :
+            templates = current_log_data.templates
+
+            for template_id, first, last in current_log_data.template_runs( indices ) :
+
+                first_line_data = lines[ indices[ first ] ]
+
+                if first == last :
+                    self.filtered_log_listWidget.addItem( self.line_item( first_line_data, vm_max_str_len ) )
+                    continue
+
+                # runs remember the number of their first line, to be expanded or collapsed back
+                if ( self._current_log, first_line_data.number ) in self._expanded_runs :
+                    for i in indices[ first : last + 1 ] :
+                        current_item = self.line_item( lines[ i ], vm_max_str_len )
+                        current_item.as_run = ( first_line_data.number, last - first + 1, True )
+                        self.filtered_log_listWidget.addItem( current_item )
+                else :
+                    current_item = self.line_item( first_line_data, vm_max_str_len )
+                    current_item.setText( '[%s lines] %s' % ( last - first + 1                 ,
+                                                              templates[ template_id ].text ) )
+                    current_item.as_run = ( first_line_data.number, last - first + 1, False )
+                    self.filtered_log_listWidget.addItem( current_item )
+
+        self.filtered_log_listWidget.setIconSize( QtCore.QSize(13, 13) )
+
+    def line_item( self, line_data, vm_max_str_len ) :
+        """Return the list widget item showing the given line."""
+
+        ####################################################################
+        # Generate the log line
+        ####################################################################
+        line = str()
+        if 'timestamp' in self._log_prefixes :
+            line  = '%s '    % line_data.timestamp.strftime( datetime_str_format )
+
+        if 'thread_id' in self._log_prefixes :
+            line += '<%s> '  % str( line_data.thread_id ).zfill( 3 )
+
+        if 'vm' in self._log_prefixes :
+            vm_str = str( line_data.vm )
+            line += ' ' * ( vm_max_str_len - len( vm_str ) )
+            line += '%s MB ' % vm_str
+
+        if 'msg_cat' in self._log_prefixes :
+            line += '%s'     % line_data.msg_cat
+            missing_spaces = 8 - len( line_data.msg_cat )
+            line += ' ' * missing_spaces
+
+        if self._log_prefixes :
+            line += '|'
+            line += line_data.msg_rest
+        else :
+            # remove the first char (a space)
+            line += line_data.msg_rest[1:]
+
+        current_item = QtGui.QListWidgetItem( line )
+        current_item.as_line_data = line_data
+
+        ####################################################################
+        # Find the accurate icon
+        ####################################################################
+        if self._show_icons :
+            icon = None
+            line_type = line_data.msg_type
+            if line_type in [ 'loaded_mesh_file', 'while_loading_mesh_object' ] :
+                icon = self.icons[ 'mesh'     ]
+            elif line_type == 'scene_bounding_box'   :
+                icon = self.icons[ 'bbox'     ]
+            elif line_type == 'scene_diameter'   :
+                icon = self.icons[ 'diameter' ]
+            elif line_type == 'rendering_progress'   :
+                icon = self.icons[ 'progress' ]
+            elif line_type == 'opening_texture_file' :
+                icon = self.icons[ 'texture'  ]
+            else :
+                icon = self.icons[ 'empty'    ]
+
+            if icon :
+                current_item.setIcon( icon )
+
+        return current_item
+
+    def refresh_options_tab( self ) :
+
+        options = dict()
+        if self._current_log in self._log_datas :
+            current_log_data = self._log_datas[ self._current_log ]
+            options          = current_log_data.render_options
+
+        ########################################################################
+        # Frame Setting
+        ########################################################################
+        frame_setting_options = dict()
+        if 'frame_settings' in options :
+            frame_setting_options = options[ 'frame_settings' ]
+
+        label_str = 'Not found'
+        if 'resolution' in frame_setting_options :
+            x, y = frame_setting_options[ 'resolution' ]
+            label_str = '%s x %s' % ( y, x )
+        self.frame_setting_resolution_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'tile_size' in frame_setting_options :
+            x, y = frame_setting_options[ 'tile_size' ]
+            label_str = '%s x %s' % ( y, x )
+        self.frame_setting_tile_size_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'pixel_format' in frame_setting_options :
+            label_str = str( frame_setting_options[ 'pixel_format' ] )
+        self.frame_setting_pixel_format_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'filter' in frame_setting_options :
+            label_str = str( frame_setting_options[ 'filter' ] )
+        self.frame_setting_filter_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'filter_size' in frame_setting_options :
+            label_str = str( frame_setting_options[ 'filter_size' ] )
+        self.frame_setting_filter_size_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'color_space' in frame_setting_options :
+            label_str = str( frame_setting_options[ 'color_space' ] )
+        self.frame_setting_color_space_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'premult_alpha' in frame_setting_options :
+            label_str = 'on' if frame_setting_options[ 'premult_alpha' ] else 'off'
+        self.frame_setting_premult_alpha_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'clamping' in frame_setting_options :
+            label_str = 'on' if frame_setting_options[ 'clamping' ] else 'off'
+        self.frame_setting_clamping_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'gamma_correction' in frame_setting_options :
+            label_str = str( frame_setting_options[ 'gamma_correction' ] )
+        self.frame_setting_gamma_correction_value_label.setText( label_str )
+
+        label_str = 'Not found'
+        if 'crop_window' in frame_setting_options :
+            label_str = '%s x %s - %s x %s' % frame_setting_options[ 'crop_window' ]
+        self.frame_setting_crop_window_value_label.setText( label_str )
+
+
+    def refresh_log_level_cb( self ) :
+
+        state = QtCore.Qt.Checked if 'info' in self._log_levels else QtCore.Qt.Unchecked
+        if state != self.info_cb.checkState() :
+            self.info_cb.setCheckState( state )
+
+        state = QtCore.Qt.Checked if 'warning' in self._log_levels else QtCore.Qt.Unchecked
+        if state != self.warning_cb.checkState() :
+            self.warning_cb.setCheckState( state )
+
+        state = QtCore.Qt.Checked if 'error' in self._log_levels else QtCore.Qt.Unchecked
+        if state != self.error_cb.checkState() :
+            self.error_cb.setCheckState( state )
+
+        state = QtCore.Qt.Checked if 'fatal' in self._log_levels else QtCore.Qt.Unchecked
+        if state != self.fatal_cb.checkState() :
+            self.fatal_cb.setCheckState( state )
+
+        all_cb_state = self.all_cb.checkState()
+        if self._log_levels == set( [ 'info', 'warning', 'error', 'fatal' ] ) :
+            if all_cb_state != QtCore.Qt.Checked :
+                self.all_cb.setCheckState( QtCore.Qt.Checked )
+        elif len( self._log_levels ) :
+            if all_cb_state != QtCore.Qt.PartiallyChecked :
+                self.all_cb.setCheckState( QtCore.Qt.PartiallyChecked )
+        elif all_cb_state != QtCore.Qt.Unchecked :
+            self.all_cb.setCheckState( QtCore.Qt.Unchecked )
+
+    def refresh_log_prefix_cb( self ) :
+
+        state = QtCore.Qt.Checked if self._show_icons else QtCore.Qt.Unchecked
+        if state != self.icon_cb.checkState() :
+            self.icon_cb.setCheckState( state )
+
+        state = QtCore.Qt.Checked if 'timestamp' in self._log_prefixes else QtCore.Qt.Unchecked
+        if state != self.timestamp_cb.checkState() :
+            self.timestamp_cb.setCheckState( state )
+
+        state = QtCore.Qt.Checked if 'thread_id' in self._log_prefixes else QtCore.Qt.Unchecked
+        if state != self.thread_id_cb.checkState() :
+            self.thread_id_cb.setCheckState( state )
+
+        state = QtCore.Qt.Checked if 'vm' in self._log_prefixes else QtCore.Qt.Unchecked
+        if state != self.vm_cb.checkState() :
+            self.vm_cb.setCheckState( state )
+
+        state = QtCore.Qt.Checked if 'msg_cat' in self._log_prefixes else QtCore.Qt.Unchecked
+        if state != self.msg_cat_cb.checkState() :
+            self.msg_cat_cb.setCheckState( state )
+
+        state = QtCore.Qt.Checked if self._collapse else QtCore.Qt.Unchecked
+        if state != self.collapse_cb.checkState() :
+            self.collapse_cb.setCheckState( state )
+
+    def cb_filtered_log_view_menu( self, pt ) :
+        """Generate the menu for the log view."""
+
+        def short_label( text ) :
+            """Used to shorten the action label complement."""
+            if len( text ) > 30 :
+                return '"%s..."' % text[:27]
+            else :
+                return '"%s"' % text
+
+        # Get selection
+        selected_items = self.filtered_log_listWidget.selectedItems()
+
+        menu = QtGui.QMenu( self )
+
+        if len( selected_items ) == 1 :
+
+            selected_item = selected_items[0]
+            line_data = selected_item.as_line_data
+
+            # Expand/collapse a run of lines sharing a template
+            if hasattr( selected_item, 'as_run' ) :
+                run_number, run_count, expanded = selected_item.as_run
+                label = 'Collapse %s lines' % run_count if expanded else 'Expand %s lines' % run_count
+                act = QtGui.QAction( label , menu )
+                act.triggered.connect( functools.partial( self.cb_toggle_run, run_number ) )
+                menu.addAction( act )
+                menu.addSeparator()
+
+            # Copy visible line
+            act = QtGui.QAction( self.icons[ 'copy' ], 'Copy' , menu )
+            act.triggered.connect( functools.partial( self.cb_copy, selected_item.text() ) )
+            menu.addAction( act )
+
+            # Copy whole line (only if user has changed the line view )
+            if self._log_levels != set( [ 'info', 'warning', 'error', 'fatal' ] ) or \
+               self._log_prefixes != set( [ 'timestamp', 'thread_id', 'vm', 'msg_cat' ] ) :
+                act = QtGui.QAction( self.icons[ 'copy' ], 'Copy whole line' , menu )
+                line_text = self._log_datas[ self._current_log ].line_text( line_data )
+                act.triggered.connect( functools.partial( self.cb_copy, line_text ) )
+                menu.addAction( act )
+
+            if line_data.msg_type == 'loading_project_file' :
+                project_file_path = line_data.content( 'project_file_path' )
+                label = 'Copy project file path: %s' % short_label( project_file_path )
+                act = QtGui.QAction( self.icons[ 'copy' ] ,
+                                     label                ,
+                                     menu                 )
+                act.triggered.connect( functools.partial( self.cb_copy      ,
+                                                          project_file_path ) )
+                menu.addAction( act )
+
+            elif line_data.msg_type == 'opening_texture_file' :
+                texture_path = line_data.content( 'texture_path' )
+                label = 'Copy texture file path: %s' % short_label( texture_path )
+                act = QtGui.QAction( self.icons[ 'copy' ] ,
+                                     label                ,
+                                     menu                 )
+                act.triggered.connect( functools.partial( self.cb_copy ,
+                                                          texture_path ) )
+                menu.addAction( act )
+
+            elif line_data.msg_type == 'wrote_image_file' :
+                image_path = line_data.content( 'image_path' )
+                label = 'Copy image file path: %s' % short_label( image_path )
+                act = QtGui.QAction( self.icons[ 'copy' ] ,
+                                     label                ,
+                                     menu                 )
+                act.triggered.connect( functools.partial( self.cb_copy ,
+                                                          image_path   ) )
+                menu.addAction( act )
+
+            elif line_data.msg_type == 'loaded_mesh_file' :
+                mesh_path = line_data.content( 'mesh_path' )
+                label = 'Copy image file path: %s' % short_label( mesh_path )
+                act = QtGui.QAction( self.icons[ 'copy' ] ,
+                                     label                ,
+                                     menu                 )
+                act.triggered.connect( functools.partial( self.cb_copy ,
+                                                          mesh_path    ) )
+                menu.addAction( act )
+
+
+        elif len( selected_items ) > 1 :
+
+            raw_text = str() # The text that will be put in the clipboard
+
+            for selected_item in selected_items :
+                raw_text += '%s\n' % selected_item.text()
+
+            act = QtGui.QAction( self.icons[ 'copy' ], 'Copy' , menu )
+            act.triggered.connect( functools.partial( self.cb_copy, raw_text ) )
+            menu.addAction( act )
+
+            # Copy whole lines
+            if self._log_levels != set( [ 'info', 'warning', 'error', 'fatal' ] ) or \
+               self._log_prefixes != set( [ 'timestamp', 'thread_id', 'vm', 'msg_cat' ] ) :
+
+                raw_str = str()
+                as_log  = self._log_datas[ self._current_log ]
+                for selected_item in selected_items :
+                    line_data = selected_item.as_line_data
+                    raw_str += '%s\n' % as_log.line_text( line_data )
+
+                act = QtGui.QAction( self.icons[ 'copy' ], 'Copy whole lines' , menu )
+                act.triggered.connect( functools.partial( self.cb_copy, raw_str ) )
+                menu.addAction( act )
+
+        if self._current_log in self._log_datas :
+            menu.addSeparator()
+            act = QtGui.QAction( 'Jump to time...' , menu )
+            act.triggered.connect( self.cb_jump_to_time )
+            menu.addAction( act )
+
+        menu.exec_( self.filtered_log_listWidget.mapToGlobal( pt ) )
+
+    def cb_recent_log_view_menu( self, pt ) :
+        """Generate the context menu for the recent log file listWidget."""
+
+        # Get selection
+        selected_items = self.recent_log_files_listWidget.selectedItems()
+
+        menu = QtGui.QMenu( self )
+
+        if len( selected_items ) == 1 :
+
+            selected_item = selected_items[0]
+            log_file_path = selected_item.as_log_file_path
+
+            # Copy log file path
+            act = QtGui.QAction( self.icons[ 'copy' ], 'Copy file path' , menu )
+            act.triggered.connect( functools.partial( self.cb_copy, log_file_path ) )
+            menu.addAction( act )
+
+            # Copy log folder path
+            log_dir_path = os.path.dirname( log_file_path )
+            act = QtGui.QAction( self.icons[ 'copy' ], 'Copy folder path' , menu )
+            act.triggered.connect( functools.partial( self.cb_copy, log_dir_path ) )
+            menu.addAction( act )
+
+            # Open in folder path
+            log_dir_path = os.path.dirname( log_file_path )
+            act = QtGui.QAction( self.icons[ 'open' ], 'Open log folder' , menu )
+            act.triggered.connect( functools.partial( self.cb_dir_open, log_dir_path ) )
+            menu.addAction( act )
+
+            # Remove entry
+            act = QtGui.QAction( self.icons[ 'remove' ], 'Remove log entry' , menu )
+            act.triggered.connect( functools.partial( self.remove_log_entry, log_file_path ) )
+            menu.addAction( act )
+
+        menu.exec_( self.recent_log_files_listWidget.mapToGlobal( pt ) )
+
+    def cb_log_level_changed( self, *args ) :
+        log_type = args[0]
+        state    = args[1]
+
+        if log_type == "ALL" :
+            if state :
+                self._log_levels = set( [ 'info', 'warning', 'error', 'fatal' ] )
+            else :
+                self._log_levels = set()
+        else :
+            if state :
+                self._log_levels.add( log_type )
+            else :
+                self._log_levels.remove( log_type )
+
+        self.refresh_log_level_cb()
+        self.refresh_filtered_log_view()
+
+    def cb_filter_changed( self ) :
+        """Compile the filter line edit text and refresh the log view.
+
+        Text which is not a valid query is searched as is in messages.
+        """
+
+        text = self.filter_lineEdit.text().strip()
+
+        if not text :
+            self._filter_query = None
+            self.filter_lineEdit.setToolTip( '' )
+        else :
+            try :
+                self._filter_query = compile_query( text )
+                self.filter_lineEdit.setToolTip( '' )
+            except QuerySyntaxError as e :
+                self._filter_query = TextQuery( text )
+                self.filter_lineEdit.setToolTip( 'Searching text, not a query : %s' % e )
+
+        if self._current_log in self._log_datas :
+            self.refresh_filtered_log_view()
+
+    def cb_filter_cleared( self ) :
+        self.filter_lineEdit.clear()
+        self.cb_filter_changed()
+
+    def cb_log_prefix_changed( self, *args ) :
+        prefix = args[0]
+        state  = args[1]
+
+        if state :
+            self._log_prefixes.add( prefix )
+        else :
+            self._log_prefixes.remove( prefix )
+
+        self.refresh_filtered_log_view()
+
+    def cb_jump_to_time( self, *args ) :
+        """Ask a time and select the first visible line at or after it."""
+
+        current_log_data = self._log_datas[ self._current_log ]
+        first_datetime   = current_log_data.ranges[ 'first_datetime' ]
+        if first_datetime is None :
+            return
+
+        text, ok = QtGui.QInputDialog.getText( self, 'Jump to time',
+                                               'Time (HH:MM:SS, full timestamp or +seconds) :' )
+        if not ok or not text.strip() :
+            return
+
+        target = parse_jump_time( text.strip(), first_datetime )
+        if target is None :
+            QtGui.QMessageBox.warning( self, 'Jump to time', "Can't understand time : %s" % text )
+            return
+
+        lines_data = current_log_data.between( target )
+        if not lines_data :
+            return
+
+        self.select_line_number( lines_data[0].number )
+
+    def select_line_number( self, number ) :
+        """Select the first visible line whose number is at or after the given one."""
+
+        list_widget = self.filtered_log_listWidget
+        for row in xrange( list_widget.count() ) :
+            item = list_widget.item( row )
+            if item.as_line_data.number >= number :
+                list_widget.setCurrentItem( item )
+                list_widget.scrollToItem( item, QtGui.QAbstractItemView.PositionAtTop )
+                break
+
+    def cb_graph_line_clicked( self, *args ) :
+        """Show the log line under the graph click."""
+        index = args[0]
+
+        current_log_data = self._log_datas[ self._current_log ]
+        self.select_line_number( current_log_data[ index ].number )
+        self.tabWidget.setCurrentWidget( self.log_tab )
+
+    def update_log( self, file_path ) :
+        """Parse lines appended to the given log, its last line too once the file stopped changing.
+
+        Return the number of new parsed lines.
+        """
+        try :
+            settled = time.time() - os.path.getmtime( file_path ) > live_settled_seconds
+        except OSError : # removed since opened
+            return 0
+        return self._log_datas[ file_path ].update( complete = settled )
+
+    def cb_live_update( self ) :
+        """Parse lines appended to the current log and add them to the graph and the log view."""
+
+        if self._current_log not in self._log_datas :
+            return
+
+        if not self.update_log( self._current_log ) :
+            return
+
+        self.graph_widget.refresh()
+
+        # follow the end of the log view if it was shown, else keep the shown lines
+        scroll_bar = self.filtered_log_listWidget.verticalScrollBar()
+        at_end     = scroll_bar.value() == scroll_bar.maximum()
+        position   = scroll_bar.value()
+        self.refresh_filtered_log_view()
+        scroll_bar.setValue( scroll_bar.maximum() if at_end else position )
+        self.refresh_options_tab()
+
+    def cb_toggle_run( self, *args ) :
+        """Expand or collapse the run of lines starting at the given line number."""
+        run = ( self._current_log, args[0] )
+
+        if run in self._expanded_runs :
+            self._expanded_runs.remove( run )
+        else :
+            self._expanded_runs.add( run )
+
+        self.refresh_filtered_log_view()
+
+    def cb_copy( self, *args ) :
+        """Copy the given text to clipboard."""
+        clipboard = QtGui.QApplication.clipboard()
+        clipboard.setText( args[0] )
+
+    def cb_dir_open( self, *args ) :
+        """Open the given folder."""
+        print args
+
+class ASLogGraphWidget( QtGui.QWidget ) :
+    """Plot VM, progress and per thread activity of a log over time.
+
+    Wheel zooms around the cursor, drag pans and a click emits `line_clicked`
+    with the index of the nearest line. Only about one min/max bucket per
+    pixel is drawn, see `appleseed_log.graph`.
+    """
+
+    line_clicked = QtCore.Signal( int )
+
+    margin = 40 # pixels left for labels
+
+    def __init__( self, *args, **kwargs ) :
+        super( ASLogGraphWidget, self ).__init__( *args, **kwargs )
+
+        self._data   = None         # ASLogGraphData
+        self._view   = ( 0.0, 1.0 ) # visible time window in seconds
+        self._press  = None         # ( x pixel, view ) when the mouse was pressed
+
+        self.setMinimumHeight( 200 )
+
+    def set_data( self, data ) :
+        """Show the given `ASLogGraphData` (None to clear) entirely."""
+        self._data = data
+        if data is not None :
+            self._view = data.time_range
+        self.update()
+
+    def refresh( self ) :
+        """Add lines parsed since the latest refresh, following the end if visible."""
+        if self._data is None :
+            return
+
+        last = self._data.time_range[1]
+        self._data.update()
+
+        view_min, view_max = self._view
+        if view_max >= last :
+            self._view = ( view_min, self._data.time_range[1] )
+        self.update()
+
+    def x_to_time( self, x ) :
+        view_min, view_max = self._view
+        width = max( 1, self.width() - self.margin )
+        return view_min + ( x - self.margin ) * ( view_max - view_min ) / float( width )
+
+    def time_to_x( self, time ) :
+        view_min, view_max = self._view
+        width = self.width() - self.margin
+        return self.margin + ( time - view_min ) * width / max( 1e-9, view_max - view_min )
+
+    def paintEvent( self, event ) :
+
+        painter = QtGui.QPainter( self )
+        painter.fillRect( self.rect(), QtCore.Qt.white )
+
+        data = self._data
+        if data is None or not len( data.vm ) :
+            painter.end()
+            return
+
+        height = self.height()
+        width  = self.width() - self.margin
+
+        # VM on top, progress in the middle, one lane per thread at the bottom
+        vm_rect       = QtCore.QRectF( self.margin, 0           , width, height * 0.4 )
+        progress_rect = QtCore.QRectF( self.margin, height * 0.4, width, height * 0.3 )
+        threads_rect  = QtCore.QRectF( self.margin, height * 0.7, width, height * 0.3 )
+
+        vm_min, vm_max = data.vm.y_range
+        self.draw_series( painter, data.vm, vm_rect, vm_min, vm_max, QtCore.Qt.darkBlue )
+        painter.drawText( 2, int( vm_rect.top() ) + 12, 'VM' )
+        painter.drawText( 2, int( vm_rect.top() ) + 24, '%d MB' % vm_max )
+
+        self.draw_series( painter, data.progress, progress_rect, 0.0, 100.0, QtCore.Qt.darkGreen )
+        painter.drawText( 2, int( progress_rect.top() ) + 12, '%' )
+
+        thread_ids  = sorted( data.threads )
+        lane_height = threads_rect.height() / max( 1, len( thread_ids ) )
+        for lane, thread_id in enumerate( thread_ids ) :
+            lane_rect = QtCore.QRectF( threads_rect.left()                     ,
+                                       threads_rect.top() + lane * lane_height ,
+                                       threads_rect.width()                    ,
+                                       lane_height                             )
+            self.draw_activity( painter, data.threads[ thread_id ], lane_rect )
+            painter.drawText( 2, int( lane_rect.bottom() ), '<%s>' % str( thread_id ).zfill( 3 ) )
+
+        painter.setPen( QtCore.Qt.gray )
+        for rect in ( vm_rect, progress_rect, threads_rect ) :
+            painter.drawRect( rect )
+
+        painter.end()
+
+    def draw_series( self, painter, pyramid, rect, y_min, y_max, color ) :
+        """Draw a min/max envelope of the given pyramid in the given rect."""
+
+        view_min, view_max = self._view
+        buckets = pyramid.envelope( view_min, view_max, int( rect.width() ) )
+        if not buckets :
+            return
+
+        y_scale = rect.height() / max( 1e-9, y_max - y_min )
+        bottom  = rect.bottom()
+        points  = list()
+        for time, low, high in buckets :
+            x = self.time_to_x( time )
+            points.append( QtCore.QPointF( x, bottom - ( high - y_min ) * y_scale ) )
+            if low != high :
+                points.append( QtCore.QPointF( x, bottom - ( low - y_min ) * y_scale ) )
+
+        painter.save()
+        painter.setClipRect( rect )
+        painter.setPen( color )
+        painter.drawPolyline( QtGui.QPolygonF( points ) )
+        painter.restore()
+
+    def draw_activity( self, painter, pyramid, rect ) :
+        """Draw a tick where the thread logged at least one line."""
+
+        view_min, view_max = self._view
+        top    = rect.top() + 1
+        bottom = rect.bottom() - 1
+
+        painter.save()
+        painter.setClipRect( rect )
+        painter.setPen( QtCore.Qt.darkRed )
+        for time, low, high in pyramid.envelope( view_min, view_max, int( rect.width() ) ) :
+            x = self.time_to_x( time )
+            painter.drawLine( QtCore.QPointF( x, top ), QtCore.QPointF( x, bottom ) )
+        painter.restore()
+
+    def wheelEvent( self, event ) :
+
+        if self._data is None :
+            return
+
+        view_min, view_max = self._view
+        time  = self.x_to_time( event.x() )
+        scale = 0.8 if event.delta() > 0 else 1.25
+
+        # never zoom in below a millisecond
+        if ( view_max - view_min ) * scale < 0.001 :
+            return
+
+        self._view = ( time - ( time - view_min ) * scale ,
+                       time + ( view_max - time ) * scale )
+        self.update()
+
+    def mousePressEvent( self, event ) :
+        self._press = ( event.x(), self._view )
+
+    def mouseMoveEvent( self, event ) :
+
+        if self._press is None :
+            return
+
+        x, ( view_min, view_max ) = self._press
+        shift      = self.x_to_time( x ) - self.x_to_time( event.x() )
+        self._view = ( view_min + shift, view_max + shift )
+        self.update()
+
+    def mouseReleaseEvent( self, event ) :
+
+        if self._press is None :
+            return
+        x = self._press[0]
+        self._press = None
+
+        # a click, not a drag
+        if abs( event.x() - x ) < 3 and self._data is not None :
+            index = self._data.nearest_line( self.x_to_time( event.x() ) )
+            if index is not None :
+                self.line_clicked.emit( index )
+
+    def mouseDoubleClickEvent( self, event ) :
+        """Show the whole log again."""
+        if self._data is not None :
+            self._view = self._data.time_range
+            self.update()
+
+def parse_jump_time( text, first_datetime ) :
+    """Return the `datetime` of the given user time text, None if not valid.
+
+    Accept a full log timestamp, a HH:MM:SS[.ffffff] time (the day of the
+    first line) or a +seconds offset from the first line.
+    """
+
+    try :
+        if text.startswith( '+' ) :
+            return first_datetime + datetime.timedelta( seconds = float( text[1:].rstrip( 's' ) ) )
+
+        if 'T' in text :
+            return datetime.datetime.strptime( text, datetime_str_format )
+
+        time_format = '%H:%M:%S.%f' if '.' in text else '%H:%M:%S'
+        time        = datetime.datetime.strptime( text, time_format ).time()
+        return datetime.datetime.combine( first_datetime.date(), time )
+
+    except ValueError :
+        return None
+
+def main( log_paths = () ) :
+    """Run the viewer, opening the given log files."""
+
+    # TODO: add recent files, drag n drop, left right click copy, btd sur filter pour les dernier filter plus preset.
+    # TODO: Add mesh icon. double click to copy
+    # TODO: Store selected lines
+    # TODO: Options
+    # TODO: Stats
+    # TODO: Show empty line count
+    app = QtGui.QApplication( sys.argv )
+    script_dir = os.path.dirname( __file__ )
+    icon_path = os.path.join( script_dir, 'icons', 'appleseed-seeds-black-32.png' )
+    app.setWindowIcon( QtGui.QIcon( icon_path ) )
+    window = ASLogParserUI()
+    for log_path in log_paths :
+        window.change_current_log_file( log_path )
+    window.show()
+    sys.exit( app.exec_() )